@@ -7,20 +7,17 @@ from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional
-import sys
-from pathlib import Path
+from typing import List, Optional
 import uuid
-import json
-from datetime import datetime
-import cv2
-import numpy as np
+import orjson
+import aiofiles
 
-# Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent.parent / 'src'))
-
-from cctv_pipeline.engagement_processor import EngagementProcessor
-from utils import load_config
+from workers import (
+    config, config_path, model_dir, VIDEOS_DIR, REPORTS_DIR, redis_client,
+    get_cached_result, set_cached_result, delete_cached_result,
+    list_indexed_lectures, seed_lecture_index, unindex_lecture,
+    process_video_background
+)
 
 app = FastAPI(title="Student Engagement Monitor API", version="1.0.0")
 
@@ -33,19 +30,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize processor
-config_path = str(Path(__file__).parent.parent / 'configs' / 'config.yaml')
-model_dir = str(Path(__file__).parent.parent / 'models' / 'trained')
-processor = EngagementProcessor(config_path, model_dir)
+# Index reports already on disk so list_lectures never has to read them
+seed_lecture_index()
 
-# Storage directories
-VIDEOS_DIR = Path(__file__).parent.parent / 'data' / 'videos'
-REPORTS_DIR = Path(__file__).parent.parent / 'outputs' / 'reports'
-VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
-REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+# Upload read size when streaming videos to disk
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MB
 
-# In-memory cache for processed results (replace with database in production)
-results_cache: Dict[str, dict] = {}
+# Queue for background video processing (consumed by `rq worker videos`)
+video_queue = None
+
+if redis_client is not None:
+    try:
+        from rq import Queue
+        
+        video_queue = Queue("videos", connection=redis_client)
+        print("✅ Video processing queue ready")
+    
+    except ImportError:
+        print("⚠️  Warning: rq not installed. Videos will be processed in the API process.")
 
 
 # Request/Response Models
@@ -107,18 +109,37 @@ async def process_video(
         # Save uploaded file
         video_path = VIDEOS_DIR / f"{lecture_id}.{file.filename.split('.')[-1]}"
         
-        with open(video_path, 'wb') as f:
-            content = await file.read()
-            f.write(content)
+        # Stream to disk in chunks so large lecture videos are never fully held in memory
+        async with aiofiles.open(video_path, 'wb') as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await f.write(chunk)
+        
+        # Mark as processing until the worker stores the report
+        set_cached_result(lecture_id, {
+            'lecture_id': lecture_id,
+            'subject': subject,
+            'topic': topic,
+            'status': 'processing'
+        })
         
-        # Add background processing task
-        background_tasks.add_task(
-            process_video_background,
-            str(video_path),
-            lecture_id,
-            subject,
-            topic
-        )
+        # Queue processing on the worker pool, or run it in this process if no queue is available
+        if video_queue is not None:
+            video_queue.enqueue(
+                process_video_background,
+                str(video_path),
+                lecture_id,
+                subject,
+                topic,
+                job_timeout=7200
+            )
+        else:
+            background_tasks.add_task(
+                process_video_background,
+                str(video_path),
+                lecture_id,
+                subject,
+                topic
+            )
         
         return JSONResponse(content={
             "success": True,
@@ -131,107 +152,6 @@ async def process_video(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def process_video_background(
-    video_path: str,
-    lecture_id: str,
-    subject: Optional[str],
-    topic: Optional[str]
-):
-    """Background task to process video"""
-    try:
-        print(f"🎬 Processing video: {lecture_id}")
-        
-        # Reset processor state
-        processor.reset()
-        
-        # Open video
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise Exception(f"Could not open video: {video_path}")
-        
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        
-        all_results = []
-        frame_idx = 0
-        skip_frames = 3  # Process every 3rd frame
-        
-        print(f"  Total frames: {total_frames}, FPS: {fps}")
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Process frame at intervals
-            if frame_idx % skip_frames == 0:
-                results = processor.process_frame(frame)
-                all_results.append(results)
-            
-            frame_idx += 1
-        
-        cap.release()
-        
-        # Generate summary
-        if all_results:
-            total_students_detected = max([r['total_students'] for r in all_results])
-            avg_class_engagement = np.mean([r['class_engagement'] for r in all_results])
-            avg_highly_engaged = np.mean([r['highly_engaged'] for r in all_results])
-            avg_disengaged = np.mean([r['disengaged'] for r in all_results])
-            
-            # Create timeline
-            engagement_timeline = [
-                {
-                    'frame': r['frame_number'],
-                    'engagement': r['class_engagement'],
-                    'students': r['total_students'],
-                    'highly_engaged': r['highly_engaged'],
-                    'disengaged': r['disengaged']
-                }
-                for r in all_results
-            ]
-            
-            # Compile report
-            report = {
-                'lecture_id': lecture_id,
-                'subject': subject,
-                'topic': topic,
-                'timestamp': datetime.now().isoformat(),
-                'video_path': video_path,
-                'total_frames_processed': len(all_results),
-                'fps': fps,
-                'duration_seconds': total_frames / fps if fps > 0 else 0,
-                'summary': {
-                    'total_students_detected': int(total_students_detected),
-                    'average_class_engagement': float(avg_class_engagement),
-                    'average_highly_engaged': float(avg_highly_engaged),
-                    'average_disengaged': float(avg_disengaged)
-                },
-                'timeline': engagement_timeline,
-                'status': 'completed'
-            }
-            
-            # Save report
-            report_file = REPORTS_DIR / f'{lecture_id}_report.json'
-            with open(report_file, 'w') as f:
-                json.dump(report, f, indent=2)
-            
-            # Cache results
-            results_cache[lecture_id] = report
-            
-            print(f"✅ Processing complete: {lecture_id}")
-            print(f"  Processed {len(all_results)} frames")
-            print(f"  Average engagement: {avg_class_engagement:.3f}")
-        
-    except Exception as e:
-        print(f"❌ Error processing video {lecture_id}: {e}")
-        results_cache[lecture_id] = {
-            'lecture_id': lecture_id,
-            'status': 'error',
-            'error': str(e)
-        }
-
-
 @app.get("/api/engagement/{lecture_id}")
 async def get_engagement(lecture_id: str):
     """
@@ -244,15 +164,16 @@ async def get_engagement(lecture_id: str):
         Engagement analysis results
     """
     # Check cache first
-    if lecture_id in results_cache:
-        return results_cache[lecture_id]
+    cached = get_cached_result(lecture_id)
+    if cached is not None:
+        return cached
     
     # Check if report file exists
     report_file = REPORTS_DIR / f'{lecture_id}_report.json'
     if report_file.exists():
-        with open(report_file, 'r') as f:
-            data = json.load(f)
-            results_cache[lecture_id] = data
+        with open(report_file, 'rb') as f:
+            data = orjson.loads(f.read())
+            set_cached_result(lecture_id, data)
             return data
     
     raise HTTPException(status_code=404, detail="Lecture not found")
@@ -266,19 +187,7 @@ async def list_lectures():
     Returns:
         List of lecture IDs and summaries
     """
-    lectures = []
-    
-    for report_file in REPORTS_DIR.glob('*_report.json'):
-        with open(report_file, 'r') as f:
-            data = json.load(f)
-            lectures.append({
-                'lecture_id': data['lecture_id'],
-                'subject': data.get('subject'),
-                'topic': data.get('topic'),
-                'timestamp': data.get('timestamp'),
-                'status': data.get('status'),
-                'avg_engagement': data.get('summary', {}).get('average_class_engagement')
-            })
+    lectures = list_indexed_lectures()
     
     return {'lectures': lectures, 'total': len(lectures)}
 
@@ -287,8 +196,8 @@ async def list_lectures():
 async def delete_lecture(lecture_id: str):
     """Delete lecture data"""
     # Remove from cache
-    if lecture_id in results_cache:
-        del results_cache[lecture_id]
+    delete_cached_result(lecture_id)
+    unindex_lecture(lecture_id)
     
     # Remove report file
     report_file = REPORTS_DIR / f'{lecture_id}_report.json'
@@ -313,6 +222,39 @@ if __name__ == "__main__":
     print(f"Models: {model_dir}")
     print(f"Videos: {VIDEOS_DIR}")
     print(f"Reports: {REPORTS_DIR}")
+    
+    # Multiple workers need the app import string instead of the app object
+    workers = config.get('api', {}).get('workers') or 1
+    
+    # Worker processes only share results and lecture state through Redis
+    if workers > 1 and redis_client is None:
+        print("⚠️  Warning: Redis unavailable. Running a single worker so results stay consistent.")
+        workers = 1
+    
+    print(f"Workers: {workers}")
+    
+    # uvloop/httptools ship with uvicorn[standard] but are unavailable on Windows
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+        print("⚠️  Warning: uvloop not installed. Using asyncio event loop.")
+    
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    
     print("=" * 70)
     
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop=loop,
+        http=http,
+        log_level="info"
+    )
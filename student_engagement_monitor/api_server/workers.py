@@ -0,0 +1,313 @@
+"""
+Video Processing Workers
+Processes uploaded lecture videos off the API request path
+
+Run a worker per GPU with:
+    cd api_server
+    CUDA_VISIBLE_DEVICES=0 rq worker videos
+"""
+
+from typing import Dict, List, Optional
+import sys
+from pathlib import Path
+import orjson
+from datetime import datetime
+import cv2
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from cctv_pipeline.engagement_processor import EngagementProcessor
+from cctv_pipeline.video_capture import DecoderPool
+from utils import load_config
+
+# Configuration
+config_path = str(Path(__file__).parent.parent / 'configs' / 'config.yaml')
+model_dir = str(Path(__file__).parent.parent / 'models' / 'trained')
+config = load_config(config_path)
+
+# Storage directories
+VIDEOS_DIR = Path(__file__).parent.parent / 'data' / 'videos'
+REPORTS_DIR = Path(__file__).parent.parent / 'outputs' / 'reports'
+VIDEOS_DIR.mkdir(parents=True, exist_ok=True)
+REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Shared results cache: Redis when available so every Uvicorn worker sees the same results
+api_config = config.get('api', {})
+redis_client = None
+
+try:
+    import redis
+    
+    redis_client = redis.Redis(
+        host=api_config.get('redis_host', 'localhost'),
+        port=api_config.get('redis_port', 6379),
+        db=api_config.get('redis_db', 0)
+    )
+    redis_client.ping()
+    print("✅ Connected to Redis results cache")
+
+except ImportError:
+    redis_client = None
+    print("⚠️  Warning: redis not installed. Using in-process results cache.")
+except Exception as e:
+    redis_client = None
+    print(f"⚠️  Warning: Could not connect to Redis: {e}. Using in-process results cache.")
+
+# In-memory fallback cache for processed results (not shared across workers)
+results_cache: Dict[str, dict] = {}
+
+
+def get_cached_result(lecture_id: str) -> Optional[dict]:
+    """Get cached result for a lecture, or None if not cached"""
+    if redis_client is not None:
+        cached = redis_client.get(f"lecture:{lecture_id}")
+        return orjson.loads(cached) if cached else None
+    
+    return results_cache.get(lecture_id)
+
+
+def set_cached_result(lecture_id: str, data: dict):
+    """Store result for a lecture in the cache"""
+    if redis_client is not None:
+        redis_client.set(f"lecture:{lecture_id}", orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        results_cache[lecture_id] = data
+
+
+def delete_cached_result(lecture_id: str):
+    """Remove result for a lecture from the cache"""
+    if redis_client is not None:
+        redis_client.delete(f"lecture:{lecture_id}")
+    else:
+        results_cache.pop(lecture_id, None)
+
+
+# In-memory fallback index of completed lectures: {lecture_id: summary}
+lecture_index: Dict[str, dict] = {}
+
+
+def _lecture_summary(report: dict) -> dict:
+    """Build the lecture listing entry for a report"""
+    return {
+        'lecture_id': report['lecture_id'],
+        'subject': report.get('subject'),
+        'topic': report.get('topic'),
+        'timestamp': report.get('timestamp'),
+        'status': report.get('status'),
+        'avg_engagement': report.get('summary', {}).get('average_class_engagement')
+    }
+
+
+def index_lecture(report: dict):
+    """Add or update a completed report in the lecture index"""
+    summary = _lecture_summary(report)
+    
+    if redis_client is not None:
+        redis_client.hset("lecture_index", report['lecture_id'], orjson.dumps(summary))
+    else:
+        lecture_index[report['lecture_id']] = summary
+
+
+def unindex_lecture(lecture_id: str):
+    """Remove a lecture from the lecture index"""
+    if redis_client is not None:
+        redis_client.hdel("lecture_index", lecture_id)
+    else:
+        lecture_index.pop(lecture_id, None)
+
+
+def list_indexed_lectures() -> List[dict]:
+    """Get summaries of all completed lectures"""
+    if redis_client is not None:
+        return [orjson.loads(value) for value in redis_client.hgetall("lecture_index").values()]
+    
+    return list(lecture_index.values())
+
+
+def seed_lecture_index():
+    """Index report files on disk that are not in the lecture index yet"""
+    if redis_client is not None:
+        known_ids = {key.decode() for key in redis_client.hkeys("lecture_index")}
+    else:
+        known_ids = set(lecture_index)
+    
+    for report_file in REPORTS_DIR.glob('*_report.json'):
+        if report_file.name[:-len('_report.json')] in known_ids:
+            continue
+        
+        with open(report_file, 'rb') as f:
+            index_lecture(orjson.loads(f.read()))
+
+
+# Processor is created lazily so the API process does not load models when jobs run in RQ workers
+processor: Optional[EngagementProcessor] = None
+
+
+def get_processor() -> EngagementProcessor:
+    """Get the engagement processor for this process, initializing it on first use"""
+    global processor
+    if processor is None:
+        processor = EngagementProcessor(config_path, model_dir)
+    return processor
+
+
+# Captures are reused across videos processed by this worker
+decoder_pool = DecoderPool(
+    size=config['cctv'].get('streams_per_worker', 1),
+    decode_backend=config['cctv'].get('decode_backend', 'cpu')
+)
+
+
+def process_video_background(
+    video_path: str,
+    lecture_id: str,
+    subject: Optional[str],
+    topic: Optional[str]
+):
+    """Process an uploaded video and store its report (runs in an RQ worker or as a background task)"""
+    try:
+        print(f"🎬 Processing video: {lecture_id}")
+        
+        processor = get_processor()
+        
+        # Reset processor state
+        processor.reset()
+        
+        # Open video
+        cap = decoder_pool.acquire(video_path)
+        if not cap.isOpened():
+            decoder_pool.release(cap)
+            raise Exception(f"Could not open video: {video_path}")
+        
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        
+        num_processed = 0
+        frame_idx = 0
+        skip_frames = 3  # Process every 3rd frame
+        
+        # Frames are buffered so the classifier runs once per batch
+        batch_size = processor.config['cctv'].get('batch_size', 32)
+        frames = []
+        
+        # Per-frame timeline columns; full per-frame results (with student features) are not kept
+        TIMELINE_COLUMNS = ('frame_number', 'class_engagement', 'total_students', 'highly_engaged', 'disengaged')
+        timeline = np.empty((max(total_frames, 0) // skip_frames + 1, len(TIMELINE_COLUMNS)), dtype=np.float64)
+        
+        def process_batch(batch_frames):
+            nonlocal timeline, num_processed
+            batch_results = processor.process_frames_batch(batch_frames)
+            start, num_processed = num_processed, num_processed + len(batch_results)
+            
+            # Grow if the container under-reported its frame count
+            if num_processed > len(timeline):
+                # Double, or more when a batch outgrows that (e.g. streams reporting no frame count)
+                grown = np.empty((max(2 * len(timeline), num_processed), timeline.shape[1]), dtype=timeline.dtype)
+                grown[:start] = timeline[:start]
+                timeline = grown
+            
+            timeline[start:num_processed] = [
+                tuple(r[column] for column in TIMELINE_COLUMNS)
+                for r in batch_results
+            ]
+        
+        print(f"  Total frames: {total_frames}, FPS: {fps}")
+        
+        try:
+            while cap.isOpened():
+                # Grab every frame but only decode the ones we process
+                ret = cap.grab()
+                if not ret:
+                    break
+                
+                # Process frame at intervals
+                if frame_idx % skip_frames == 0:
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    
+                    frames.append(frame)
+                    
+                    if len(frames) >= batch_size:
+                        process_batch(frames)
+                        frames = []
+                
+                frame_idx += 1
+            
+            # Process remaining partial batch
+            if frames:
+                process_batch(frames)
+        
+        finally:
+            decoder_pool.release(cap)
+        
+        # Generate summary
+        if num_processed:
+            timeline = timeline[:num_processed]
+            frame_numbers, engagement, students, highly_engaged, disengaged = timeline.T
+            
+            avg_class_engagement = engagement.mean()
+            avg_highly_engaged = highly_engaged.mean()
+            avg_disengaged = disengaged.mean()
+            total_students_detected = students.max()
+            
+            # Create timeline (columns are converted to Python scalars in bulk)
+            engagement_timeline = [
+                {
+                    'frame': frame,
+                    'engagement': score,
+                    'students': count,
+                    'highly_engaged': high,
+                    'disengaged': low
+                }
+                for frame, score, count, high, low in zip(
+                    frame_numbers.astype(int).tolist(),
+                    engagement.tolist(),
+                    students.astype(int).tolist(),
+                    highly_engaged.astype(int).tolist(),
+                    disengaged.astype(int).tolist()
+                )
+            ]
+            
+            # Compile report
+            report = {
+                'lecture_id': lecture_id,
+                'subject': subject,
+                'topic': topic,
+                'timestamp': datetime.now().isoformat(),
+                'video_path': video_path,
+                'total_frames_processed': num_processed,
+                'fps': fps,
+                'duration_seconds': total_frames / fps if fps > 0 else 0,
+                'summary': {
+                    'total_students_detected': int(total_students_detected),
+                    'average_class_engagement': float(avg_class_engagement),
+                    'average_highly_engaged': float(avg_highly_engaged),
+                    'average_disengaged': float(avg_disengaged)
+                },
+                'timeline': engagement_timeline,
+                'status': 'completed'
+            }
+            
+            # Save report
+            report_file = REPORTS_DIR / f'{lecture_id}_report.json'
+            with open(report_file, 'wb') as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+            
+            # Cache results
+            set_cached_result(lecture_id, report)
+            index_lecture(report)
+            
+            print(f"✅ Processing complete: {lecture_id}")
+            print(f"  Processed {num_processed} frames")
+            print(f"  Average engagement: {avg_class_engagement:.3f}")
+        
+    except Exception as e:
+        print(f"❌ Error processing video {lecture_id}: {e}")
+        set_cached_result(lecture_id, {
+            'lecture_id': lecture_id,
+            'status': 'error',
+            'error': str(e)
+        })
@@ -0,0 +1,163 @@
+"""
+Teacher label collection
+Runs the face, hand, head pose and phone detectors over videos and stores their raw
+outputs per frame, as training targets for a single distilled multi-task model
+"""
+
+import sys
+import cv2
+import numpy as np
+import yaml
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from data_processing.dataset_loader import VIDEO_EXTENSIONS
+from data_processing.frame_extractor import FrameExtractor
+from feature_extraction.facial_expression_detector import FacialExpressionDetector
+from feature_extraction.hand_movement_detector import HandMovementDetector
+from feature_extraction.head_pose_estimator import HeadPoseEstimator
+from feature_extraction.phone_usage_detector import create_phone_detector
+
+
+FACE_LANDMARKS = 478  # Face Mesh with refined iris landmarks
+HAND_LANDMARKS = 21
+
+
+def collect_video_labels(video_path: Path, output_dir: Path, frame_extractor: FrameExtractor,
+                         facial_detector: FacialExpressionDetector,
+                         hand_detector: HandMovementDetector,
+                         pose_estimator: HeadPoseEstimator, phone_detector) -> int:
+    """
+    Save sampled frames of a video with the detectors' outputs
+    
+    Args:
+        video_path: Video to label
+        output_dir: Directory for the frame images and labels.npz
+        frame_extractor: Frame extractor (RGB output)
+        facial_detector: Face landmark teacher
+        hand_detector: Hand landmark teacher
+        pose_estimator: Head pose teacher
+        phone_detector: Phone detection teacher
+    
+    Returns:
+        Number of labeled frames
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Missing detections are NaN; hands are stored as [left, right]
+    face, hands, head_pose, phone_bbox, phone_confidence = [], [], [], [], []
+    
+    for index, rgb_frame in enumerate(frame_extractor.iter_frames(str(video_path))):
+        bgr_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+        h, w = rgb_frame.shape[:2]
+        
+        frame_face = np.full((FACE_LANDMARKS, 3), np.nan, dtype=np.float32)
+        faces = facial_detector.detect_landmarks(rgb_frame, is_rgb=True)
+        if faces and len(faces[0]) == FACE_LANDMARKS:
+            frame_face[:] = faces[0]
+        
+        frame_hands = np.full((2, HAND_LANDMARKS, 3), np.nan, dtype=np.float32)
+        for landmarks, label in hand_detector.detect_landmarks(rgb_frame, is_rgb=True):
+            frame_hands[0 if label == "Left" else 1] = landmarks
+        
+        frame_pose = np.full(3, np.nan, dtype=np.float32)
+        pose = pose_estimator.estimate_pose(rgb_frame, is_rgb=True)
+        if pose:
+            frame_pose[:] = (pose['pitch'], pose['yaw'], pose['roll'])
+        
+        # Phone box normalized to the frame size, like the landmarks
+        frame_bbox = np.full(4, np.nan, dtype=np.float32)
+        phone = phone_detector.detect_phone(bgr_frame)
+        if phone['phone_bbox']:
+            frame_bbox[:] = np.asarray(phone['phone_bbox'], dtype=np.float32) / (w, h, w, h)
+        
+        face.append(frame_face)
+        hands.append(frame_hands)
+        head_pose.append(frame_pose)
+        phone_bbox.append(frame_bbox)
+        phone_confidence.append(phone['phone_confidence'])
+        
+        cv2.imwrite(str(output_dir / f"frame_{index:05d}.jpg"), bgr_frame)
+    
+    if not face:
+        return 0
+    
+    np.savez_compressed(
+        output_dir / 'labels.npz',
+        face=np.stack(face),
+        hands=np.stack(hands),
+        head_pose=np.stack(head_pose),
+        phone_bbox=np.stack(phone_bbox),
+        phone_confidence=np.asarray(phone_confidence, dtype=np.float32)
+    )
+    
+    return len(face)
+
+
+def main():
+    """
+    Collect teacher labels for every video under a directory
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Collect detector outputs as distillation targets')
+    parser.add_argument('--videos', type=str, required=True,
+                       help='Directory searched recursively for videos')
+    parser.add_argument('--output', type=str, default='data/distillation',
+                       help='Output directory (one subdirectory per video)')
+    parser.add_argument('--config', type=str, default='configs/config.yaml',
+                       help='Path to configuration file')
+    parser.add_argument('--max-videos', type=int, default=None,
+                       help='Maximum number of videos to label')
+    
+    args = parser.parse_args()
+    
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    
+    print("=" * 70)
+    print("Teacher Label Collection")
+    print("=" * 70)
+    
+    video_paths = sorted(
+        path for path in Path(args.videos).rglob('*')
+        if path.suffix[1:].lower() in VIDEO_EXTENSIONS
+    )[:args.max_videos]
+    
+    if not video_paths:
+        print(f"❌ No videos found in {args.videos}")
+        return
+    
+    video_config = config.get('video', {})
+    frame_extractor = FrameExtractor(
+        target_fps=video_config.get('fps_extraction', 5),
+        resize=(video_config.get('frame_width', 640), video_config.get('frame_height', 480)),
+        output_rgb=True
+    )
+    
+    # Every frame is labeled on its own, so the result caches stay off
+    facial_detector = FacialExpressionDetector(use_cache=False)
+    hand_detector = HandMovementDetector(use_cache=False)
+    pose_estimator = HeadPoseEstimator(use_cache=False)
+    phone_detector = create_phone_detector(use_yolo=True, use_cache=False)
+    
+    output_root = Path(args.output)
+    total_frames = 0
+    
+    for i, video_path in enumerate(video_paths, 1):
+        try:
+            num_frames = collect_video_labels(
+                video_path, output_root / video_path.stem, frame_extractor,
+                facial_detector, hand_detector, pose_estimator, phone_detector
+            )
+            total_frames += num_frames
+            print(f"  [{i}/{len(video_paths)}] {video_path.name}: {num_frames} frames")
+        except Exception as e:
+            print(f"  ⚠️  Warning: Failed to label {video_path.name}: {e}")
+    
+    print(f"\n✅ Labeled {total_frames} frames from {len(video_paths)} videos in {output_root}")
+
+
+if __name__ == "__main__":
+    main()
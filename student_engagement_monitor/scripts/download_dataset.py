@@ -5,6 +5,7 @@ Downloads and extracts the DAiSEE dataset from Kaggle
 
 import os
 import sys
+import shutil
 import zipfile
 from pathlib import Path
 import subprocess
@@ -47,61 +48,75 @@ def download_daisee_dataset(output_dir='data/raw'):
     print("⚠️  This is a large dataset (~15.3 GB). Download may take a while.")
     
     try:
-        # Download using Kaggle API
-        cmd = [
-            'kaggle', 'datasets', 'download',
-            '-d', 'olgaparfenova/daisee',
-            '-p', str(output_path),
-            '--unzip'
-        ]
+        import kagglehub
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # kagglehub downloads with parallel range requests and extracts into its cache
+        cache_path = Path(kagglehub.dataset_download('olgaparfenova/daisee'))
         
-        if result.returncode == 0:
-            print("✅ Dataset downloaded successfully!")
-            
-            # Check if files exist
-            daisee_path = output_path / 'DAiSEE'
-            if not daisee_path.exists():
-                # Files might be directly in output_path
-                print(f"\n📁 Dataset location: {output_path}")
-            else:
-                print(f"\n📁 Dataset location: {daisee_path}")
-            
-            # Display directory structure
-            print("\n📂 Dataset structure:")
-            display_structure(output_path)
-            
-            return True
+        # Move (rename) into the data directory instead of copying 15 GB
+        for item in cache_path.iterdir():
+            target = output_path / item.name
+            if not target.exists():
+                shutil.move(str(item), str(target))
+        
+        print("✅ Dataset downloaded successfully!")
+        
+        # Check if files exist
+        daisee_path = output_path / 'DAiSEE'
+        if not daisee_path.exists():
+            # Files might be directly in output_path
+            print(f"\n📁 Dataset location: {output_path}")
         else:
-            print(f"❌ Error downloading dataset: {result.stderr}")
-            return False
+            print(f"\n📁 Dataset location: {daisee_path}")
+        
+        # Display directory structure
+        print("\n📂 Dataset structure:")
+        display_structure(output_path)
+        
+        return True
             
-    except FileNotFoundError:
-        print("❌ Kaggle CLI not found. Installing...")
-        subprocess.run([sys.executable, '-m', 'pip', 'install', 'kaggle'])
-        print("✅ Kaggle installed. Please run this script again.")
+    except ImportError:
+        print("❌ kagglehub not found. Installing...")
+        subprocess.run([sys.executable, '-m', 'pip', 'install', 'kagglehub'])
+        print("✅ kagglehub installed. Please run this script again.")
         return False
     except Exception as e:
-        print(f"❌ Error: {e}")
+        print(f"❌ Error downloading dataset: {e}")
         return False
 
 
+def count_videos(path, extensions=('.avi', '.mp4')):
+    """Count video files under path in a single directory walk"""
+    count = 0
+    
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                count += count_videos(entry.path, extensions)
+            elif entry.name.lower().endswith(extensions):
+                count += 1
+    
+    return count
+
+
 def display_structure(path, max_depth=2, current_depth=0, prefix=""):
     """Display directory structure"""
     if current_depth >= max_depth:
         return
     
     try:
-        items = sorted(path.iterdir(), key=lambda x: (not x.is_dir(), x.name))
+        # DirEntry caches the file type, so sorting and recursing don't re-stat each item
+        with os.scandir(path) as entries:
+            items = sorted(entries, key=lambda x: (not x.is_dir(), x.name))
+        
         for i, item in enumerate(items[:10]):  # Show first 10 items
             is_last = i == len(items) - 1
             current_prefix = "└── " if is_last else "├── "
             print(f"{prefix}{current_prefix}{item.name}")
             
-            if item.is_dir() and current_depth < max_depth - 1:
+            if current_depth < max_depth - 1 and item.is_dir():
                 next_prefix = prefix + ("    " if is_last else "│   ")
-                display_structure(item, max_depth, current_depth + 1, next_prefix)
+                display_structure(item.path, max_depth, current_depth + 1, next_prefix)
         
         if len(items) > 10:
             print(f"{prefix}... and {len(items) - 10} more items")
@@ -131,8 +146,7 @@ def verify_dataset(data_dir='data/raw'):
         if dir_path.exists():
             found_dirs.append(dir_name)
             # Count videos
-            video_count = sum(1 for _ in dir_path.rglob('*.avi')) + \
-                         sum(1 for _ in dir_path.rglob('*.mp4'))
+            video_count = count_videos(dir_path)
             print(f"  ✅ {dir_name}: {video_count} videos found")
         else:
             print(f"  ❌ {dir_name}: Not found")
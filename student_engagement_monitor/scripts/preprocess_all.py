@@ -3,6 +3,7 @@ Complete preprocessing script
 Extracts features from entire DAiSEE dataset
 """
 
+import os
 import sys
 from pathlib import Path
 
@@ -25,6 +26,9 @@ def main():
                        help='Dataset splits to process')
     parser.add_argument('--max-videos', type=int, default=None,
                        help='Maximum videos per split (for testing)')
+    parser.add_argument('--num-workers', type=int, default=None,
+                       help='Worker processes for feature extraction '
+                            '(default: performance.num_workers, 1 = no parallelism)')
     
     args = parser.parse_args()
     
@@ -40,6 +44,9 @@ def main():
         try:
             # Initialize pipeline
             pipeline = TrainingPipeline(args.config)
+            num_workers = args.num_workers
+            if num_workers is None:
+                num_workers = pipeline.config.get('performance', {}).get('num_workers') or os.cpu_count() or 1
             
             # Load dataset
             pipeline.load_dataset(split)
@@ -47,7 +54,8 @@ def main():
             # Extract and save features
             pipeline.extract_features_from_dataset(
                 max_videos=args.max_videos,
-                save_features=True
+                save_features=True,
+                num_workers=num_workers
             )
             
             print(f"\n✅ {split} split preprocessing complete!")
@@ -4,15 +4,18 @@ Process CCTV footage and generate engagement reports
 """
 
 import cv2
+import numpy as np
 import sys
+import time
 from pathlib import Path
 import argparse
-import json
+import orjson
 from datetime import datetime
 
 sys.path.append(str(Path(__file__).parent.parent / 'src'))
 
 from cctv_pipeline.engagement_processor import EngagementProcessor
+from cctv_pipeline.video_capture import open_video_capture, open_video_writer
 
 
 def main():
@@ -34,6 +37,11 @@ def main():
                        help='Path to save JSON report')
     parser.add_argument('--display', action='store_true',
                        help='Display video while processing')
+    parser.add_argument('--precision', type=str, default=None,
+                       choices=['fp32', 'fp16', 'int8'],
+                       help='Detector inference precision (defaults to performance.precision in config)')
+    parser.add_argument('--preview-fps', type=float, default=5,
+                       help='Maximum refresh rate of the --display preview window')
     
     args = parser.parse_args()
     
@@ -42,7 +50,7 @@ def main():
     print("=" * 70)
     
     # Initialize processor
-    processor = EngagementProcessor(args.config, args.model_dir)
+    processor = EngagementProcessor(args.config, args.model_dir, precision=args.precision)
     
     # Determine input type
     if args.input.isdigit():
@@ -56,7 +64,10 @@ def main():
         is_stream = False
     
     # Open video
-    cap = cv2.VideoCapture(input_source)
+    cap = open_video_capture(
+        input_source,
+        decode_backend=processor.config['cctv'].get('decode_backend', 'cpu')
+    )
     
     if not cap.isOpened():
         print(f"❌ Error: Could not open video source: {args.input}")
@@ -75,18 +86,78 @@ def main():
         print(f"  Total Frames: {total_frames}")
     print(f"  Mode: {args.mode}")
     print(f"  Skip Frames: {args.skip_frames}")
+    print(f"  Precision: {processor.precision}")
     
     # Setup output video writer if requested
     video_writer = None
     if args.output_video:
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        video_writer = cv2.VideoWriter(args.output_video, fourcc, fps/args.skip_frames, (width, height))
+        video_writer = open_video_writer(
+            args.output_video,
+            fps / args.skip_frames,
+            (width, height),
+            encode_backend=processor.config['cctv'].get('encode_backend', 'cpu')
+        )
         print(f"  Output Video: {args.output_video}")
     
     # Process video
-    all_results = []
+    num_processed = 0
     frame_idx = 0
     
+    # Batch frames so the classifier runs once per batch (realtime keeps per-frame latency)
+    batch_size = 1 if args.mode == 'realtime' else processor.config['cctv'].get('batch_size', 32)
+    frames = []
+    
+    # Per-frame timeline columns; full per-frame results (with student features) are not kept
+    TIMELINE_COLUMNS = ('frame_number', 'class_engagement', 'total_students', 'highly_engaged', 'disengaged')
+    timeline = np.empty((max(total_frames, 0) // args.skip_frames + 1, len(TIMELINE_COLUMNS)), dtype=np.float64)
+    
+    # Preview is throttled so the GUI never paces processing
+    preview_interval = 1.0 / args.preview_fps if args.preview_fps > 0 else 0.0
+    last_preview = 0.0
+    
+    def handle_batch(batch_frames) -> bool:
+        """Process, visualize and output a batch of frames. Returns False if stopped by user."""
+        nonlocal timeline, num_processed, last_preview
+        batch_results = processor.process_frames_batch(batch_frames)
+        start, num_processed = num_processed, num_processed + len(batch_results)
+        
+        # Grow for streams and containers that under-report their frame count
+        if num_processed > len(timeline):
+            # Double, or more when a batch outgrows that (e.g. streams reporting no frame count)
+            grown = np.empty((max(2 * len(timeline), num_processed), timeline.shape[1]), dtype=timeline.dtype)
+            grown[:start] = timeline[:start]
+            timeline = grown
+        
+        timeline[start:num_processed] = [
+            tuple(r[column] for column in TIMELINE_COLUMNS)
+            for r in batch_results
+        ]
+        
+        for frame, results in zip(batch_frames, batch_results):
+            show_preview = args.display and time.monotonic() - last_preview >= preview_interval
+            
+            # Nothing to render for this frame
+            if not video_writer and not show_preview:
+                continue
+            
+            # Visualize (frames are not needed after output)
+            vis_frame = processor.visualize_results(frame, results, inplace=True)
+            
+            # Save to output video
+            if video_writer:
+                video_writer.write(vis_frame)
+            
+            # Display
+            if show_preview:
+                last_preview = time.monotonic()
+                cv2.imshow('Engagement Analysis', vis_frame)
+                
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    print("\nStopped by user")
+                    return False
+        
+        return True
+    
     print(f"\n{'='*70}")
     print("Processing...")
     print(f"{'='*70}")
@@ -96,36 +167,37 @@ def main():
         pbar = tqdm(total=total_frames)
     
     try:
+        stopped = False
+        
         while cap.isOpened():
-            ret, frame = cap.read()
+            # Grab every frame but only decode the ones we process
+            ret = cap.grab()
             
             if not ret:
                 break
             
             # Process frame at intervals
             if frame_idx % args.skip_frames == 0:
-                results = processor.process_frame(frame)
-                all_results.append(results)
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
                 
-                # Visualize
-                vis_frame = processor.visualize_results(frame, results)
+                frames.append(frame)
                 
-                # Save to output video
-                if video_writer:
-                    video_writer.write(vis_frame)
-                
-                # Display
-                if args.display:
-                    cv2.imshow('Engagement Analysis', vis_frame)
-                    
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        print("\nStopped by user")
+                if len(frames) >= batch_size:
+                    batch_frames, frames = frames, []
+                    if not handle_batch(batch_frames):
+                        stopped = True
                         break
             
             frame_idx += 1
             
             if not is_stream:
                 pbar.update(1)
+        
+        # Process remaining partial batch
+        if frames and not stopped:
+            handle_batch(frames)
     
     except KeyboardInterrupt:
         print("\n\nInterrupted by user")
@@ -144,23 +216,28 @@ def main():
     print("Generating Report...")
     print(f"{'='*70}")
     
-    if all_results:
-        import numpy as np
-        
+    if num_processed:
         # Calculate summary statistics
-        total_students_detected = max([r['total_students'] for r in all_results])
-        avg_class_engagement = np.mean([r['class_engagement'] for r in all_results])
-        avg_highly_engaged = np.mean([r['highly_engaged'] for r in all_results])
-        avg_disengaged = np.mean([r['disengaged'] for r in all_results])
+        timeline = timeline[:num_processed]
+        frame_numbers, engagement, students, highly_engaged, disengaged = timeline.T
+        
+        avg_class_engagement = engagement.mean()
+        avg_highly_engaged = highly_engaged.mean()
+        avg_disengaged = disengaged.mean()
+        total_students_detected = int(students.max())
         
-        # Engagement over time
+        # Engagement over time (columns are converted to Python scalars in bulk)
         engagement_timeline = [
             {
-                'frame': r['frame_number'],
-                'engagement': r['class_engagement'],
-                'students': r['total_students']
+                'frame': frame,
+                'engagement': score,
+                'students': count
             }
-            for r in all_results
+            for frame, score, count in zip(
+                frame_numbers.astype(int).tolist(),
+                engagement.tolist(),
+                students.astype(int).tolist()
+            )
         ]
         
         # Compile report
@@ -168,7 +245,7 @@ def main():
             'metadata': {
                 'input_source': args.input,
                 'timestamp': datetime.now().isoformat(),
-                'total_frames_processed': len(all_results),
+                'total_frames_processed': num_processed,
                 'processing_mode': args.mode
             },
             'summary': {
@@ -189,8 +266,8 @@ def main():
         
         # Save report
         if args.output_report:
-            with open(args.output_report, 'w') as f:
-                json.dump(report, f, indent=2)
+            with open(args.output_report, 'wb') as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
             print(f"\n  💾 Report saved to {args.output_report}")
         else:
             # Save to default location
@@ -198,8 +275,8 @@ def main():
             output_dir.mkdir(parents=True, exist_ok=True)
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             report_file = output_dir / f'engagement_report_{timestamp}.json'
-            with open(report_file, 'w') as f:
-                json.dump(report, f, indent=2)
+            with open(report_file, 'wb') as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
             print(f"\n  💾 Report saved to {report_file}")
     
     print(f"\n{'='*70}")
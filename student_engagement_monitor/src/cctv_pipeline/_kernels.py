@@ -0,0 +1,43 @@
+"""
+Numeric Kernels
+Small pixel-level helpers for the CCTV pipeline, JIT-compiled with Numba when available
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _dhash64_numpy(small: np.ndarray) -> int:
+    """Pack the horizontal gradient bits of an 8x9 grayscale image into a 64-bit int"""
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _dhash64_kernel(small):
+        h = np.uint64(0)
+        for r in range(8):
+            for c in range(8):
+                h = (h << np.uint64(1)) | np.uint64(small[r, c + 1] > small[r, c])
+        return h
+
+
+def dhash64(small: np.ndarray) -> int:
+    """
+    Compute a 64-bit difference hash from a downscaled grayscale image
+
+    Args:
+        small: 8x9 (rows x cols) uint8 grayscale image
+
+    Returns:
+        Hash with one bit per horizontally adjacent pixel pair (row-major, MSB first)
+    """
+    if NUMBA_AVAILABLE:
+        return int(_dhash64_kernel(small))
+    return _dhash64_numpy(small)
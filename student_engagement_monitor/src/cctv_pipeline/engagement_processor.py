@@ -5,19 +5,276 @@ Processes CCTV footage and analyzes student engagement
 
 import cv2
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Union
 from pathlib import Path
+import os
 import sys
-from collections import defaultdict
+import shutil
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, deque
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from feature_extraction.feature_aggregator import FeatureAggregator
+from feature_extraction.feature_aggregator import FeatureAggregator, FeatureWindow
 from models.engagement_classifier import EngagementClassifier
 from cctv_pipeline.student_detector import StudentDetector
+from cctv_pipeline.video_capture import open_video_capture
+from cctv_pipeline._kernels import dhash64
 from utils import load_config
 
 
+def _read_frames(cap, frame_queue: queue.Queue, skip_frames: int, stop_event: threading.Event):
+    """
+    Decode every Nth frame of a capture into a queue (runs on a reader thread)
+    
+    Puts (frame_idx, frame) tuples followed by a None sentinel, and gives up
+    as soon as stop_event is set so the consumer can always shut it down
+    """
+    def put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                frame_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    frame_idx = 0
+    
+    try:
+        while not stop_event.is_set():
+            # Grab every frame but only decode the ones we process
+            if not cap.grab():
+                break
+            
+            if frame_idx % skip_frames == 0:
+                ret, frame = cap.retrieve()
+                if not ret or not put((frame_idx, frame)):
+                    break
+            
+            frame_idx += 1
+    finally:
+        put(None)
+
+
+def frame_record_dtype(max_students: int) -> np.dtype:
+    """Structured dtype of one processed frame in a process_video output file"""
+    return np.dtype([
+        ('frame_number', np.int32),
+        ('total_students', np.int32),
+        ('class_engagement', np.float32),
+        ('highly_engaged', np.int32),
+        ('moderately_engaged', np.int32),
+        ('disengaged', np.int32),
+        ('student_ids', np.int64, (max_students,)),  # -1 pads unused slots
+        ('student_scores', np.float32, (max_students,))
+    ])
+
+
+class FrameRecordWriter:
+    """
+    Streams per-frame results to a .npy file of structured records
+    Results are appended to a raw side file as they arrive and the .npy header
+    is written once the final row count is known, so memory use stays constant
+    """
+    
+    def __init__(self, output_path: str, max_students: int):
+        self.output_path = output_path
+        self.max_students = max_students
+        self.dtype = frame_record_dtype(max_students)
+        self.num_records = 0
+        self._part_path = f"{output_path}.part"
+        self._part_file = open(self._part_path, 'wb')
+    
+    def write(self, results: List[Dict]):
+        """Append frame results from process_frames_batch()"""
+        records = np.zeros(len(results), dtype=self.dtype)
+        records['student_ids'] = -1
+        
+        for record, frame_result in zip(records, results):
+            record['frame_number'] = frame_result['frame_number']
+            record['total_students'] = frame_result['total_students']
+            record['class_engagement'] = frame_result['class_engagement']
+            record['highly_engaged'] = frame_result['highly_engaged']
+            record['moderately_engaged'] = frame_result['moderately_engaged']
+            record['disengaged'] = frame_result['disengaged']
+            
+            students = frame_result['student_results'][:self.max_students]
+            record['student_ids'][:len(students)] = [s['id'] for s in students]
+            record['student_scores'][:len(students)] = [s['engagement_score'] for s in students]
+        
+        self._part_file.write(records.tobytes())
+        self.num_records += len(records)
+    
+    def close(self) -> str:
+        """Write the final .npy file and return its path"""
+        self._part_file.close()
+        
+        with open(self.output_path, 'wb') as out, open(self._part_path, 'rb') as part:
+            np.lib.format.write_array_header_1_0(out, {
+                'descr': np.lib.format.dtype_to_descr(self.dtype),
+                'fortran_order': False,
+                'shape': (self.num_records,)
+            })
+            shutil.copyfileobj(part, out)
+        
+        os.remove(self._part_path)
+        return self.output_path
+
+
+# Per-process processor used by parallel process_video workers
+_worker_processor = None
+
+
+def _init_video_worker(config_path: str, model_dir: str, precision: Optional[str]):
+    """Load models once per worker process"""
+    global _worker_processor
+    _worker_processor = EngagementProcessor(config_path, model_dir, precision=precision)
+
+
+def _process_video_chunk(video_path: str, start_frame: int, end_frame: int, skip_frames: int) -> List[Dict]:
+    """
+    Process frames [start_frame, end_frame) of a video in a worker process
+    
+    Frames are sampled on the same global skip_frames grid as a serial run,
+    and frame_number continues from the frames processed before start_frame.
+    Processing starts buffer_size sampled frames early, so every student's feature
+    window is already filled at start_frame; those lead-in results are discarded
+    """
+    processor = _worker_processor
+    processor.reset()
+    
+    read_start = max(0, start_frame - processor.buffer_size * skip_frames)
+    processor.frame_count = (read_start + skip_frames - 1) // skip_frames
+    
+    decode_backend = processor.config['cctv'].get('decode_backend', 'cpu')
+    cap = open_video_capture(video_path, decode_backend=decode_backend)
+    
+    if read_start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, read_start)
+        
+        # Seeking is not frame-accurate for every codec; fall back to skipping frames one by one
+        if int(round(cap.get(cv2.CAP_PROP_POS_FRAMES))) != read_start:
+            cap.release()
+            cap = open_video_capture(video_path, decode_backend=decode_backend)
+            for _ in range(read_start):
+                if not cap.grab():
+                    break
+    
+    batch_size = processor.config['cctv'].get('batch_size', 32)
+    results = []
+    frames = []
+    frame_indices = []
+    
+    def process_batch():
+        batch_results = processor.process_frames_batch(frames)
+        results.extend(result for frame_idx, result in zip(frame_indices, batch_results)
+                       if frame_idx >= start_frame)
+        frames.clear()
+        frame_indices.clear()
+    
+    for frame_idx in range(read_start, end_frame):
+        if not cap.grab():
+            break
+        
+        if frame_idx % skip_frames == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            
+            frames.append(frame)
+            frame_indices.append(frame_idx)
+            
+            if len(frames) >= batch_size:
+                process_batch()
+    
+    if frames:
+        process_batch()
+    
+    cap.release()
+    
+    return results
+
+
+def _bbox_iou(a: tuple, b: tuple) -> float:
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    inter_w = min(a[2], b[2]) - max(a[0], b[0])
+    inter_h = min(a[3], b[3]) - max(a[1], b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class _TrackIdStitcher:
+    """
+    Merge per-chunk results into one timeline with consistent student IDs
+    
+    Each chunk's tracker numbers students independently, so students in a chunk's
+    first frame are matched to the previous chunk's last frame by bbox IoU and
+    take over their IDs; unmatched students get fresh IDs. Chunks are added in
+    order, one at a time, so each can be written out before the next arrives
+    """
+    
+    def __init__(self, iou_threshold: float = 0.3):
+        self.iou_threshold = iou_threshold
+        self._prev_students = []
+        self._next_id = 1
+        self._num_chunks = 0
+    
+    def add(self, results: List[Dict]) -> List[Dict]:
+        """
+        Renumber the students of the next chunk in place
+        
+        Args:
+            results: Frame results of the chunk following the previously added one
+            
+        Returns:
+            The same frame results, with stitched student IDs
+        """
+        id_map = {}
+        first_chunk = self._num_chunks == 0
+        self._num_chunks += 1
+        
+        # Greedily match boundary students, best IoU first
+        if results and self._prev_students:
+            candidates = sorted(
+                ((_bbox_iou(s['bbox'], p['bbox']), s['id'], p['id'])
+                 for s in results[0]['student_results'] for p in self._prev_students),
+                reverse=True
+            )
+            used_ids = set()
+            
+            for iou, student_id, prev_id in candidates:
+                if iou < self.iou_threshold:
+                    break
+                if student_id in id_map or prev_id in used_ids:
+                    continue
+                id_map[student_id] = prev_id
+                used_ids.add(prev_id)
+        
+        for frame_result in results:
+            for student in frame_result['student_results']:
+                student_id = student['id']
+                
+                if student_id not in id_map:
+                    # The first chunk keeps its tracker IDs
+                    id_map[student_id] = student_id if first_chunk else self._next_id
+                    self._next_id = max(self._next_id, id_map[student_id]) + 1
+                
+                student['id'] = id_map[student_id]
+        
+        if results:
+            self._prev_students = results[-1]['student_results']
+        
+        return results
+
+
 class EngagementProcessor:
     """
     Process CCTV footage and analyze student engagement
@@ -25,23 +282,45 @@ class EngagementProcessor:
     """
     
     def __init__(self, config_path: str = 'configs/config.yaml',
-                 model_dir: str = 'models/trained'):
+                 model_dir: str = 'models/trained',
+                 precision: Optional[str] = None,
+                 store_features: bool = False):
         """
         Initialize engagement processor
         
         Args:
             config_path: Path to configuration file
             model_dir: Directory containing trained models
+            precision: Detector inference precision ('fp32', 'fp16', 'int8'),
+                       overrides performance.precision in the config
+            store_features: Keep extracted features in each student result
         """
         print("Initializing Engagement Processor...")
         
         # Load configuration
+        self.config_path = config_path
+        self.model_dir = model_dir
         self.config = load_config(config_path)
         
+        # Resolve inference precision (shared with the feature extractors through the config)
+        performance_config = self.config.setdefault('performance', {})
+        self.precision = precision or performance_config.get('precision', 'fp32')
+        
+        # int8 applies to an exported phone detector model; the person detector runs fp16
+        phone_export = self.config.get('features', {}).get('phone_detection', {}).get('export_format')
+        if self.precision == 'int8' and not phone_export:
+            print("  ⚠️  Warning: int8 needs an exported phone detector model, running detectors in fp16")
+            self.precision = 'fp16'
+        
+        performance_config['precision'] = self.precision
+        
         # Initialize components
         self.student_detector = StudentDetector(
             confidence_threshold=self.config['cctv']['person_detection']['confidence_threshold'],
-            max_students=self.config['cctv']['person_detection']['max_students']
+            max_students=self.config['cctv']['person_detection']['max_students'],
+            half=self.precision != 'fp32',
+            roi_max_size=self.config['cctv'].get('roi_max_size'),
+            roi_rgb=True  # Buffered ROIs are converted once, not on every re-extraction
         )
         
         self.feature_aggregator = FeatureAggregator(self.config)
@@ -53,16 +332,44 @@ class EngagementProcessor:
             print(f"  ✅ Loaded trained model from {model_dir}")
         else:
             print(f"  ⚠️  Warning: No trained model found at {model_dir}")
-            print("     Processor will extract features but not make predictions")
+            print("     Processor will detect students but not make predictions")
+        
+        self.store_features = store_features
         
         # Processing state
-        self.student_engagement_history = defaultdict(list)
-        self.student_frame_buffer = defaultdict(list)  # Buffer frames for temporal aggregation
+        self.history_size = self.config['cctv'].get('history_size', 300)  # Recent predictions kept per student
+        self.student_engagement_history = defaultdict(lambda: deque(maxlen=self.history_size))
         self.buffer_size = 10  # Number of frames to buffer for aggregation
+        # Per-frame features buffered for temporal aggregation (oldest frames are evicted automatically)
+        # Each frame is extracted once instead of re-extracting the whole window every frame,
+        # and kept as a row of a float32 window array rather than as a dictionary
+        self.student_feature_buffer = defaultdict(lambda: FeatureWindow(self.buffer_size))
         self.frame_count = 0
         
+        # Last prediction per student keyed by ROI dHash: {student_id: (roi_hash, features, predictions, engagement_score)}
+        # Reused while the student's ROI stays visually unchanged (None disables)
+        self.roi_cache_distance = self.config['cctv'].get('roi_cache_distance', 4)
+        self._roi_hash_cache: Dict[int, tuple] = {}
+        
+        # Draw visualizations through OpenCV's OpenCL T-API when a device is available
+        self.use_opencl = self.config['cctv'].get('opencl_visualization', False) and cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+        
+        # Black stats panel blended into rows 10-150 / cols 10-400 of every visualized frame
+        self._panel = np.zeros((141, 391, 3), dtype=np.uint8)
+        
         print("✅ Engagement Processor initialized!")
     
+    @staticmethod
+    def _roi_hash(roi: np.ndarray) -> int:
+        """Compute a 64-bit difference hash (dHash) of a student ROI (RGB)"""
+        gray = cv2.cvtColor(roi, cv2.COLOR_RGB2GRAY)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        
+        # One bit per horizontally adjacent pixel pair
+        return dhash64(small)
+    
     def process_frame(self, frame: np.ndarray) -> Dict:
         """
         Process a single frame
@@ -73,136 +380,197 @@ class EngagementProcessor:
         Returns:
             Dictionary with engagement analysis results
         """
-        self.frame_count += 1
+        return self.process_frames_batch([frame])[0]
+    
+    def process_frames_batch(self, frames: List[np.ndarray]) -> List[Dict]:
+        """
+        Process consecutive frames, running the classifier once for the whole batch
         
-        # Detect students
-        students = self.student_detector.detect_students(frame)
+        Args:
+            frames: Consecutive input frames (BGR format)
+            
+        Returns:
+            List of results (same format as process_frame()), one per frame
+        """
+        batch_results = []
         
-        # Assign seat positions
-        seat_assignments = self.student_detector.assign_seat_positions(
-            students,
-            grid_rows=self.config['cctv']['seat_mapping']['grid_rows'],
-            grid_cols=self.config['cctv']['seat_mapping']['grid_cols']
-        )
+        # Students ready for prediction across the batch: (frame_number, student_result, feature_vector, roi_hash)
+        pending_predictions = []
+        use_roi_cache = self.classifier.is_trained and self.roi_cache_distance is not None
         
-        # Analyze each student
-        student_results = []
+        # Detect students in all frames with one batched tracker call
+        batch_students = self.student_detector.detect_students_batch(frames)
         
-        for student in students:
-            student_id = student['id']
-            roi = student['roi']
-            
-            if roi.size == 0:
-                continue
-            
-            # Buffer frames for this student
-            self.student_frame_buffer[student_id].append(roi)
+        for frame, students in zip(frames, batch_students):
+            self.frame_count += 1
             
-            # Keep only last N frames
-            if len(self.student_frame_buffer[student_id]) > self.buffer_size:
-                self.student_frame_buffer[student_id].pop(0)
+            # Assign seat positions
+            seat_assignments = self.student_detector.assign_seat_positions(
+                students,
+                grid_rows=self.config['cctv']['seat_mapping']['grid_rows'],
+                grid_cols=self.config['cctv']['seat_mapping']['grid_cols'],
+                frame_shape=frame.shape
+            )
             
-            # Extract features with temporal aggregation
-            buffered_frames = self.student_frame_buffer[student_id]
+            # Analyze each student
+            student_results = []
             
-            if len(buffered_frames) >= 5:  # Need at least 5 frames for meaningful aggregation
-                # Use extract_video_features with aggregation (same as training)
-                features = self.feature_aggregator.extract_video_features(buffered_frames, aggregate=True)
-            else:
-                # Not enough frames yet, use single frame features
-                # Pad with zeros to match expected 92 features
-                frame_features = self.feature_aggregator.extract_frame_features(roi)
-                feature_names = self.feature_aggregator.get_feature_names(frame_features)
-                feature_vector = self.feature_aggregator.features_to_vector(frame_features, feature_names)
+            for student in students:
+                student_id = student['id']
+                roi = student['roi']
+                
+                if roi.size == 0:
+                    continue
+                
+                feature_buffer = self.student_feature_buffer[student_id]
                 
-                # Skip prediction until we have enough frames
-                predictions = None
-                engagement_score = 0.0
+                # Reuse the last prediction if the student's ROI has barely changed since
+                roi_hash = self._roi_hash(roi) if use_roi_cache else None
+                cached = self._roi_hash_cache.get(student_id) if use_roi_cache else None
                 
+                if cached is not None and bin(cached[0] ^ roi_hash).count('1') <= self.roi_cache_distance:
+                    _, features, predictions, engagement_score = cached
+                    
+                    # Near-identical ROI, so repeat its last per-frame features in the window
+                    feature_buffer.repeat_last()
+                    
+                    student_results.append({
+                        'id': student_id,
+                        'bbox': student['bbox'],
+                        'seat': seat_assignments.get(student_id, {}),
+                        'predictions': predictions,
+                        'engagement_score': engagement_score,
+                        'features': features
+                    })
+                    
+                    self.student_engagement_history[student_id].append({
+                        'frame': self.frame_count,
+                        'predictions': predictions,
+                        'engagement_score': engagement_score
+                    })
+                    continue
+                
+                # Features are only extracted when they are predicted on or stored
+                if self.classifier.is_trained or self.store_features:
+                    frame_features = self.feature_aggregator.extract_frame_features(roi, is_rgb=True)
+                    feature_buffer.append(frame_features)
+                    
+                    if len(feature_buffer) >= 5:  # Need at least 5 frames for meaningful aggregation
+                        # Aggregate buffered frame features (same statistics as training)
+                        features = feature_buffer.aggregate()
+                    else:
+                        # Not enough frames yet, keep single frame features for storage
+                        features = frame_features
+                else:
+                    features = None
+                
+                ready_to_predict = self.classifier.is_trained and len(feature_buffer) >= 5
+                
+                # Compile student result (predictions are filled in after the batch)
                 student_result = {
                     'id': student_id,
                     'bbox': student['bbox'],
                     'seat': seat_assignments.get(student_id, {}),
-                    'predictions': predictions,
-                    'engagement_score': engagement_score,
-                    'features': frame_features
+                    'predictions': None,
+                    'engagement_score': 0.0,
+                    'features': features if self.store_features else None
                 }
+                
+                # Queue for prediction once enough frames are buffered
+                if ready_to_predict:
+                    # Convert features to a vector in the classifier's training column order, so
+                    # every student's row has the same width (missing features are 0.0)
+                    feature_vector = self.feature_aggregator.features_to_vector(
+                        features, self.classifier.feature_names
+                    )
+                    pending_predictions.append((self.frame_count, student_result, feature_vector, roi_hash))
+                
                 student_results.append(student_result)
-                continue
             
-            # Predict engagement if model is trained
-            if self.classifier.is_trained:
-                # Convert features to vector
-                feature_names = self.feature_aggregator.get_feature_names(features)
-                feature_vector = self.feature_aggregator.features_to_vector(features, feature_names)
+            batch_results.append({
+                'frame_number': self.frame_count,
+                'total_students': len(students),
+                'student_results': student_results
+            })
+        
+        # Predict all queued students in a single classifier call
+        if pending_predictions:
+            X = np.vstack([feature_vector for _, _, feature_vector, _ in pending_predictions])
+            batch_predictions = self.classifier.predict(X)
+            batch_scores = self.classifier.get_engagement_scores(batch_predictions).tolist()
+            
+            for i, (frame_number, student_result, _, roi_hash) in enumerate(pending_predictions):
+                predictions = {state: float(pred[i]) for state, pred in batch_predictions.items()}
+                engagement_score = batch_scores[i]
                 
-                # Predict
-                predictions = self.classifier.predict_single(feature_vector)
-                engagement_score = self.classifier.get_engagement_score(predictions)
+                student_result['predictions'] = predictions
+                student_result['engagement_score'] = engagement_score
+                
+                if roi_hash is not None:
+                    self._roi_hash_cache[student_result['id']] = (
+                        roi_hash, student_result['features'], predictions, engagement_score
+                    )
                 
                 # Store in history
-                self.student_engagement_history[student_id].append({
-                    'frame': self.frame_count,
+                self.student_engagement_history[student_result['id']].append({
+                    'frame': frame_number,
                     'predictions': predictions,
                     'engagement_score': engagement_score
                 })
-            else:
-                predictions = None
-                engagement_score = 0.0
-            
-            # Compile student result
-            student_result = {
-                'id': student_id,
-                'bbox': student['bbox'],
-                'seat': seat_assignments.get(student_id, {}),
-                'predictions': predictions,
-                'engagement_score': engagement_score,
-                'features': features
-            }
-            
-            student_results.append(student_result)
         
         # Calculate class-wide metrics
-        if student_results:
-            engagement_scores = [s['engagement_score'] for s in student_results]
-            class_engagement = np.mean(engagement_scores)
+        for results in batch_results:
+            student_results = results['student_results']
             
-            # Count engagement levels
-            highly_engaged = sum(1 for s in engagement_scores if s > 0.7)
-            moderately_engaged = sum(1 for s in engagement_scores if 0.4 <= s <= 0.7)
-            disengaged = sum(1 for s in engagement_scores if s < 0.4)
-        else:
-            class_engagement = 0.0
-            highly_engaged = 0
-            moderately_engaged = 0
-            disengaged = 0
-        
-        results = {
-            'frame_number': self.frame_count,
-            'total_students': len(students),
-            'student_results': student_results,
-            'class_engagement': class_engagement,
-            'highly_engaged': highly_engaged,
-            'moderately_engaged': moderately_engaged,
-            'disengaged': disengaged
-        }
-        
-        return results
+            if student_results:
+                engagement_scores = np.fromiter(
+                    (s['engagement_score'] for s in student_results),
+                    dtype=np.float64,
+                    count=len(student_results)
+                )
+                class_engagement = engagement_scores.mean()
+                
+                # Count engagement levels
+                highly_engaged = int(np.count_nonzero(engagement_scores > 0.7))
+                disengaged = int(np.count_nonzero(engagement_scores < 0.4))
+                moderately_engaged = len(student_results) - highly_engaged - disengaged
+            else:
+                class_engagement = 0.0
+                highly_engaged = 0
+                moderately_engaged = 0
+                disengaged = 0
+            
+            results.update({
+                'class_engagement': class_engagement,
+                'highly_engaged': highly_engaged,
+                'moderately_engaged': moderately_engaged,
+                'disengaged': disengaged
+            })
+        
+        return batch_results
     
-    def process_video(self, video_path: str, skip_frames: int = 1) -> List[Dict]:
+    def process_video(self, video_path: str, skip_frames: int = 1,
+                      num_workers: int = 1,
+                      output_path: Optional[str] = None) -> Union[List[Dict], str]:
         """
         Process entire video file
         
         Args:
             video_path: Path to video file
             skip_frames: Process every Nth frame
+            num_workers: Worker processes to split the video across (1 = process here)
+            output_path: Stream per-frame records to this .npy file instead of
+                         keeping every frame result in memory (see frame_record_dtype)
             
         Returns:
-            List of frame results
+            List of frame results, or output_path if given (load with np.load(..., mmap_mode='r'))
         """
         print(f"\nProcessing video: {video_path}")
         
-        cap = cv2.VideoCapture(video_path)
+        cap = open_video_capture(
+            video_path,
+            decode_backend=self.config['cctv'].get('decode_backend', 'cpu')
+        )
         
         if not cap.isOpened():
             raise ValueError(f"Could not open video: {video_path}")
@@ -214,45 +582,121 @@ class EngagementProcessor:
         print(f"  FPS: {fps}")
         print(f"  Processing every {skip_frames} frame(s)")
         
+        max_students = self.config['cctv']['person_detection']['max_students']
+        
+        # Results are either kept in memory or streamed to disk batch by batch
         all_results = []
-        frame_idx = 0
+        writer = FrameRecordWriter(output_path, max_students) if output_path else None
+        num_processed = 0
+        
+        def handle_results(results: List[Dict]):
+            nonlocal num_processed
+            num_processed += len(results)
+            if writer is not None:
+                writer.write(results)
+            else:
+                all_results.extend(results)
+        
+        if num_workers > 1 and total_frames > 0:
+            cap.release()
+            self._process_video_parallel(video_path, total_frames, skip_frames, num_workers, handle_results)
+            
+            print(f"\n✅ Processed {num_processed} frames")
+            
+            if writer is not None:
+                return writer.close()
+            
+            return all_results
+        
+        # Frames are buffered so the classifier runs once per batch
+        batch_size = self.config['cctv'].get('batch_size', 32)
+        frames = []
+        
+        # Decode on a reader thread so the next batch is decoded while the current one is processed
+        frame_queue = queue.Queue(maxsize=batch_size)
+        stop_event = threading.Event()
+        reader = threading.Thread(
+            target=_read_frames,
+            args=(cap, frame_queue, skip_frames, stop_event),
+            daemon=True
+        )
+        reader.start()
         
         from tqdm import tqdm
         pbar = tqdm(total=total_frames, desc="Processing")
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            
-            if not ret:
-                break
-            
-            # Process frame at intervals
-            if frame_idx % skip_frames == 0:
-                results = self.process_frame(frame)
-                all_results.append(results)
+        try:
+            while (item := frame_queue.get()) is not None:
+                frame_idx, frame = item
+                frames.append(frame)
+                pbar.update(frame_idx + 1 - pbar.n)
+                
+                if len(frames) >= batch_size:
+                    handle_results(self.process_frames_batch(frames))
+                    frames = []
             
-            frame_idx += 1
-            pbar.update(1)
+            # Process remaining partial batch
+            if frames:
+                handle_results(self.process_frames_batch(frames))
         
-        pbar.close()
-        cap.release()
+        finally:
+            stop_event.set()
+            reader.join()
+            pbar.close()
+            cap.release()
         
-        print(f"\n✅ Processed {len(all_results)} frames")
+        print(f"\n✅ Processed {num_processed} frames")
+        
+        if writer is not None:
+            return writer.close()
         
         return all_results
     
-    def visualize_results(self, frame: np.ndarray, results: Dict) -> np.ndarray:
+    def _process_video_parallel(self, video_path: str, total_frames: int, skip_frames: int,
+                                num_workers: int, handle_results: Callable[[List[Dict]], None]):
+        """
+        Process a video as contiguous frame ranges in separate worker processes
+        Each chunk's results are stitched and handed to handle_results as soon as it and
+        all earlier chunks are done, so only unfinished chunks are held in memory
+        """
+        boundaries = np.linspace(0, total_frames, num_workers + 1).astype(int)
+        ranges = [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+        
+        print(f"  Splitting into {len(ranges)} chunks across {num_workers} workers")
+        
+        # Each worker loads its own detectors/classifier (and CUDA context)
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_video_worker,
+                                 initargs=(self.config_path, self.model_dir, self.precision)) as executor:
+            futures = deque(
+                executor.submit(_process_video_chunk, video_path, int(start), int(end), skip_frames)
+                for start, end in ranges
+            )
+            stitcher = _TrackIdStitcher()
+            
+            # Chunks are consumed in order and dropped once handled
+            while futures:
+                handle_results(stitcher.add(futures.popleft().result()))
+    
+    def visualize_results(self, frame: np.ndarray, results: Dict,
+                          inplace: bool = False) -> np.ndarray:
         """
         Visualize engagement analysis on frame
         
         Args:
             frame: Input frame
             results: Results from process_frame()
+            inplace: Draw directly on frame instead of a copy (frame may be modified)
             
         Returns:
             Frame with visualizations
         """
-        vis_frame = frame.copy()
+        # Uploading to a UMat already copies, so the caller's frame is left untouched either way
+        if self.use_opencl:
+            vis_frame = cv2.UMat(frame)
+        else:
+            vis_frame = frame if inplace else frame.copy()
         
         # Draw each student
         for student in results['student_results']:
@@ -281,12 +725,21 @@ class EngagementProcessor:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
         # Draw class-wide metrics
-        h, w = vis_frame.shape[:2]
         
-        # Semi-transparent overlay for stats
-        overlay = vis_frame.copy()
-        cv2.rectangle(overlay, (10, 10), (400, 150), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.6, vis_frame, 0.4, 0, vis_frame)
+        # Semi-transparent overlay for stats (only the panel region is blended)
+        h, w = frame.shape[:2]
+        panel_h, panel_w = max(min(151, h) - 10, 0), max(min(401, w) - 10, 0)
+        
+        if panel_h and panel_w:
+            if self.use_opencl:
+                # Blending a black overlay at 0.6 scales the panel region by 0.4, done in place on the device
+                panel = cv2.UMat(vis_frame, (10, 10 + panel_h), (10, 10 + panel_w))
+                cv2.addWeighted(panel, 0.4, panel, 0, 0, panel)
+            else:
+                region = vis_frame[10:10 + panel_h, 10:10 + panel_w]
+                vis_frame[10:10 + panel_h, 10:10 + panel_w] = cv2.addWeighted(
+                    region, 0.4, self._panel[:panel_h, :panel_w], 0.6, 0
+                )
         
         # Draw stats
         y_offset = 35
@@ -309,13 +762,14 @@ class EngagementProcessor:
         cv2.putText(vis_frame, f"Disengaged: {results['disengaged']}", (20, y_offset),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
         
-        return vis_frame
+        return vis_frame.get() if self.use_opencl else vis_frame
     
     def reset(self):
         """Reset processor state"""
         self.student_detector.reset_tracking()
         self.student_engagement_history.clear()
-        self.student_frame_buffer.clear()
+        self.student_feature_buffer.clear()
+        self._roi_hash_cache.clear()
         self.frame_count = 0
 
 
@@ -328,6 +782,10 @@ if __name__ == "__main__":
     parser.add_argument('--config', type=str, default='configs/config.yaml')
     parser.add_argument('--model-dir', type=str, default='models/trained')
     parser.add_argument('--skip-frames', type=int, default=3)
+    parser.add_argument('--num-workers', type=int, default=1,
+                        help='Worker processes for video files')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Stream per-frame records to this .npy file')
     
     args = parser.parse_args()
     
@@ -337,7 +795,10 @@ if __name__ == "__main__":
     # Determine input type
     if args.input.isdigit():
         # Webcam
-        cap = cv2.VideoCapture(int(args.input))
+        cap = open_video_capture(
+            int(args.input),
+            decode_backend=processor.config['cctv'].get('decode_backend', 'cpu')
+        )
         
         print("Press 'q' to quit")
         
@@ -349,8 +810,8 @@ if __name__ == "__main__":
             # Process frame
             results = processor.process_frame(frame)
             
-            # Visualize
-            vis_frame = processor.visualize_results(frame, results)
+            # Visualize (the frame is not needed afterwards)
+            vis_frame = processor.visualize_results(frame, results, inplace=True)
             
             cv2.imshow('Engagement Analysis', vis_frame)
             
@@ -362,7 +823,17 @@ if __name__ == "__main__":
     
     else:
         # Video file
-        all_results = processor.process_video(args.input, skip_frames=args.skip_frames)
+        if args.output:
+            records = np.load(
+                processor.process_video(args.input, skip_frames=args.skip_frames,
+                                        num_workers=args.num_workers, output_path=args.output),
+                mmap_mode='r'
+            )
+            class_engagement = records['class_engagement']
+        else:
+            all_results = processor.process_video(args.input, skip_frames=args.skip_frames,
+                                                  num_workers=args.num_workers)
+            class_engagement = np.array([r['class_engagement'] for r in all_results])
         
-        print(f"\nProcessed {len(all_results)} frames")
-        print(f"Average class engagement: {np.mean([r['class_engagement'] for r in all_results]):.3f}")
+        print(f"\nProcessed {len(class_engagement)} frames")
+        print(f"Average class engagement: {class_engagement.mean():.3f}")
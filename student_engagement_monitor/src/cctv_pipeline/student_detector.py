@@ -9,6 +9,9 @@ from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 from collections import defaultdict
 
+# COCO class ID of 'person'
+PERSON_CLASS_ID = 0
+
 
 class StudentDetector:
     """
@@ -18,7 +21,10 @@ class StudentDetector:
     
     def __init__(self, model_path: str = 'yolov8n.pt', 
                  confidence_threshold: float = 0.6,
-                 max_students: int = 60):
+                 max_students: int = 60,
+                 half: bool = False,
+                 roi_max_size: Optional[int] = None,
+                 roi_rgb: bool = False):
         """
         Initialize student detector
         
@@ -26,15 +32,29 @@ class StudentDetector:
             model_path: Path to YOLO model
             confidence_threshold: Minimum confidence for detection
             max_students: Maximum number of students to track
+            half: Run inference in FP16 (CUDA only, ignored on CPU)
+            roi_max_size: Downscale student ROIs so their longest side is at most this (None keeps full size)
+            roi_rgb: Convert student ROIs to RGB once at detection time
         """
         self.confidence_threshold = confidence_threshold
+        self.half = half
+        self.roi_max_size = roi_max_size
+        self.roi_rgb = roi_rgb
         self.max_students = max_students
         self.model = None
         self.model_loaded = False
         
         # Tracking
         self.next_student_id = 1
-        self.tracked_students = {}  # {track_id: student_info}
+        self.frame_index = 0
+        
+        # Tracked students stored as parallel arrays, one slot per track
+        self.track_id_to_slot: Dict[int, int] = {}
+        self.track_ids = np.full(max_students, -1, dtype=np.int64)
+        self.track_bboxes = np.zeros((max_students, 4), dtype=np.int32)
+        self.track_centers = np.zeros((max_students, 2), dtype=np.int32)
+        self.track_confidences = np.zeros(max_students, dtype=np.float32)
+        self.track_last_seen = np.full(max_students, -1, dtype=np.int64)
         
         try:
             from ultralytics import YOLO
@@ -64,79 +84,175 @@ class StudentDetector:
         Returns:
             List of detected students with bounding boxes and IDs
         """
-        if not self.model_loaded:
-            return []
+        return self.detect_students_batch([frame])[0]
+    
+    def detect_students_batch(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Detect students in consecutive frames with a single batched YOLO call
         
-        students = []
+        The tracker is updated with the frames in order, so track IDs are
+        consistent with calling detect_students() frame by frame
+        
+        Args:
+            frames: Consecutive input frames (BGR format)
+            
+        Returns:
+            List of detected students for each frame
+        """
+        if not self.model_loaded or not frames:
+            return [[] for _ in frames]
         
         try:
             # Run detection with tracking
             results = self.model.track(
-                frame,
+                frames,
                 persist=True,
                 conf=self.confidence_threshold,
-                classes=[0],  # Person class in COCO
+                classes=[PERSON_CLASS_ID],
+                half=self.half,
                 verbose=False
             )
             
-            for result in results:
-                boxes = result.boxes
-                
-                if boxes is None or len(boxes) == 0:
-                    continue
-                
-                for box in boxes:
-                    # Get class (should be person)
-                    class_id = int(box.cls[0])
-                    class_name = result.names[class_id]
-                    
-                    if class_name != 'person':
-                        continue
-                    
-                    # Get bounding box
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    bbox = (int(x1), int(y1), int(x2), int(y2))
-                    
-                    # Get tracking ID
-                    if box.id is not None:
-                        track_id = int(box.id[0])
-                    else:
-                        track_id = self.next_student_id
-                        self.next_student_id += 1
-                    
-                    # Get confidence
-                    confidence = float(box.conf[0])
-                    
-                    # Calculate center point
-                    center_x = int((x1 + x2) / 2)
-                    center_y = int((y1 + y2) / 2)
-                    
-                    student_info = {
-                        'id': track_id,
-                        'bbox': bbox,
-                        'center': (center_x, center_y),
-                        'confidence': confidence,
-                        'roi': frame[int(y1):int(y2), int(x1):int(x2)]
-                    }
-                    
-                    students.append(student_info)
-                    
-                    # Update tracked students
-                    self.tracked_students[track_id] = student_info
-            
-            # Limit to max students
-            if len(students) > self.max_students:
-                # Keep students with highest confidence
-                students = sorted(students, key=lambda x: x['confidence'], reverse=True)
-                students = students[:self.max_students]
+            return [self._parse_detections(result, frame) for result, frame in zip(results, frames)]
         
         except Exception as e:
             print(f"Error in student detection: {e}")
+            return [[] for _ in frames]
+    
+    def _parse_detections(self, result, frame: np.ndarray) -> List[Dict]:
+        """Convert one frame's YOLO tracking result into student dicts"""
+        students = []
+        boxes = result.boxes
+        self.frame_index += 1
+        
+        if boxes is None or len(boxes) == 0:
+            return students
+        
+        # Move all box data to NumPy once instead of converting per box
+        xyxy = boxes.xyxy.cpu().numpy()
+        confidences = boxes.conf.cpu().numpy()
+        class_ids = boxes.cls.cpu().numpy().astype(np.int32)
+        track_ids = boxes.id.cpu().numpy().astype(np.int64) if boxes.id is not None else None
+        
+        # Keep persons only (integer check, no class-name lookup)
+        person_mask = class_ids == PERSON_CLASS_ID
+        xyxy = xyxy[person_mask]
+        confidences = confidences[person_mask]
+        
+        if track_ids is not None:
+            track_ids = track_ids[person_mask].tolist()
+        else:
+            # No tracker IDs, assign sequential IDs
+            track_ids = list(range(self.next_student_id, self.next_student_id + len(xyxy)))
+            self.next_student_id += len(xyxy)
+        
+        # Limit to max students
+        if len(track_ids) > self.max_students:
+            # Keep students with highest confidence
+            keep = np.argsort(-confidences, kind='stable')[:self.max_students]
+            xyxy = xyxy[keep]
+            confidences = confidences[keep]
+            track_ids = [track_ids[i] for i in keep]
+        
+        # Bounding boxes and center points
+        bboxes = xyxy.astype(np.int32)
+        centers = ((xyxy[:, :2] + xyxy[:, 2:]) / 2).astype(np.int32)
+        
+        # Update tracked students (refresh known tracks first so new tracks never evict them)
+        known_slots = [self.track_id_to_slot[t] for t in track_ids if t in self.track_id_to_slot]
+        self.track_last_seen[known_slots] = self.frame_index
+        slots = [self._get_track_slot(track_id) for track_id in track_ids]
+        self.track_ids[slots] = track_ids
+        self.track_bboxes[slots] = bboxes
+        self.track_centers[slots] = centers
+        self.track_confidences[slots] = confidences
+        self.track_last_seen[slots] = self.frame_index
+        
+        for track_id, bbox, center, confidence in zip(
+            track_ids, map(tuple, bboxes.tolist()), map(tuple, centers.tolist()), confidences.tolist()
+        ):
+            students.append({
+                'id': track_id,
+                'bbox': bbox,
+                'center': center,
+                'confidence': confidence,
+                'roi': self._extract_roi(frame, bbox)
+            })
         
         return students
     
+    def _get_track_slot(self, track_id: int) -> int:
+        """Get the storage slot of a track, reusing the least recently seen slot for new tracks"""
+        slot = self.track_id_to_slot.get(track_id)
+        if slot is not None:
+            return slot
+        
+        slot = int(np.argmin(self.track_last_seen))
+        
+        evicted_id = int(self.track_ids[slot])
+        if evicted_id != -1:
+            del self.track_id_to_slot[evicted_id]
+        
+        # Mark as in use so later new tracks in the same frame pick other slots
+        self.track_ids[slot] = track_id
+        self.track_last_seen[slot] = self.frame_index
+        self.track_id_to_slot[track_id] = slot
+        return slot
+    
+    def get_active_students(self, max_age: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Get tracked students seen within the last max_age frames
+        
+        Args:
+            max_age: Number of frames a track may be missing and still count as active
+            
+        Returns:
+            Dictionary of arrays ('ids', 'bboxes', 'centers', 'confidences', 'last_seen')
+        """
+        active = (self.track_ids != -1) & (self.track_last_seen >= self.frame_index - max_age)
+        
+        return {
+            'ids': self.track_ids[active],
+            'bboxes': self.track_bboxes[active],
+            'centers': self.track_centers[active],
+            'confidences': self.track_confidences[active],
+            'last_seen': self.track_last_seen[active]
+        }
+    
+    def _extract_roi(self, frame: np.ndarray, bbox: Tuple[int, int, int, int]) -> np.ndarray:
+        """
+        Crop a student ROI into its own buffer
+        
+        The crop is copied (and downscaled if larger than roi_max_size) so buffered
+        ROIs stay small and never alias a frame buffer that the decoder reuses.
+        With roi_rgb the copy is the RGB conversion itself, done once per ROI
+        """
+        x1, y1, x2, y2 = bbox
+        roi = frame[max(y1, 0):y2, max(x1, 0):x2]
+        
+        if roi.size == 0:
+            return roi
+        
+        h, w = roi.shape[:2]
+        if self.roi_max_size and max(h, w) > self.roi_max_size:
+            # Keep aspect ratio so landmark-based ratios (EAR, MAR, head pose) are preserved
+            scale = self.roi_max_size / max(h, w)
+            size = (max(int(w * scale), 1), max(int(h * scale), 1))
+            roi = cv2.resize(roi, size, interpolation=cv2.INTER_AREA)
+            
+            # Resized ROI is already a private buffer, so convert in place
+            if self.roi_rgb:
+                cv2.cvtColor(roi, cv2.COLOR_BGR2RGB, dst=roi)
+            return roi
+        
+        if self.roi_rgb:
+            return cv2.cvtColor(roi, cv2.COLOR_BGR2RGB)
+        
+        return roi.copy()
+    
     def assign_seat_positions(self, students: List[Dict], 
-                             grid_rows: int = 5, grid_cols: int = 10) -> Dict:
+                             grid_rows: int = 5, grid_cols: int = 10,
+                             frame_shape: Optional[Tuple[int, int]] = None) -> Dict:
         """
         Assign seat positions to detected students based on spatial location
         
@@ -144,6 +260,7 @@ class StudentDetector:
             students: List of detected students
             grid_rows: Number of rows in classroom grid
             grid_cols: Number of columns in classroom grid
+            frame_shape: (height, width) of the frame, assumes 1080p if not given
             
         Returns:
             Dictionary mapping student IDs to seat positions
@@ -151,38 +268,37 @@ class StudentDetector:
         if not students:
             return {}
         
-        seat_assignments = {}
+        frame_h, frame_w = frame_shape[:2] if frame_shape is not None else (1080, 1920)
         
-        # Get frame dimensions (assuming all students from same frame)
-        # We'll use normalized positions
+        # Normalize all centers to 0-1 range at once
+        centers = np.fromiter(
+            (c for student in students for c in student['center']),
+            dtype=np.float32,
+            count=2 * len(students)
+        ).reshape(-1, 2)
+        positions = centers / np.array([frame_w, frame_h], dtype=np.float32)
         
-        for student in students:
-            center_x, center_y = student['center']
-            
-            # Normalize to 0-1 range (assuming typical frame size)
-            # In practice, you'd get actual frame dimensions
-            norm_x = center_x / 1920  # Assuming 1080p
-            norm_y = center_y / 1080
-            
-            # Map to grid position
-            col = int(norm_x * grid_cols)
-            row = int(norm_y * grid_rows)
-            
-            # Clamp to valid range
-            col = max(0, min(col, grid_cols - 1))
-            row = max(0, min(row, grid_rows - 1))
-            
-            # Calculate seat number (row-major order)
-            seat_number = row * grid_cols + col + 1
-            
-            seat_assignments[student['id']] = {
+        # Map to grid position and clamp to valid range
+        grid = np.clip(
+            (positions * [grid_cols, grid_rows]).astype(np.int32),
+            0,
+            [grid_cols - 1, grid_rows - 1]
+        )
+        
+        # Calculate seat numbers (row-major order)
+        seat_numbers = grid[:, 1] * grid_cols + grid[:, 0] + 1
+        
+        return {
+            student['id']: {
                 'seat_number': seat_number,
                 'row': row,
                 'col': col,
-                'position': (norm_x, norm_y)
+                'position': position
             }
-        
-        return seat_assignments
+            for student, seat_number, (col, row), position in zip(
+                students, seat_numbers.tolist(), grid.tolist(), map(tuple, positions.tolist())
+            )
+        }
     
     def visualize_detections(self, frame: np.ndarray, students: List[Dict],
                             seat_assignments: Optional[Dict] = None) -> np.ndarray:
@@ -232,8 +348,11 @@ class StudentDetector:
     
     def reset_tracking(self):
         """Reset tracking state"""
-        self.tracked_students.clear()
         self.next_student_id = 1
+        self.frame_index = 0
+        self.track_id_to_slot.clear()
+        self.track_ids.fill(-1)
+        self.track_last_seen.fill(-1)
 
 
 if __name__ == "__main__":
@@ -265,7 +384,7 @@ if __name__ == "__main__":
         students = detector.detect_students(frame)
         
         # Assign seats
-        seat_assignments = detector.assign_seat_positions(students)
+        seat_assignments = detector.assign_seat_positions(students, frame_shape=frame.shape)
         
         # Visualize
         vis_frame = detector.visualize_detections(frame, students, seat_assignments)
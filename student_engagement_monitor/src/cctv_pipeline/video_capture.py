@@ -0,0 +1,269 @@
+"""
+Video Capture
+Opens CCTV video sources and output writers with optional hardware acceleration
+"""
+
+import cv2
+import queue
+import numpy as np
+from fractions import Fraction
+from typing import Tuple, Optional, Union
+
+
+class TorchCodecCapture:
+    """
+    NVDEC-backed video reader built on torchcodec
+    Mirrors the subset of the cv2.VideoCapture interface used by the pipeline
+    so it can be swapped in transparently
+    """
+
+    def __init__(self, video_path: str, device: str = 'cuda', num_threads: int = 8):
+        """
+        Initialize decoder
+
+        Args:
+            video_path: Path to video file
+            device: Torch device used for decoding
+            num_threads: FFmpeg threads used for demuxing
+        """
+        from torchcodec.decoders import VideoDecoder
+
+        self.decoder = VideoDecoder(
+            video_path,
+            device=device,
+            num_ffmpeg_threads=num_threads,
+            seek_mode='approximate'
+        )
+
+        metadata = self.decoder.metadata
+        self.num_frames = len(self.decoder)
+        self.properties = {
+            cv2.CAP_PROP_FPS: float(metadata.average_fps or 0.0),
+            cv2.CAP_PROP_FRAME_COUNT: float(self.num_frames),
+            cv2.CAP_PROP_FRAME_WIDTH: float(metadata.width),
+            cv2.CAP_PROP_FRAME_HEIGHT: float(metadata.height)
+        }
+
+        self.position = -1
+        self.opened = True
+
+    def isOpened(self) -> bool:
+        return self.opened
+
+    def get(self, prop_id: int) -> float:
+        return self.properties.get(prop_id, 0.0)
+
+    def set(self, prop_id: int, value: float) -> bool:
+        """Seek with CAP_PROP_POS_FRAMES (other properties are read-only)"""
+        if prop_id != cv2.CAP_PROP_POS_FRAMES:
+            return False
+
+        # Next grab() returns frame `value`
+        self.position = int(value) - 1
+        return True
+
+    def grab(self) -> bool:
+        """Advance to the next frame without decoding it"""
+        if not self.opened or self.position + 1 >= self.num_frames:
+            return False
+
+        self.position += 1
+        return True
+
+    def retrieve(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Decode the current frame and return it as a BGR array"""
+        if not self.opened or self.position < 0:
+            return False, None
+
+        # Decoded frames are RGB CHW tensors; downstream detectors expect BGR HWC arrays
+        frame = self.decoder[self.position]
+        frame = frame.permute(1, 2, 0).flip(-1).contiguous().cpu().numpy()
+
+        return True, frame
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        self.opened = False
+        self.decoder = None
+
+
+def _open_opencv_capture(cap: cv2.VideoCapture, source: Union[str, int],
+                         decode_backend: str = 'cpu') -> cv2.VideoCapture:
+    """Open a source on an existing cv2.VideoCapture, using NVDEC when requested"""
+    # Webcams are not decoded through FFmpeg, so hardware decoding only applies to files/streams
+    if decode_backend in ('cuvid', 'torchcodec') and not isinstance(source, int):
+        cap.open(source, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+            cv2.CAP_PROP_HW_DEVICE, 0
+        ])
+
+        if cap.isOpened():
+            return cap
+
+        print("⚠️  Warning: Hardware decoding unavailable, falling back to software decoder")
+
+    cap.open(source)
+    return cap
+
+
+def open_video_capture(source: Union[str, int], decode_backend: str = 'cpu'):
+    """
+    Open a video source for frame-by-frame reading
+
+    Args:
+        source: Video file path, RTSP URL or webcam index
+        decode_backend: 'cpu' for software decoding, 'cuvid' for NVDEC decoding
+                        through OpenCV, 'torchcodec' for NVDEC decoding through torchcodec
+
+    Returns:
+        Opened capture object (check isOpened() before use)
+    """
+    is_file = isinstance(source, str) and '://' not in source
+
+    # torchcodec only handles seekable files; streams fall through to OpenCV
+    if decode_backend == 'torchcodec' and is_file:
+        try:
+            return TorchCodecCapture(source)
+        except ImportError:
+            print("⚠️  Warning: torchcodec not installed, falling back to OpenCV decoder")
+        except Exception as e:
+            print(f"⚠️  Warning: Could not open video with torchcodec: {e}")
+
+    cap = _open_opencv_capture(cv2.VideoCapture(), source, decode_backend)
+
+    # Keep only the newest webcam frame so slow processing never reads stale frames
+    if isinstance(source, int) and cap.isOpened():
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    return cap
+
+
+class DecoderPool:
+    """
+    Pool of reusable cv2.VideoCapture objects
+    Lets a long-running worker open successive videos on existing capture
+    objects instead of constructing a new one per video
+    """
+
+    def __init__(self, size: int = 1, decode_backend: str = 'cpu'):
+        """
+        Initialize pool
+
+        Args:
+            size: Maximum number of idle captures kept for reuse
+            decode_backend: Decode backend passed to open_video_capture
+        """
+        self.decode_backend = decode_backend
+        self._pool = queue.Queue(maxsize=max(size, 1))
+
+    def acquire(self, source: Union[str, int]):
+        """
+        Open a video source, reusing an idle capture when one is available
+
+        Args:
+            source: Video file path, RTSP URL or webcam index
+
+        Returns:
+            Opened capture object (check isOpened() before use)
+        """
+        # torchcodec decoders are bound to one file, so only OpenCV captures are pooled
+        if self.decode_backend == 'torchcodec':
+            return open_video_capture(source, self.decode_backend)
+
+        try:
+            cap = self._pool.get_nowait()
+        except queue.Empty:
+            cap = cv2.VideoCapture()
+
+        return _open_opencv_capture(cap, source, self.decode_backend)
+
+    def release(self, cap):
+        """Close the current source and return the capture to the pool"""
+        cap.release()
+
+        if isinstance(cap, cv2.VideoCapture):
+            try:
+                self._pool.put_nowait(cap)
+            except queue.Full:
+                pass
+
+
+class NvencVideoWriter:
+    """
+    H.264 writer using NVENC hardware encoding through PyAV
+    Mirrors the cv2.VideoWriter write()/release() interface
+    """
+
+    def __init__(self, output_path: str, fps: float, frame_size: Tuple[int, int]):
+        """
+        Initialize encoder
+
+        Args:
+            output_path: Output video path
+            fps: Output frame rate
+            frame_size: (width, height) of written frames (must be even)
+        """
+        import av
+
+        self.container = av.open(output_path, 'w')
+
+        try:
+            self.stream = self.container.add_stream('h264_nvenc', rate=Fraction(fps).limit_denominator(1000))
+            self.stream.width, self.stream.height = frame_size
+            self.stream.pix_fmt = 'yuv420p'
+
+            # Open now so a missing GPU/encoder fails here rather than on the first frame
+            self.stream.codec_context.open()
+        except Exception:
+            self.container.close()
+            raise
+
+        self.frame_class = av.VideoFrame
+
+    def write(self, frame: np.ndarray):
+        """Encode a BGR frame"""
+        # Hand the encoder planar YUV directly so no RGB conversion happens in FFmpeg
+        yuv = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+        video_frame = self.frame_class.from_ndarray(yuv, format='yuv420p')
+
+        for packet in self.stream.encode(video_frame):
+            self.container.mux(packet)
+
+    def release(self):
+        """Flush encoder and close file"""
+        for packet in self.stream.encode():
+            self.container.mux(packet)
+        self.container.close()
+
+
+def open_video_writer(output_path: str, fps: float, frame_size: Tuple[int, int],
+                      encode_backend: str = 'cpu'):
+    """
+    Open a video writer for annotated output
+
+    Args:
+        output_path: Output video path
+        fps: Output frame rate
+        frame_size: (width, height) of written frames
+        encode_backend: 'cpu' for OpenCV MPEG-4 encoding, 'nvenc' for NVENC H.264 encoding
+
+    Returns:
+        Writer with write(frame) and release() methods
+    """
+    width, height = frame_size
+
+    # NVENC with yuv420p needs even dimensions
+    if encode_backend == 'nvenc' and width % 2 == 0 and height % 2 == 0:
+        try:
+            return NvencVideoWriter(output_path, fps, frame_size)
+        except ImportError:
+            print("⚠️  Warning: PyAV not installed, falling back to OpenCV encoder")
+        except Exception as e:
+            print(f"⚠️  Warning: NVENC encoder unavailable ({e}), falling back to OpenCV encoder")
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_path, fourcc, fps, frame_size)
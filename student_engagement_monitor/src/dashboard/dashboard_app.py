@@ -3,11 +3,15 @@ Streamlit Dashboard for Student Engagement Monitoring
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
-import json
+import orjson
+import io
+import os
+import importlib.util
 import sys
 from datetime import datetime
 
@@ -20,6 +24,290 @@ st.set_page_config(
     layout="wide"
 )
 
+
+# Maximum points drawn per timeline trace
+MAX_TIMELINE_POINTS = 2000
+
+# Parquet export and Arrow timeline construction need pyarrow
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+
+# Frame buckets (roughly one per chart pixel column) of the engagement min/max band
+ENGAGEMENT_BAND_BUCKETS = 1200
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select points with Largest-Triangle-Three-Buckets downsampling
+    Keeps the visual shape (peaks and valleys) of a line with far fewer points
+    
+    Args:
+        x: Sorted x values
+        y: y values
+        n_out: Number of points to keep
+        
+    Returns:
+        Indices of the selected points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # First and last points are always kept, the rest is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        
+        areas = np.abs(
+            (x[prev] - avg_x) * (y[start:end] - y[prev]) -
+            (x[prev] - x[start:end]) * (avg_y - y[prev])
+        )
+        prev = start + int(np.argmax(areas))
+        selected[i + 1] = prev
+    
+    return selected
+
+
+def minmax_envelope(timeline_df: pd.DataFrame, column: str, n_buckets: int) -> pd.DataFrame:
+    """
+    Aggregate a timeline column into equal-width frame buckets
+    
+    Args:
+        timeline_df: Timeline with a 'frame' column
+        column: Column to aggregate
+        n_buckets: Number of frame buckets
+        
+    Returns:
+        DataFrame with the mean frame and the min, max and mean value of each non-empty bucket
+    """
+    frames = timeline_df['frame'].values
+    edges = np.linspace(frames.min(), frames.max(), n_buckets + 1)
+    buckets = np.clip(np.digitize(frames, edges) - 1, 0, n_buckets - 1)
+    
+    grouped = timeline_df.groupby(buckets)
+    
+    return pd.DataFrame({
+        'frame': grouped['frame'].mean(),
+        'min': grouped[column].min(),
+        'max': grouped[column].max(),
+        'mean': grouped[column].mean()
+    })
+
+
+@st.cache_data(show_spinner=False)
+def list_reports(reports_dir: str, dir_mtime: float) -> list:
+    """
+    List JSON reports, newest first
+    Cached per directory modification time, so reruns only rescan after reports are added or removed
+    """
+    with os.scandir(reports_dir) as entries:
+        reports = [(entry.stat().st_mtime, entry.path) for entry in entries
+                   if entry.name.endswith('.json') and entry.is_file()]
+    
+    return [Path(path) for _, path in sorted(reports, reverse=True)]
+
+
+# Reports are cached by content so widget reruns skip parsing and figure construction
+@st.cache_data(show_spinner=False)
+def load_report(report_bytes: bytes) -> dict:
+    """Parse a JSON engagement report"""
+    return orjson.loads(report_bytes)
+
+
+@st.cache_data(show_spinner=False)
+def load_timeline(report_bytes: bytes) -> pd.DataFrame:
+    """Build the timeline DataFrame of a report (column-wise through Arrow when available)"""
+    timeline = load_report(report_bytes)['timeline']
+    
+    if PYARROW_AVAILABLE:
+        return pa.Table.from_pylist(timeline).to_pandas()
+    
+    return pd.DataFrame(timeline)
+
+
+@st.cache_data(show_spinner=False)
+def build_timeline_figures(report_bytes: bytes):
+    """Build the timeline DataFrame, CSV export and Plotly figures of a report"""
+    timeline_df = load_timeline(report_bytes)
+    
+    # Long recordings are downsampled for the line charts (the histogram uses every frame)
+    students_idx = lttb_indices(timeline_df['frame'].values, timeline_df['students'].values,
+                                MAX_TIMELINE_POINTS)
+    students_df = timeline_df.iloc[students_idx]
+    
+    # Create engagement timeline chart
+    fig = go.Figure()
+    
+    if len(timeline_df) > ENGAGEMENT_BAND_BUCKETS:
+        # Draw per-bucket min/max as a translucent band behind the mean line
+        envelope = minmax_envelope(timeline_df, 'engagement', ENGAGEMENT_BAND_BUCKETS)
+        
+        fig.add_trace(go.Scattergl(
+            x=envelope['frame'],
+            y=envelope['min'],
+            mode='lines',
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+        
+        fig.add_trace(go.Scattergl(
+            x=envelope['frame'],
+            y=envelope['max'],
+            mode='lines',
+            name='Engagement Range',
+            line=dict(width=0),
+            fill='tonexty',
+            fillcolor='rgba(31, 119, 180, 0.2)',
+            hoverinfo='skip'
+        ))
+        
+        fig.add_trace(go.Scattergl(
+            x=envelope['frame'],
+            y=envelope['mean'],
+            mode='lines',
+            name='Class Engagement',
+            line=dict(color='#1f77b4', width=2)
+        ))
+    else:
+        fig.add_trace(go.Scattergl(
+            x=timeline_df['frame'],
+            y=timeline_df['engagement'],
+            mode='lines',
+            name='Class Engagement',
+            line=dict(color='#1f77b4', width=2),
+            fill='tozeroy',
+            fillcolor='rgba(31, 119, 180, 0.2)'
+        ))
+    
+    fig.update_layout(
+        title="Class Engagement Timeline",
+        xaxis_title="Frame Number",
+        yaxis_title="Engagement Score",
+        yaxis_range=[0, 1],
+        hovermode='x unified',
+        height=400
+    )
+    
+    # Student count over time
+    fig2 = go.Figure()
+    
+    fig2.add_trace(go.Scattergl(
+        x=students_df['frame'],
+        y=students_df['students'],
+        mode='lines',
+        name='Students Detected',
+        line=dict(color='#2ca02c', width=2)
+    ))
+    
+    fig2.update_layout(
+        title="Students Detected Over Time",
+        xaxis_title="Frame Number",
+        yaxis_title="Number of Students",
+        hovermode='x unified',
+        height=300
+    )
+    
+    # Engagement distribution histogram
+    fig3 = px.histogram(
+        timeline_df,
+        x='engagement',
+        nbins=20,
+        title="Distribution of Engagement Scores",
+        labels={'engagement': 'Engagement Score', 'count': 'Frequency'},
+        color_discrete_sequence=['#1f77b4']
+    )
+    
+    fig3.update_layout(height=300)
+    
+    return fig, fig2, fig3
+
+
+@st.cache_data(show_spinner=False)
+def export_timeline(report_bytes: bytes, file_format: str) -> bytes:
+    """Serialize the timeline of a report as 'parquet' or 'csv' bytes"""
+    timeline_df = load_timeline(report_bytes)
+    
+    if file_format == 'parquet':
+        buffer = io.BytesIO()
+        timeline_df.to_parquet(buffer, engine='pyarrow', compression='zstd', index=False)
+        return buffer.getvalue()
+    
+    return timeline_df.to_csv(index=False).encode()
+
+
+# Fragments (Streamlit >= 1.33) rerun on their own widget interactions without rerunning the page
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+
+@fragment
+def render_timeline(report_bytes: bytes):
+    """Render the timeline charts and export buttons of a report"""
+    # Timeline visualization
+    st.subheader("📉 Engagement Over Time")
+    
+    fig, fig2, fig3 = build_timeline_figures(report_bytes)
+    
+    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(fig2, use_container_width=True)
+    
+    # Engagement distribution
+    st.subheader("📊 Engagement Distribution")
+    st.plotly_chart(fig3, use_container_width=True)
+    
+    # Download processed report
+    st.markdown("---")
+    st.subheader("💾 Export Data")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        # Download timeline as Parquet (compact binary, much faster to write than CSV)
+        if PYARROW_AVAILABLE:
+            st.download_button(
+                label="Download Timeline Parquet",
+                data=export_timeline(report_bytes, 'parquet'),
+                file_name="engagement_timeline.parquet",
+                mime="application/octet-stream"
+            )
+        else:
+            st.caption("Install pyarrow to export Parquet")
+    
+    with col2:
+        # Download timeline as CSV
+        st.download_button(
+            label="Download Timeline CSV",
+            data=export_timeline(report_bytes, 'csv'),
+            file_name="engagement_timeline.csv",
+            mime="text/csv"
+        )
+    
+    with col3:
+        # Download full report (the original JSON bytes, no re-encoding)
+        st.download_button(
+            label="Download Full Report JSON",
+            data=report_bytes,
+            file_name="engagement_report.json",
+            mime="application/json"
+        )
+
+
 # Title
 st.title("📚 Student Engagement Monitoring System")
 st.markdown("---")
@@ -60,7 +348,7 @@ else:  # Report Analysis
     # Or select from existing reports
     reports_dir = Path('outputs/reports')
     if reports_dir.exists():
-        report_files = list(reports_dir.glob('*.json'))
+        report_files = list_reports(str(reports_dir), reports_dir.stat().st_mtime)
         if report_files:
             st.markdown("### Or select an existing report:")
             selected_report = st.selectbox(
@@ -76,12 +364,15 @@ else:  # Report Analysis
     
     # Load report
     report_data = None
+    report_bytes = None
     
     if uploaded_file:
-        report_data = json.load(uploaded_file)
+        report_bytes = uploaded_file.getvalue()
     elif selected_report:
-        with open(selected_report, 'r') as f:
-            report_data = json.load(f)
+        report_bytes = selected_report.read_bytes()
+    
+    if report_bytes:
+        report_data = load_report(report_bytes)
     
     if report_data:
         # Display metadata
@@ -134,96 +425,7 @@ else:  # Report Analysis
         
         st.markdown("---")
         
-        # Timeline visualization
-        st.subheader("📉 Engagement Over Time")
-        
-        timeline_df = pd.DataFrame(report_data['timeline'])
-        
-        # Create engagement timeline chart
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=timeline_df['frame'],
-            y=timeline_df['engagement'],
-            mode='lines',
-            name='Class Engagement',
-            line=dict(color='#1f77b4', width=2),
-            fill='tozeroy',
-            fillcolor='rgba(31, 119, 180, 0.2)'
-        ))
-        
-        fig.update_layout(
-            title="Class Engagement Timeline",
-            xaxis_title="Frame Number",
-            yaxis_title="Engagement Score",
-            yaxis_range=[0, 1],
-            hovermode='x unified',
-            height=400
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Student count over time
-        fig2 = go.Figure()
-        
-        fig2.add_trace(go.Scatter(
-            x=timeline_df['frame'],
-            y=timeline_df['students'],
-            mode='lines',
-            name='Students Detected',
-            line=dict(color='#2ca02c', width=2)
-        ))
-        
-        fig2.update_layout(
-            title="Students Detected Over Time",
-            xaxis_title="Frame Number",
-            yaxis_title="Number of Students",
-            hovermode='x unified',
-            height=300
-        )
-        
-        st.plotly_chart(fig2, use_container_width=True)
-        
-        # Engagement distribution
-        st.subheader("📊 Engagement Distribution")
-        
-        # Create histogram
-        fig3 = px.histogram(
-            timeline_df,
-            x='engagement',
-            nbins=20,
-            title="Distribution of Engagement Scores",
-            labels={'engagement': 'Engagement Score', 'count': 'Frequency'},
-            color_discrete_sequence=['#1f77b4']
-        )
-        
-        fig3.update_layout(height=300)
-        st.plotly_chart(fig3, use_container_width=True)
-        
-        # Download processed report
-        st.markdown("---")
-        st.subheader("💾 Export Data")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Download timeline as CSV
-            csv = timeline_df.to_csv(index=False)
-            st.download_button(
-                label="Download Timeline CSV",
-                data=csv,
-                file_name="engagement_timeline.csv",
-                mime="text/csv"
-            )
-        
-        with col2:
-            # Download full report
-            st.download_button(
-                label="Download Full Report JSON",
-                data=json.dumps(report_data, indent=2),
-                file_name="engagement_report.json",
-                mime="application/json"
-            )
+        render_timeline(report_bytes)
     
     else:
         st.info("👆 Upload a report or select an existing one to view analysis")
@@ -4,11 +4,30 @@ Loads video clips and labels from the DAiSEE dataset
 """
 
 import os
+import importlib.util
 import pandas as pd
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import numpy as np
 
+# pandas needs pyarrow for feather IO
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# Affective state columns of the DAiSEE label files
+LABEL_COLUMNS = ['Boredom', 'Engagement', 'Confusion', 'Frustration']
+
+# Video file extensions in order of preference
+VIDEO_EXTENSIONS = {'avi': 0, 'mp4': 1, 'mov': 2}
+
+
+def _canonical_clip_id(clip_id) -> str:
+    """Normalize a clip id for label lookups (drop file extension and underscores)"""
+    clip_id = str(clip_id)
+    stem, dot, extension = clip_id.rpartition('.')
+    if dot and extension.lower() in VIDEO_EXTENSIONS:
+        clip_id = stem
+    return clip_id.replace('_', '')
+
 
 class DAiSEEDataLoader:
     """
@@ -21,23 +40,31 @@ class DAiSEEDataLoader:
     - Each video folder contains a video clip
     """
     
-    def __init__(self, dataset_root: str, split: str = 'Train'):
+    def __init__(self, dataset_root: str, split: str = 'Train', use_cache: bool = True):
         """
         Initialize dataset loader
         
         Args:
             dataset_root: Root directory of DAiSEE dataset
             split: Dataset split ('Train', 'Test', or 'Validation')
+            use_cache: Reuse the video list saved by a previous scan (needs pyarrow)
         """
         self.dataset_root = Path(dataset_root)
         self.split = split
         self.split_path = self.dataset_root / split
+        self.use_cache = use_cache and PYARROW_AVAILABLE
+        self._cache_path = self.dataset_root / '.cache' / f'{split}_videolist.feather'
         
         if not self.split_path.exists():
             raise ValueError(f"Split directory not found: {self.split_path}")
         
         self.video_list = []
         self.labels_df = None
+        self._labels_by_clip_id = {}
+        
+        # Canonical ClipID index and matching (clips, states) label matrix for get_labeled_items()
+        self._label_index = pd.Index([])
+        self._label_matrix = np.empty((0, len(LABEL_COLUMNS)), dtype=np.float32)
         
         # Load video list and labels
         self._load_video_list()
@@ -47,37 +74,111 @@ class DAiSEEDataLoader:
         """Load list of all video files in the split"""
         print(f"Loading {self.split} video list...")
         
+        if self.use_cache and self._load_cached_video_list():
+            print(f"Found {len(self.video_list)} videos in {self.split} split (cached)")
+            return
+        
         # Find all video files
         # Structure: Split/SubjectID/ClipID/ClipID.avi
+        # os.scandir entries cache their type, so no extra stat call per directory
         
-        for subject_dir in self.split_path.iterdir():
-            if not subject_dir.is_dir():
-                continue
-            
-            # Iterate through clip folders
-            for clip_dir in subject_dir.iterdir():
-                if not clip_dir.is_dir():
+        with os.scandir(self.split_path) as subject_entries:
+            for subject_entry in subject_entries:
+                if not subject_entry.is_dir():
                     continue
                 
-                # Look for video file in clip directory
-                # It usually has the same name as the clip directory + extension
-                video_files = list(clip_dir.glob('*.avi')) + list(clip_dir.glob('*.mp4')) + list(clip_dir.glob('*.mov'))
+                # Iterate through clip folders
+                with os.scandir(subject_entry.path) as clip_entries:
+                    for clip_entry in clip_entries:
+                        if not clip_entry.is_dir():
+                            continue
+                        
+                        # Look for video file in clip directory
+                        # It usually has the same name as the clip directory + extension
+                        video_name = self._find_video_file(clip_entry.path, clip_entry.name)
+                        
+                        if video_name:
+                            self.video_list.append({
+                                'path': Path(clip_entry.path, video_name),
+                                'subject_id': subject_entry.name,
+                                'video_id': clip_entry.name,
+                                'clip_id': video_name  # Use filename as clip_id (e.g., 1100011002.avi)
+                            })
+        
+        print(f"Found {len(self.video_list)} videos in {self.split} split")
+        
+        if self.use_cache:
+            self._save_cached_video_list()
+    
+    def _load_cached_video_list(self) -> bool:
+        """
+        Load the video list from the feather cache if it is newer than the split directory
+        
+        Returns:
+            True if the cached list was loaded
+        """
+        if not self._cache_path.exists():
+            return False
+        
+        if self._cache_path.stat().st_mtime <= self.split_path.stat().st_mtime:
+            return False
+        
+        try:
+            cached_df = pd.read_feather(self._cache_path)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not read video list cache: {e}")
+            return False
+        
+        self.video_list = cached_df.to_dict('records')
+        for item in self.video_list:
+            item['path'] = Path(item['path'])
+        
+        return True
+    
+    def _save_cached_video_list(self):
+        """Save the scanned video list to the feather cache"""
+        cache_df = pd.DataFrame(self.video_list, columns=['path', 'subject_id', 'video_id', 'clip_id'])
+        cache_df['path'] = cache_df['path'].astype(str)
+        
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_df.to_feather(self._cache_path, compression='zstd')
+        except OSError as e:
+            print(f"⚠️  Warning: Could not write video list cache: {e}")
+    
+    @staticmethod
+    def _find_video_file(clip_dir: str, clip_name: str) -> Optional[str]:
+        """
+        Find the video file in a clip directory
+        
+        Args:
+            clip_dir: Clip directory path
+            clip_name: Clip directory name
+            
+        Returns:
+            Video file name (.avi preferred over .mp4 and .mov), or None if there is none
+        """
+        # DAiSEE names the video after its clip directory, so probe those names first
+        for extension in VIDEO_EXTENSIONS:
+            video_name = f'{clip_name}.{extension}'
+            if os.path.isfile(os.path.join(clip_dir, video_name)):
+                return video_name
+        
+        # Fall back to scanning the directory when the naming convention doesn't hold
+        best_name = None
+        best_rank = len(VIDEO_EXTENSIONS)
+        
+        with os.scandir(clip_dir) as entries:
+            for entry in entries:
+                rank = VIDEO_EXTENSIONS.get(entry.name.rpartition('.')[2])
                 
-                if video_files:
-                    video_path = video_files[0]
+                if rank is not None and rank < best_rank and entry.is_file():
+                    best_name, best_rank = entry.name, rank
                     
-                    # Extract metadata
-                    subject_id = subject_dir.name
-                    clip_id = video_path.name  # Use filename as clip_id (e.g., 1100011002.avi)
-                    
-                    self.video_list.append({
-                        'path': video_path,
-                        'subject_id': subject_id,
-                        'video_id': clip_dir.name,
-                        'clip_id': clip_id
-                    })
-
-        print(f"Found {len(self.video_list)} videos in {self.split} split")
+                    if rank == 0:
+                        break
+        
+        return best_name
     
     def _load_labels(self):
         """Load labels from Labels folder"""
@@ -100,11 +201,44 @@ class DAiSEEDataLoader:
         
         if label_file.exists():
             print(f"Loading labels from {label_file}")
-            self.labels_df = pd.read_csv(label_file)
+            # The pyarrow engine parses with multiple threads
+            self.labels_df = pd.read_csv(label_file, engine='pyarrow' if PYARROW_AVAILABLE else 'c')
+            
+            # Labels are 0-3, so store them as int8
+            for column in LABEL_COLUMNS:
+                if column in self.labels_df.columns:
+                    self.labels_df[column] = pd.to_numeric(self.labels_df[column], downcast='integer')
+            
+            self._index_labels()
             print(f"Loaded {len(self.labels_df)} label entries")
         else:
             print(f"⚠️  Warning: Label file not found: {label_file}")
     
+    def _index_labels(self):
+        """Build the ClipID -> labels lookup used by get_labels()"""
+        # Missing label columns default to 0
+        label_columns = {
+            column.lower(): (self.labels_df[column].astype(int).tolist() if column in self.labels_df.columns
+                             else [0] * len(self.labels_df))
+            for column in LABEL_COLUMNS
+        }
+        
+        self._labels_by_clip_id = {}
+        
+        for i, clip_id in enumerate(self.labels_df['ClipID'].tolist()):
+            clip_id = _canonical_clip_id(clip_id)
+            
+            # Keep the first entry for duplicated clips
+            if clip_id not in self._labels_by_clip_id:
+                self._labels_by_clip_id[clip_id] = {
+                    name: values[i] for name, values in label_columns.items()
+                }
+        
+        self._label_index = pd.Index(list(self._labels_by_clip_id))
+        self._label_matrix = np.array(
+            [list(labels.values()) for labels in self._labels_by_clip_id.values()], dtype=np.float32
+        ).reshape(-1, len(LABEL_COLUMNS))
+    
     def get_video_paths(self) -> List[Path]:
         """Get list of all video file paths"""
         return [item['path'] for item in self.video_list]
@@ -132,27 +266,39 @@ class DAiSEEDataLoader:
         # DAiSEE labels format: ClipID, Boredom, Engagement, Confusion, Frustration
         # Each on a scale of 0-3
         
-        # Try to find the clip in labels
-        # The ClipID format might vary, so we'll try different formats
-        possible_ids = [
-            clip_id,
-            clip_id.replace('_', ''),
-            clip_id.split('_')[0] + clip_id.split('_')[1] if '_' in clip_id else clip_id
-        ]
-        
-        for pid in possible_ids:
-            matches = self.labels_df[self.labels_df['ClipID'] == pid]
-            if not matches.empty:
-                row = matches.iloc[0]
-                return {
-                    'boredom': int(row.get('Boredom', 0)),
-                    'engagement': int(row.get('Engagement', 0)),
-                    'confusion': int(row.get('Confusion', 0)),
-                    'frustration': int(row.get('Frustration', 0))
-                }
+        # The ClipID format varies (with/without extension or underscores),
+        # so both sides are looked up by their canonical form
+        labels = self._labels_by_clip_id.get(_canonical_clip_id(clip_id))
+        if labels is not None:
+            return dict(labels)
         
         return None
     
+    def get_labeled_items(self, max_videos: Optional[int] = None) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """
+        Get paths and labels of all labelled videos at once
+        
+        Args:
+            max_videos: Only consider the first max_videos videos (None = all)
+            
+        Returns:
+            Tuple of (video paths, labels dictionary of float32 arrays aligned with the paths)
+        """
+        videos = self.video_list[:max_videos]
+        
+        # One index lookup for all clips (-1 where a clip has no labels)
+        rows = self._label_index.get_indexer([_canonical_clip_id(item['clip_id']) for item in videos])
+        labeled = np.flatnonzero(rows >= 0)
+        
+        video_paths = [str(videos[i]['path']) for i in labeled]
+        label_rows = self._label_matrix[rows[labeled]]
+        labels = {
+            column.lower(): label_rows[:, i]
+            for i, column in enumerate(LABEL_COLUMNS)
+        }
+        
+        return video_paths, labels
+    
     def __len__(self) -> int:
         """Get number of videos in dataset"""
         return len(self.video_list)
@@ -185,7 +331,7 @@ class DAiSEEDataLoader:
             stats['labeled_videos'] = len(self.labels_df)
             
             # Calculate label distributions
-            for label in ['Boredom', 'Engagement', 'Confusion', 'Frustration']:
+            for label in LABEL_COLUMNS:
                 if label in self.labels_df.columns:
                     stats[f'{label.lower()}_mean'] = self.labels_df[label].mean()
                     stats[f'{label.lower()}_std'] = self.labels_df[label].std()
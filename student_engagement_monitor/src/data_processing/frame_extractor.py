@@ -5,29 +5,137 @@ Extracts frames from video files for feature extraction
 
 import cv2
 import numpy as np
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict
+from typing import List, Optional, Tuple, Dict, Iterator
 from tqdm import tqdm
 
+try:
+    import av
+    PYAV_AVAILABLE = True
+except ImportError:
+    PYAV_AVAILABLE = False
+
+# Frames decoded between progress bar refreshes
+PROGRESS_INTERVAL = 32
+
+# Threads encoding saved JPEG frames (cv2.imwrite releases the GIL)
+SAVE_WORKERS = 4
+
+
+def _extract_video_frames(extractor: 'FrameExtractor', video_path: str, output_base_dir: str,
+                          save_frames: bool) -> Tuple[str, Optional[np.ndarray]]:
+    """Extract frames from one video of a batch (module level so worker processes can pickle it)"""
+    video_path = Path(video_path)
+    
+    # Create output directory for this video
+    output_dir = Path(output_base_dir) / video_path.stem if save_frames else None
+    
+    try:
+        frames = extractor.extract_frames(
+            str(video_path),
+            str(output_dir) if output_dir else None,
+            save_frames
+        )
+        return video_path.stem, frames
+    except Exception as e:
+        print(f"Error extracting frames from {video_path}: {e}")
+        return video_path.stem, None
+
 
 class FrameExtractor:
     """Extract frames from video files"""
     
-    def __init__(self, target_fps: int = 5, resize: Optional[Tuple[int, int]] = None):
+    def __init__(self, target_fps: int = 5, resize: Optional[Tuple[int, int]] = None,
+                 use_pyav: bool = False, use_gpu: bool = False, output_rgb: bool = False):
         """
         Initialize frame extractor
         
         Args:
             target_fps: Target frames per second to extract
             resize: Optional (width, height) to resize frames
+            use_pyav: Decode with PyAV and sample frames by timestamp instead of OpenCV
+            use_gpu: Decode with NVDEC (cv2.cudacodec) and resize on the GPU
+            output_rgb: Return frames in RGB (converted after resizing) instead of BGR
         """
         self.target_fps = target_fps
         self.resize = resize
+        self.use_pyav = use_pyav
+        self.use_gpu = use_gpu
+        self.output_rgb = output_rgb
+        
+        if use_gpu and not (hasattr(cv2, 'cudacodec') and cv2.cuda.getCudaEnabledDeviceCount() > 0):
+            print("⚠️  Warning: OpenCV was built without CUDA video decoding. Falling back to CPU decoding.")
+            self.use_gpu = False
+        
+        if use_pyav and not PYAV_AVAILABLE:
+            print("⚠️  Warning: av not installed. Falling back to OpenCV decoding.")
+            print("   Install with: pip install av")
+            self.use_pyav = False
+    
+    def iter_frames(self, video_path: str, output_dir: Optional[str] = None,
+                    save_frames: bool = False) -> Iterator[np.ndarray]:
+        """
+        Extract frames from video one at a time
+        Only the frame being consumed is held in memory
+        
+        Args:
+            video_path: Path to video file
+            output_dir: Directory to save frames (if save_frames=True)
+            save_frames: Whether to save frames to disk
+            
+        Yields:
+            Frame arrays (BGR, or RGB if output_rgb)
+        """
+        video_path = Path(video_path)
+        
+        if not video_path.exists():
+            raise FileNotFoundError(f"Video not found: {video_path}")
+        
+        # Create output directory if saving
+        if save_frames and output_dir:
+            output_path = Path(output_dir)
+            output_path.mkdir(parents=True, exist_ok=True)
+        
+        # Frames are JPEG encoded on background threads so decoding is not blocked
+        save_pool = ThreadPoolExecutor(max_workers=SAVE_WORKERS) if save_frames and output_dir else None
+        pending_saves = deque()
+        
+        try:
+            for extracted_count, frame in enumerate(self._sample_frames(video_path)):
+                # Resize if specified (the GPU path already resized on device)
+                if self.resize and not self.use_gpu:
+                    frame = cv2.resize(frame, self.resize)
+                
+                # Save frame if requested
+                if save_pool is not None:
+                    # Bound the frames waiting to be encoded
+                    if len(pending_saves) >= 2 * SAVE_WORKERS:
+                        pending_saves.popleft().result()
+                    
+                    # The BGR frame can be handed over as is when an RGB copy is yielded instead
+                    frame_filename = output_path / f"frame_{extracted_count:04d}.jpg"
+                    pending_saves.append(save_pool.submit(
+                        cv2.imwrite, str(frame_filename), frame if self.output_rgb else frame.copy()
+                    ))
+                
+                # Convert after resizing so fewer pixels are touched
+                if self.output_rgb:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                
+                yield frame
+        finally:
+            if save_pool is not None:
+                save_pool.shutdown(wait=True)
     
     def extract_frames(self, video_path: str, output_dir: Optional[str] = None,
-                      save_frames: bool = False) -> List[np.ndarray]:
+                      save_frames: bool = False) -> np.ndarray:
         """
         Extract frames from video
+        Keeps every frame in memory; prefer iter_frames() for long videos
         
         Args:
             video_path: Path to video file
@@ -35,14 +143,82 @@ class FrameExtractor:
             save_frames: Whether to save frames to disk
             
         Returns:
-            List of frame arrays
+            Array of frames with shape (num_frames, height, width, 3) (BGR, or RGB if output_rgb)
         """
         video_path = Path(video_path)
         
         if not video_path.exists():
             raise FileNotFoundError(f"Video not found: {video_path}")
         
-        # Open video
+        info = self.get_video_info(str(video_path))
+        
+        # Preallocate one contiguous buffer for all sampled frames
+        width, height = self.resize if self.resize else (info['width'], info['height'])
+        num_expected = max(info['frame_count'], 0) // self._frame_interval(info['fps']) + 1
+        frames = np.empty((num_expected, height, width, 3), dtype=np.uint8)
+        
+        extracted_count = 0
+        
+        for frame in self._sample_frames(video_path):
+            # Frame count metadata can be inaccurate, grow the buffer if it runs out
+            if extracted_count == len(frames):
+                frames = np.concatenate([frames, np.empty_like(frames)])
+            
+            # Resize straight into the buffer (the GPU path already resized on device)
+            if self.resize and not self.use_gpu:
+                cv2.resize(frame, self.resize, dst=frames[extracted_count])
+            else:
+                frames[extracted_count] = frame
+            
+            # Convert in place after resizing so fewer pixels are touched
+            if self.output_rgb:
+                cv2.cvtColor(frames[extracted_count], cv2.COLOR_BGR2RGB, dst=frames[extracted_count])
+            
+            extracted_count += 1
+        
+        frames = frames[:extracted_count]
+        
+        # Save frames if requested
+        if save_frames and output_dir:
+            output_path = Path(output_dir)
+            output_path.mkdir(parents=True, exist_ok=True)
+            
+            def save_frame(i: int) -> bool:
+                frame = cv2.cvtColor(frames[i], cv2.COLOR_RGB2BGR) if self.output_rgb else frames[i]
+                return cv2.imwrite(str(output_path / f"frame_{i:04d}.jpg"), frame)
+            
+            with ThreadPoolExecutor(max_workers=SAVE_WORKERS) as save_pool:
+                list(save_pool.map(save_frame, range(len(frames))))
+        
+        print(f"Extracted {extracted_count} frames from {video_path.name}")
+        
+        return frames
+    
+    def _frame_interval(self, original_fps: float) -> int:
+        """Number of decoded frames per sampled frame"""
+        if original_fps > 0:
+            return max(1, int(original_fps / self.target_fps))
+        return 1
+    
+    def _sample_frames(self, video_path: Path) -> Iterator[np.ndarray]:
+        """Yield sampled, not yet resized (except on GPU) frames from the configured decoder"""
+        if self.use_gpu:
+            return self._sample_frames_gpu(video_path)
+        if self.use_pyav:
+            return self._sample_frames_pyav(video_path)
+        return self._sample_frames_opencv(video_path)
+    
+    def _sample_frames_opencv(self, video_path: Path) -> Iterator[np.ndarray]:
+        """
+        Yield every frame_interval-th frame using OpenCV
+        Skipped frames are only grabbed, so they are never converted to BGR or copied
+        
+        Args:
+            video_path: Path to video file
+            
+        Yields:
+            Sampled frames (BGR format)
+        """
         cap = cv2.VideoCapture(str(video_path))
         
         if not cap.isOpened():
@@ -53,54 +229,120 @@ class FrameExtractor:
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
         # Calculate frame skip interval
-        if original_fps > 0:
-            frame_interval = max(1, int(original_fps / self.target_fps))
-        else:
-            frame_interval = 1
+        frame_interval = self._frame_interval(original_fps)
         
-        frames = []
         frame_count = 0
-        extracted_count = 0
         
-        # Create output directory if saving
-        if save_frames and output_dir:
-            output_path = Path(output_dir)
-            output_path.mkdir(parents=True, exist_ok=True)
+        try:
+            with tqdm(total=total_frames, desc=f"Extracting from {video_path.name}") as pbar:
+                while cap.grab():
+                    # Extract frame at intervals
+                    if frame_count % frame_interval == 0:
+                        ret, frame = cap.retrieve()
+                        if not ret:
+                            break
+                        yield frame
+                    
+                    frame_count += 1
+                    if frame_count % PROGRESS_INTERVAL == 0:
+                        pbar.update(PROGRESS_INTERVAL)
+                
+                pbar.update(frame_count % PROGRESS_INTERVAL)
+        finally:
+            cap.release()
+    
+    def _sample_frames_gpu(self, video_path: Path) -> Iterator[np.ndarray]:
+        """
+        Yield every frame_interval-th frame decoded with NVDEC
+        Sampled frames are resized on the GPU and only those are downloaded to host memory
+        
+        Args:
+            video_path: Path to video file
+            
+        Yields:
+            Sampled frames (BGR format)
+        """
+        info = self.get_video_info(str(video_path))
+        
+        # Calculate frame skip interval
+        frame_interval = self._frame_interval(info['fps'])
+        
+        reader = cv2.cudacodec.createVideoReader(str(video_path))
+        reader.set(cv2.cudacodec.ColorFormat_BGR)
+        
+        frame_count = 0
         
-        # Extract frames
-        with tqdm(total=total_frames, desc=f"Extracting from {video_path.name}") as pbar:
+        with tqdm(total=info['frame_count'], desc=f"Extracting from {video_path.name}") as pbar:
             while True:
-                ret, frame = cap.read()
-                
-                if not ret:
-                    break
-                
-                # Extract frame at intervals
-                if frame_count % frame_interval == 0:
-                    # Resize if specified
-                    if self.resize:
-                        frame = cv2.resize(frame, self.resize)
-                    
-                    frames.append(frame)
+                # Skipped frames are decoded but never color converted or downloaded
+                if frame_count % frame_interval != 0:
+                    if not reader.grab():
+                        break
+                else:
+                    ret, gpu_frame = reader.nextFrame()
+                    if not ret:
+                        break
                     
-                    # Save frame if requested
-                    if save_frames and output_dir:
-                        frame_filename = output_path / f"frame_{extracted_count:04d}.jpg"
-                        cv2.imwrite(str(frame_filename), frame)
+                    if self.resize:
+                        gpu_frame = cv2.cuda.resize(gpu_frame, self.resize)
                     
-                    extracted_count += 1
+                    yield gpu_frame.download()
                 
                 frame_count += 1
-                pbar.update(1)
-        
-        cap.release()
+                if frame_count % PROGRESS_INTERVAL == 0:
+                    pbar.update(PROGRESS_INTERVAL)
+            
+            pbar.update(frame_count % PROGRESS_INTERVAL)
+    
+    def _sample_frames_pyav(self, video_path: Path) -> Iterator[np.ndarray]:
+        """
+        Yield the first frame at or after each point of the target_fps sampling grid using PyAV
+        Only sampled frames are converted to BGR arrays
         
-        print(f"Extracted {extracted_count} frames from {video_path.name}")
+        Args:
+            video_path: Path to video file
+            
+        Yields:
+            Sampled frames (BGR format)
+        """
+        container = av.open(str(video_path))
         
-        return frames
+        try:
+            stream = container.streams.video[0]
+            stream.thread_type = 'AUTO'
+            
+            # Below one sample per second keyframes land close enough to the grid, so skip decoding the rest
+            if self.target_fps < 1:
+                stream.codec_context.skip_frame = 'NONKEY'
+            
+            sample_period = 1.0 / self.target_fps
+            next_sample_time = None
+            
+            with tqdm(total=stream.frames or None, desc=f"Extracting from {video_path.name}") as pbar:
+                for decoded_count, frame in enumerate(container.decode(stream), start=1):
+                    if decoded_count % PROGRESS_INTERVAL == 0:
+                        pbar.update(PROGRESS_INTERVAL)
+                    
+                    if frame.pts is None:
+                        continue
+                    
+                    frame_time = float(frame.pts * stream.time_base)
+                    
+                    if next_sample_time is None:
+                        next_sample_time = frame_time
+                    
+                    if frame_time + 1e-6 >= next_sample_time:
+                        yield frame.to_ndarray(format='bgr24')
+                        
+                        # Advance past the current frame so a long gap yields a single sample
+                        while next_sample_time <= frame_time + 1e-6:
+                            next_sample_time += sample_period
+        finally:
+            container.close()
     
     def extract_frames_batch(self, video_paths: List[str], output_base_dir: str,
-                            save_frames: bool = True) -> Dict[str, List[np.ndarray]]:
+                            save_frames: bool = True,
+                            num_workers: Optional[int] = None) -> Dict[str, np.ndarray]:
         """
         Extract frames from multiple videos
         
@@ -108,32 +350,24 @@ class FrameExtractor:
             video_paths: List of video file paths
             output_base_dir: Base directory for saving frames
             save_frames: Whether to save frames to disk
+            num_workers: Worker processes decoding videos in parallel
+                         (None = one per CPU core, 1 = extract in this process)
             
         Returns:
-            Dictionary mapping video names to frame lists
+            Dictionary mapping video names to frame arrays
         """
-        all_frames = {}
+        num_workers = num_workers or os.cpu_count() or 1
+        tasks = [(self, str(video_path), output_base_dir, save_frames) for video_path in video_paths]
         
-        for video_path in video_paths:
-            video_path = Path(video_path)
-            
-            # Create output directory for this video
-            if save_frames:
-                output_dir = Path(output_base_dir) / video_path.stem
-            else:
-                output_dir = None
-            
-            try:
-                frames = self.extract_frames(
-                    str(video_path),
-                    str(output_dir) if output_dir else None,
-                    save_frames
-                )
-                all_frames[video_path.stem] = frames
-            except Exception as e:
-                print(f"Error extracting frames from {video_path}: {e}")
+        if num_workers > 1 and len(tasks) > 1:
+            # Spawn (not fork) so workers don't inherit decoder threads from this process
+            with ProcessPoolExecutor(max_workers=min(num_workers, len(tasks)),
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                results = list(executor.map(_extract_video_frames, *zip(*tasks)))
+        else:
+            results = [_extract_video_frames(*task) for task in tasks]
         
-        return all_frames
+        return {video_name: frames for video_name, frames in results if frames is not None}
     
     @staticmethod
     def get_video_info(video_path: str) -> Dict:
@@ -156,7 +390,8 @@ class FrameExtractor:
             'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
             'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
             'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
-            'duration_seconds': cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+            'duration_seconds': (cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+                                 if cap.get(cv2.CAP_PROP_FPS) > 0 else 0.0)
         }
         
         cap.release()
@@ -169,7 +404,7 @@ if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 2:
-        print("Usage: python frame_extractor.py <video_path>")
+        print("Usage: python frame_extractor.py <video_path> [--gpu]")
         sys.exit(1)
     
     video_path = sys.argv[1]
@@ -182,8 +417,8 @@ if __name__ == "__main__":
     
     # Extract frames
     print("\nExtracting frames...")
-    extractor = FrameExtractor(target_fps=5, resize=(640, 480))
+    extractor = FrameExtractor(target_fps=5, resize=(640, 480), use_gpu='--gpu' in sys.argv)
     frames = extractor.extract_frames(video_path, output_dir="test_frames", save_frames=True)
     
     print(f"\nExtracted {len(frames)} frames")
-    print(f"Frame shape: {frames[0].shape if frames else 'N/A'}")
+    print(f"Frames shape: {frames.shape}")
@@ -0,0 +1,148 @@
+"""
+Numeric Kernels
+Small per-frame numeric helpers for feature extraction, JIT-compiled with Numba when available
+"""
+
+import math
+import numpy as np
+from typing import Tuple
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Most recent velocities used to classify writing/fidgeting
+RECENT_WINDOW = 5
+
+
+def _hand_activity_numpy(points: np.ndarray, next_index: int, count: int, hand_y: float,
+                         writing_threshold: float, raising_threshold: float,
+                         fidgeting_threshold: float) -> Tuple[float, float, bool, bool, bool]:
+    """NumPy version of hand_activity()"""
+    ordered = points[:count] if count < len(points) else np.roll(points, -next_index, axis=0)
+
+    velocity = 0.0
+    is_writing = False
+    is_fidgeting = False
+
+    if count >= 2:
+        diffs = np.diff(ordered, axis=0)
+        velocities = np.sqrt((diffs * diffs).sum(axis=1))
+        velocity = float(velocities.mean())
+
+        if count >= RECENT_WINDOW:
+            recent = velocities[-RECENT_WINDOW:]
+            recent_mean = recent.mean()
+            recent_std = recent.std()
+            is_writing = bool(recent_mean > writing_threshold and recent_std < 0.01)
+            is_fidgeting = bool(recent_mean > fidgeting_threshold and recent_std > 0.02)
+
+    hand_height = 1.0 - hand_y
+
+    return velocity, hand_height, hand_height > raising_threshold, is_writing, is_fidgeting
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _hand_activity_kernel(points, next_index, count, hand_y,
+                              writing_threshold, raising_threshold, fidgeting_threshold):
+        size = points.shape[0]
+        start = 0 if count < size else next_index
+
+        velocity = 0.0
+        is_writing = False
+        is_fidgeting = False
+
+        n_velocities = count - 1
+        if n_velocities >= 1:
+            recent_start = max(0, n_velocities - RECENT_WINDOW)
+            total = 0.0
+            recent_total = 0.0
+            recent_sq_total = 0.0
+
+            prev = start
+            for i in range(n_velocities):
+                cur = (start + i + 1) % size
+                dx = points[cur, 0] - points[prev, 0]
+                dy = points[cur, 1] - points[prev, 1]
+                v = np.sqrt(dx * dx + dy * dy)
+                total += v
+                if i >= recent_start:
+                    recent_total += v
+                    recent_sq_total += v * v
+                prev = cur
+
+            velocity = total / n_velocities
+
+            if count >= RECENT_WINDOW:
+                n_recent = n_velocities - recent_start
+                recent_mean = recent_total / n_recent
+                recent_std = np.sqrt(max(recent_sq_total / n_recent - recent_mean * recent_mean, 0.0))
+                is_writing = recent_mean > writing_threshold and recent_std < 0.01
+                is_fidgeting = recent_mean > fidgeting_threshold and recent_std > 0.02
+
+        hand_height = 1.0 - hand_y
+
+        return velocity, hand_height, hand_height > raising_threshold, is_writing, is_fidgeting
+
+
+def hand_activity(points: np.ndarray, next_index: int, count: int, hand_y: float,
+                  writing_threshold: float, raising_threshold: float,
+                  fidgeting_threshold: float) -> Tuple[float, float, bool, bool, bool]:
+    """
+    Classify the activity of one hand from its center history
+
+    Args:
+        points: (size, 2) float32 ring buffer of normalized hand centers
+        next_index: Ring buffer slot the next point will be written to
+        count: Number of valid points in the buffer
+        hand_y: Normalized y of the current hand center
+        writing_threshold: Minimum recent mean velocity for writing
+        raising_threshold: Minimum hand height for a raised hand
+        fidgeting_threshold: Minimum recent mean velocity for fidgeting
+
+    Returns:
+        Tuple of (mean velocity, hand height, is_hand_raised, is_writing, is_fidgeting)
+    """
+    if NUMBA_AVAILABLE:
+        velocity, hand_height, is_raised, is_writing, is_fidgeting = _hand_activity_kernel(
+            points, next_index, count, hand_y,
+            writing_threshold, raising_threshold, fidgeting_threshold
+        )
+        return float(velocity), float(hand_height), bool(is_raised), bool(is_writing), bool(is_fidgeting)
+    return _hand_activity_numpy(points, next_index, count, hand_y,
+                                writing_threshold, raising_threshold, fidgeting_threshold)
+
+
+def euler_from_rotation_vector(rx: float, ry: float, rz: float) -> Tuple[float, float, float]:
+    """
+    Convert an axis-angle rotation vector to Euler angles through its unit quaternion
+    (same x-y-z decomposition as the rotation matrix, without building the matrix)
+
+    Args:
+        rx, ry, rz: Rotation vector components from solvePnP
+
+    Returns:
+        Tuple of (pitch, yaw, roll) in radians
+    """
+    theta = math.sqrt(rx * rx + ry * ry + rz * rz)
+
+    if theta < 1e-12:
+        return 0.0, 0.0, 0.0
+
+    # Quaternion (w, x, y, z) = (cos(theta/2), sin(theta/2) * axis)
+    w = math.cos(theta / 2)
+    s = math.sin(theta / 2) / theta
+    x, y, z = rx * s, ry * s, rz * s
+
+    pitch = math.atan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    yaw = math.asin(max(-1.0, min(1.0, 2 * (w * y - z * x))))
+    roll = math.atan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+
+    return pitch, yaw, roll
+
+
+if NUMBA_AVAILABLE:
+    euler_from_rotation_vector = njit(cache=True, fastmath=True)(euler_from_rotation_vector)
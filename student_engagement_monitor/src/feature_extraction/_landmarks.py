@@ -0,0 +1,71 @@
+"""
+Landmark Helpers
+Bulk conversion of MediaPipe landmark lists to NumPy arrays and input downscaling
+"""
+
+import cv2
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+from typing import Optional, Sequence
+
+
+def landmarks_to_array(landmarks, scale: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Convert a MediaPipe landmark list to an (N, 3) float32 array of x, y, z coordinates
+    (MediaPipe landmarks are float32 internally, so double precision adds nothing)
+
+    Args:
+        landmarks: Repeated landmark field (e.g. face_landmarks.landmark)
+        scale: Optional per-axis multipliers applied in one broadcast (e.g. (w, h, w))
+
+    Returns:
+        Landmark coordinates
+    """
+    count = len(landmarks)
+    coords = np.fromiter(
+        (value for lm in landmarks for value in (lm.x, lm.y, lm.z)),
+        dtype=np.float32,
+        count=3 * count
+    ).reshape(count, 3)
+
+    if scale is not None:
+        coords *= np.asarray(scale, dtype=np.float32)
+
+    return coords
+
+
+def landmarks_to_proto(landmarks) -> landmark_pb2.NormalizedLandmarkList:
+    """
+    Wrap a landmark list (Solutions or Tasks API) for mp.solutions.drawing_utils
+
+    Args:
+        landmarks: Sequence of normalized landmarks with x, y, z
+
+    Returns:
+        NormalizedLandmarkList proto
+    """
+    proto = landmark_pb2.NormalizedLandmarkList()
+    proto.landmark.extend(
+        landmark_pb2.NormalizedLandmark(x=lm.x, y=lm.y, z=lm.z) for lm in landmarks
+    )
+    return proto
+
+
+def downscale_for_landmarks(frame: np.ndarray, process_width: Optional[int]) -> np.ndarray:
+    """
+    Shrink a frame to the width MediaPipe is fed at (it resizes internally anyway)
+    Landmarks are normalized, so they stay valid for the original frame
+
+    Args:
+        frame: Input frame
+        process_width: Target width (None or a wider target keeps the frame as is)
+
+    Returns:
+        Downscaled frame
+    """
+    h, w = frame.shape[:2]
+    if process_width is None or w <= process_width:
+        return frame
+
+    height = max(1, round(h * process_width / w))
+    return cv2.resize(frame, (process_width, height), interpolation=cv2.INTER_AREA)
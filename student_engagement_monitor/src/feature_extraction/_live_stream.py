@@ -0,0 +1,94 @@
+"""
+Live Stream Landmarker
+Runs a MediaPipe Tasks landmarker asynchronously in LIVE_STREAM mode
+"""
+
+import threading
+import time
+import numpy as np
+import mediapipe as mp
+from typing import Any, Optional
+
+try:
+    from mediapipe.tasks.python import BaseOptions
+    from mediapipe.tasks.python import vision
+    TASKS_AVAILABLE = True
+except ImportError:
+    vision = None
+    TASKS_AVAILABLE = False
+
+
+class LiveStreamLandmarker:
+    """
+    Submit frames to a MediaPipe Tasks landmarker without waiting for the result
+    The landmarker pipelines its graph stages internally and delivers results
+    through a callback; submit() returns the most recent result delivered so far,
+    which may belong to an earlier frame
+    """
+
+    def __init__(self, landmarker_cls: Any, options_cls: Any, model_path: str,
+                 use_gpu: bool = False, **options):
+        """
+        Create landmarker
+
+        Args:
+            landmarker_cls: Tasks landmarker class (e.g. vision.FaceLandmarker)
+            options_cls: Matching options class (e.g. vision.FaceLandmarkerOptions)
+            model_path: Path to the .task model bundle
+            use_gpu: Run inference on MediaPipe's GPU delegate (falls back to CPU if unavailable)
+            **options: Additional landmarker options (num_faces, num_hands, confidences)
+        """
+        self._lock = threading.Lock()
+        self._latest_result = None
+        self._timestamp_ms = -1
+
+        def create(delegate):
+            return landmarker_cls.create_from_options(options_cls(
+                base_options=BaseOptions(model_asset_path=model_path, delegate=delegate),
+                running_mode=vision.RunningMode.LIVE_STREAM,
+                result_callback=self._on_result,
+                **options
+            ))
+
+        self.landmarker = None
+        if use_gpu:
+            try:
+                self.landmarker = create(BaseOptions.Delegate.GPU)
+            except (RuntimeError, NotImplementedError) as e:
+                print(f"⚠️  Warning: MediaPipe GPU delegate not available ({e}). Using CPU.")
+
+        if self.landmarker is None:
+            self.landmarker = create(BaseOptions.Delegate.CPU)
+
+    def _on_result(self, result: Any, image: Any, timestamp_ms: int):
+        """Keep the latest result delivered by the landmarker"""
+        with self._lock:
+            self._latest_result = result
+
+    def submit(self, rgb_frame: np.ndarray) -> Optional[Any]:
+        """
+        Queue an RGB frame for detection
+
+        Args:
+            rgb_frame: Input frame (RGB format)
+
+        Returns:
+            Latest landmarker result, or None if no result has arrived yet
+        """
+        # LIVE_STREAM mode requires strictly increasing timestamps
+        self._timestamp_ms = max(self._timestamp_ms + 1, int(time.monotonic() * 1000))
+
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=np.ascontiguousarray(rgb_frame))
+        self.landmarker.detect_async(image, self._timestamp_ms)
+
+        with self._lock:
+            return self._latest_result
+
+    def reset(self):
+        """Drop the latest result"""
+        with self._lock:
+            self._latest_result = None
+
+    def close(self):
+        """Release the landmarker"""
+        self.landmarker.close()
@@ -0,0 +1,104 @@
+"""
+Live View
+Threaded capture -> process -> display loop for the detector demos
+"""
+
+import queue
+import threading
+import cv2
+import numpy as np
+from typing import Callable
+
+# Frames waiting per stage (for live sources, older frames are dropped so the view stays current)
+LIVE_QUEUE_SIZE = 2
+
+
+def _put_latest(frame_queue: queue.Queue, item):
+    """Put an item, dropping the oldest queued item if the queue is full"""
+    while True:
+        try:
+            frame_queue.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                frame_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def _put_until(frame_queue: queue.Queue, item, stop_event: threading.Event):
+    """Wait for room to put an item, unless stop_event is set first"""
+    while not stop_event.is_set():
+        try:
+            frame_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get_until(frame_queue: queue.Queue, stop_event: threading.Event):
+    """Wait for the next item, or return None once stop_event is set"""
+    while not stop_event.is_set():
+        try:
+            return frame_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return None
+
+
+def run_live_view(cap: cv2.VideoCapture, process: Callable[[np.ndarray], np.ndarray],
+                  window_name: str, drop_frames: bool = True):
+    """
+    Show processed frames of a capture until it ends or 'q' is pressed
+    Decoding and processing run on their own threads, so reading the next frame,
+    running the detector and drawing the window overlap; the window stays on the
+    calling thread, since GUI backends expect that
+
+    Args:
+        cap: Opened video capture
+        process: Function returning the annotated version of a BGR frame
+        window_name: Title of the display window
+        drop_frames: Skip frames the detector cannot keep up with (for cameras);
+                     otherwise every frame is shown (for video files)
+    """
+    frame_queue = queue.Queue(maxsize=LIVE_QUEUE_SIZE)
+    display_queue = queue.Queue(maxsize=LIVE_QUEUE_SIZE)
+    stop_event = threading.Event()
+
+    def put(target_queue, item):
+        if drop_frames:
+            _put_latest(target_queue, item)
+        else:
+            _put_until(target_queue, item, stop_event)
+
+    def read():
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            put(frame_queue, frame)
+        put(frame_queue, None)
+
+    def run():
+        while (frame := _get_until(frame_queue, stop_event)) is not None:
+            put(display_queue, process(frame))
+        put(display_queue, None)
+
+    threads = [threading.Thread(target=target, daemon=True) for target in (read, run)]
+    for thread in threads:
+        thread.start()
+
+    print("Press 'q' to quit")
+
+    try:
+        while (frame := _get_until(display_queue, stop_event)) is not None:
+            cv2.imshow(window_name, frame)
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        cap.release()
+        cv2.destroyAllWindows()
@@ -0,0 +1,61 @@
+"""
+Result Cache
+Reuses MediaPipe results across near-identical consecutive frames
+"""
+
+import cv2
+import numpy as np
+from typing import Any, Optional, Tuple
+
+
+class ResultCache:
+    """
+    Cache the last detector result keyed by a 16x16 grayscale frame signature
+    A frame whose signature is within the threshold of the last processed frame
+    reuses its result instead of running the detector again
+    """
+
+    def __init__(self, threshold: float = 3.0, max_reuse: int = 30):
+        """
+        Initialize cache
+
+        Args:
+            threshold: Maximum mean absolute pixel difference of the signatures for a cache hit
+            max_reuse: Consecutive cache hits before a full detection is forced
+        """
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.reset()
+
+    def lookup(self, frame: np.ndarray, is_rgb: bool = False) -> Tuple[np.ndarray, Optional[Any]]:
+        """
+        Look up the cached result for a frame
+
+        Args:
+            frame: Input frame (BGR format)
+            is_rgb: Frame is in RGB format
+
+        Returns:
+            Tuple of (frame signature, cached result or None on a miss)
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY if is_rgb else cv2.COLOR_BGR2GRAY)
+        signature = cv2.resize(gray, (16, 16), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+        if (self._signature is not None and self._reuse_count < self.max_reuse and
+                np.mean(np.abs(signature - self._signature)) < self.threshold):
+            self._reuse_count += 1
+            return signature, self._result
+
+        return signature, None
+
+    def store(self, signature: np.ndarray, result: Any):
+        """Store the result of a full detection on the frame with this signature"""
+        self._signature = signature
+        self._result = result
+        self._reuse_count = 0
+
+    def reset(self):
+        """Clear the cached result"""
+        self._signature = None
+        self._result = None
+        self._reuse_count = 0
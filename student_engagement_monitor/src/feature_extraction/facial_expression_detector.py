@@ -8,6 +8,16 @@ import numpy as np
 import mediapipe as mp
 from typing import Dict, List, Optional, Tuple
 
+try:
+    from ._landmarks import downscale_for_landmarks, landmarks_to_array, landmarks_to_proto
+    from ._live_stream import TASKS_AVAILABLE, LiveStreamLandmarker, vision
+    from ._result_cache import ResultCache
+except ImportError:
+    # For standalone execution
+    from _landmarks import downscale_for_landmarks, landmarks_to_array, landmarks_to_proto
+    from _live_stream import TASKS_AVAILABLE, LiveStreamLandmarker, vision
+    from _result_cache import ResultCache
+
 
 class FacialExpressionDetector:
     """
@@ -15,27 +25,65 @@ class FacialExpressionDetector:
     Uses MediaPipe Face Mesh for landmark detection
     """
     
-    def __init__(self):
-        """Initialize MediaPipe Face Mesh"""
+    # Eye landmark indices (MediaPipe Face Mesh)
+    LEFT_EYE_INDICES = np.array([33, 160, 158, 133, 153, 144], dtype=np.intp)
+    RIGHT_EYE_INDICES = np.array([362, 385, 387, 263, 373, 380], dtype=np.intp)
+    
+    # Mouth landmark indices
+    MOUTH_INDICES = np.array([61, 291, 0, 17, 84, 181, 78, 82], dtype=np.intp)
+    
+    # Eyebrow indices
+    LEFT_EYEBROW_INDICES = np.array([70, 63, 105, 66, 107], dtype=np.intp)
+    RIGHT_EYEBROW_INDICES = np.array([336, 296, 334, 293, 300], dtype=np.intp)
+    
+    # All regions above gathered in one fancy-indexing pass, then split back at these offsets
+    REGION_INDICES = (LEFT_EYE_INDICES, RIGHT_EYE_INDICES, MOUTH_INDICES,
+                      LEFT_EYEBROW_INDICES, RIGHT_EYEBROW_INDICES)
+    ALL_REGIONS_INDICES = np.concatenate(REGION_INDICES)
+    REGION_SPLITS = np.cumsum([len(indices) for indices in REGION_INDICES])[:-1]
+    
+    # Landmark pairs (positions within the eye/mouth landmark arrays) whose distances
+    # make up EAR and MAR: vertical pairs first, horizontal pair last
+    EAR_PAIRS = np.array([[1, 5], [2, 4], [0, 3]])
+    MAR_PAIRS = np.array([[1, 7], [2, 6], [3, 5], [0, 4]])
+    
+    def __init__(self, use_cache: bool = True, process_width: Optional[int] = 640,
+                 landmarker_model: Optional[str] = None, use_gpu: bool = False):
+        """
+        Initialize MediaPipe Face Mesh
+        
+        Args:
+            use_cache: Reuse face mesh results for near-identical consecutive frames
+            process_width: Width frames are downscaled to before detection (None keeps full size)
+            landmarker_model: Path to a face_landmarker.task bundle. When given, the
+                              Tasks FaceLandmarker runs in LIVE_STREAM mode and features
+                              come from the latest finished frame (may lag by a frame)
+            use_gpu: Run the Tasks landmarker on MediaPipe's GPU delegate
+        """
         self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        self.face_mesh = None
+        self.landmarker = None
+        
+        if landmarker_model and not TASKS_AVAILABLE:
+            print("⚠️  Warning: MediaPipe Tasks API not available. Using Face Mesh solution.")
         
-        # Eye landmark indices (MediaPipe Face Mesh)
-        self.LEFT_EYE_INDICES = [33, 160, 158, 133, 153, 144]
-        self.RIGHT_EYE_INDICES = [362, 385, 387, 263, 373, 380]
+        if landmarker_model and TASKS_AVAILABLE:
+            self.landmarker = LiveStreamLandmarker(
+                vision.FaceLandmarker, vision.FaceLandmarkerOptions, landmarker_model,
+                use_gpu=use_gpu,
+                num_faces=1,
+                min_face_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        else:
+            self.face_mesh = self._create_face_mesh()
         
-        # Mouth landmark indices
-        self.MOUTH_INDICES = [61, 291, 0, 17, 84, 181, 78, 82]
+        self.process_width = process_width
+        self.result_cache = ResultCache() if use_cache else None
         
-        # Eyebrow indices
-        self.LEFT_EYEBROW_INDICES = [70, 63, 105, 66, 107]
-        self.RIGHT_EYEBROW_INDICES = [336, 296, 334, 293, 300]
+        # Detection of the last extract_features() call, drawn by visualize_landmarks()
+        self._last_faces = None
+        self._last_frame_shape = None
     
     def calculate_ear(self, eye_landmarks: np.ndarray) -> float:
         """
@@ -47,12 +95,9 @@ class FacialExpressionDetector:
         Returns:
             EAR value (lower values indicate closed eyes)
         """
-        # Vertical distances
-        v1 = np.linalg.norm(eye_landmarks[1] - eye_landmarks[5])
-        v2 = np.linalg.norm(eye_landmarks[2] - eye_landmarks[4])
-        
-        # Horizontal distance
-        h = np.linalg.norm(eye_landmarks[0] - eye_landmarks[3])
+        # Vertical distances (v1, v2) and horizontal distance (h) in one pass
+        diffs = eye_landmarks[self.EAR_PAIRS[:, 0]] - eye_landmarks[self.EAR_PAIRS[:, 1]]
+        v1, v2, h = np.sqrt((diffs * diffs).sum(axis=1))
         
         # EAR formula
         ear = (v1 + v2) / (2.0 * h)
@@ -69,65 +114,57 @@ class FacialExpressionDetector:
         Returns:
             MAR value (higher values indicate open mouth)
         """
-        # Vertical distances
-        v1 = np.linalg.norm(mouth_landmarks[1] - mouth_landmarks[7])
-        v2 = np.linalg.norm(mouth_landmarks[2] - mouth_landmarks[6])
-        v3 = np.linalg.norm(mouth_landmarks[3] - mouth_landmarks[5])
-        
-        # Horizontal distance
-        h = np.linalg.norm(mouth_landmarks[0] - mouth_landmarks[4])
+        # Vertical distances (v1, v2, v3) and horizontal distance (h) in one pass
+        diffs = mouth_landmarks[self.MAR_PAIRS[:, 0]] - mouth_landmarks[self.MAR_PAIRS[:, 1]]
+        v1, v2, v3, h = np.sqrt((diffs * diffs).sum(axis=1))
         
         # MAR formula
         mar = (v1 + v2 + v3) / (3.0 * h)
         
         return mar
     
-    def extract_features(self, frame: np.ndarray) -> Optional[Dict]:
+    def extract_features(self, frame: np.ndarray, is_rgb: bool = False) -> Optional[Dict]:
         """
         Extract facial features from a frame
         
         Args:
             frame: Input frame (BGR format)
+            is_rgb: Frame is already in RGB format
             
         Returns:
             Dictionary with facial features or None if no face detected
         """
         # Convert to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb_frame = frame if is_rgb else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
-        # Process frame
-        results = self.face_mesh.process(rgb_frame)
+        # MediaPipe works at low resolution internally, so feed it a smaller frame
+        small = downscale_for_landmarks(rgb_frame, self.process_width)
         
-        if not results.multi_face_landmarks:
-            return None
+        # Process frame (static scenes reuse the last result)
+        faces = self._process(small)
+        self._last_faces = faces
+        self._last_frame_shape = frame.shape
         
-        # Get first face landmarks
-        face_landmarks = results.multi_face_landmarks[0]
+        if not faces:
+            return None
         
-        # Convert landmarks to numpy array
+        # Convert first face landmarks to numpy array
         h, w = frame.shape[:2]
-        landmarks = np.array([
-            [lm.x * w, lm.y * h, lm.z * w]
-            for lm in face_landmarks.landmark
-        ])
+        landmarks = landmarks_to_array(faces[0], scale=(w, h, w))
         
-        # Extract eye landmarks
-        left_eye = landmarks[self.LEFT_EYE_INDICES]
-        right_eye = landmarks[self.RIGHT_EYE_INDICES]
+        # Extract eye, mouth and eyebrow landmarks
+        left_eye, right_eye, mouth, left_eyebrow, right_eyebrow = np.split(
+            landmarks[self.ALL_REGIONS_INDICES], self.REGION_SPLITS
+        )
         
         # Calculate EAR for both eyes
         left_ear = self.calculate_ear(left_eye)
         right_ear = self.calculate_ear(right_eye)
         avg_ear = (left_ear + right_ear) / 2.0
         
-        # Extract mouth landmarks
-        mouth = landmarks[self.MOUTH_INDICES]
+        # Calculate MAR
         mar = self.calculate_mar(mouth)
         
-        # Extract eyebrow landmarks
-        left_eyebrow = landmarks[self.LEFT_EYEBROW_INDICES]
-        right_eyebrow = landmarks[self.RIGHT_EYEBROW_INDICES]
-        
         # Calculate eyebrow height (relative to eye)
         left_eyebrow_height = np.mean(left_eyebrow[:, 1]) - np.mean(left_eye[:, 1])
         right_eyebrow_height = np.mean(right_eyebrow[:, 1]) - np.mean(right_eye[:, 1])
@@ -153,6 +190,52 @@ class FacialExpressionDetector:
         
         return features
     
+    def detect_landmarks(self, frame: np.ndarray, is_rgb: bool = False) -> List[np.ndarray]:
+        """
+        Detect raw face landmarks (e.g. as teacher labels for a distilled model)
+        
+        Args:
+            frame: Input frame (BGR format)
+            is_rgb: Frame is already in RGB format
+            
+        Returns:
+            List of (N, 3) arrays of normalized x, y, z coordinates, one per face
+        """
+        rgb_frame = frame if is_rgb else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        faces = self._detect(downscale_for_landmarks(rgb_frame, self.process_width))
+        return [landmarks_to_array(face) for face in faces]
+    
+    def _create_face_mesh(self):
+        """Create the Face Mesh solution graph"""
+        return self.mp_face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    
+    def _detect(self, rgb_frame: np.ndarray) -> List:
+        """Run face detection on an RGB frame and return the landmark list of each face"""
+        if self.landmarker is not None:
+            result = self.landmarker.submit(rgb_frame)
+            return result.face_landmarks if result is not None else []
+        
+        results = self.face_mesh.process(rgb_frame)
+        return [face.landmark for face in results.multi_face_landmarks or []]
+    
+    def _process(self, rgb_frame: np.ndarray) -> List:
+        """Run face detection on an RGB frame, or return the cached result of a near-identical frame"""
+        if self.result_cache is None:
+            return self._detect(rgb_frame)
+        
+        signature, faces = self.result_cache.lookup(rgb_frame, is_rgb=True)
+        if faces is None:
+            faces = self._detect(rgb_frame)
+            self.result_cache.store(signature, faces)
+        
+        return faces
+    
     def extract_features_batch(self, frames: List[np.ndarray]) -> List[Optional[Dict]]:
         """
         Extract features from multiple frames
@@ -168,6 +251,7 @@ class FacialExpressionDetector:
     def visualize_landmarks(self, frame: np.ndarray) -> np.ndarray:
         """
         Visualize facial landmarks on frame
+        Reuses the detection of the preceding extract_features() call on this frame
         
         Args:
             frame: Input frame
@@ -175,17 +259,21 @@ class FacialExpressionDetector:
         Returns:
             Frame with landmarks drawn
         """
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
+        faces = self._last_faces if self._last_frame_shape == frame.shape else None
+        self._last_faces = None
+        
+        if faces is None:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            faces = self._detect(downscale_for_landmarks(rgb_frame, self.process_width))
         
-        if results.multi_face_landmarks:
+        if faces:
             mp_drawing = mp.solutions.drawing_utils
             mp_drawing_styles = mp.solutions.drawing_styles
             
-            for face_landmarks in results.multi_face_landmarks:
+            for face_landmarks in faces:
                 mp_drawing.draw_landmarks(
                     image=frame,
-                    landmark_list=face_landmarks,
+                    landmark_list=landmarks_to_proto(face_landmarks),
                     connections=self.mp_face_mesh.FACEMESH_TESSELATION,
                     landmark_drawing_spec=None,
                     connection_drawing_spec=mp_drawing_styles.get_default_face_mesh_tesselation_style()
@@ -195,8 +283,10 @@ class FacialExpressionDetector:
     
     def __del__(self):
         """Cleanup"""
-        if hasattr(self, 'face_mesh'):
+        if getattr(self, 'face_mesh', None) is not None:
             self.face_mesh.close()
+        if getattr(self, 'landmarker', None) is not None:
+            self.landmarker.close()
 
 
 if __name__ == "__main__":
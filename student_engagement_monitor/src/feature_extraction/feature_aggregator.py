@@ -3,9 +3,12 @@ Feature Aggregator
 Combines all feature extraction modules and creates unified feature vectors
 """
 
+import cv2
+import queue
+import threading
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 # Import feature extractors
@@ -24,6 +27,290 @@ except ImportError:
     from phone_usage_detector import create_phone_detector
 
 
+# Frames buffered per detector thread in pipelined video feature extraction
+PIPELINE_QUEUE_SIZE = 4
+
+
+class RunningStats:
+    """
+    Online temporal statistics over per-frame feature dictionaries
+    Numeric columns keep a running mean/variance (Welford) and max/min, boolean
+    columns a count of True frames, so frames never have to be buffered
+    """
+    
+    def __init__(self, capacity: int = 64):
+        """
+        Initialize statistics
+        
+        Args:
+            capacity: Initial number of feature columns (grows as new keys appear)
+        """
+        self.num_frames = 0
+        
+        # Column -> slot, and the pandas-like kind of each column in first-seen order
+        self._slots = {}
+        self._kinds = []
+        self._present = []
+        self._true = []
+        
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._mean = np.zeros(capacity, dtype=np.float64)
+        self._m2 = np.zeros(capacity, dtype=np.float64)
+        self._max = np.full(capacity, -np.inf)
+        self._min = np.full(capacity, np.inf)
+    
+    # Column kind per value type, filled on first sight (feature values use only a few types)
+    _kinds_by_type = {type(None): None}
+    
+    @classmethod
+    def _kind(cls, value) -> Optional[str]:
+        """Column kind of a single value, as a pandas DataFrame would type it"""
+        value_type = type(value)
+        if value_type in cls._kinds_by_type:
+            return cls._kinds_by_type[value_type]
+        
+        if isinstance(value, (bool, np.bool_)):
+            kind = 'bool'
+        elif isinstance(value, (int, float, np.number)):
+            kind = 'number'
+        else:
+            kind = 'other'
+        
+        cls._kinds_by_type[value_type] = kind
+        return kind
+    
+    def _add_column(self, key: str) -> int:
+        """Allocate a slot for a new feature column"""
+        slot = len(self._kinds)
+        self._slots[key] = slot
+        self._kinds.append(None)
+        self._present.append(0)
+        self._true.append(0)
+        
+        if slot == len(self._count):
+            grow = len(self._count)
+            self._count = np.concatenate([self._count, np.zeros(grow, dtype=np.int64)])
+            self._mean = np.concatenate([self._mean, np.zeros(grow)])
+            self._m2 = np.concatenate([self._m2, np.zeros(grow)])
+            self._max = np.concatenate([self._max, np.full(grow, -np.inf)])
+            self._min = np.concatenate([self._min, np.full(grow, np.inf)])
+        
+        return slot
+    
+    def update(self, features: Dict):
+        """
+        Add one frame's features
+        
+        Args:
+            features: Feature dictionary of the frame
+        """
+        self.num_frames += 1
+        
+        numeric_slots = []
+        numeric_values = []
+        
+        for key, value in features.items():
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._add_column(key)
+            
+            kind = self._kind(value)
+            previous = self._kinds[slot]
+            if previous is None:
+                self._kinds[slot] = kind
+            elif kind is not None and kind != previous:
+                self._kinds[slot] = 'other'
+            
+            if value is None:
+                continue
+            
+            self._present[slot] += 1
+            if kind == 'number':
+                numeric_slots.append(slot)
+                numeric_values.append(value)
+            elif kind == 'bool' and value:
+                self._true[slot] += 1
+        
+        if not numeric_slots:
+            return
+        
+        # Welford update of the columns present in this frame (NaN values are skipped)
+        slots = np.array(numeric_slots, dtype=np.intp)
+        x = np.array(numeric_values, dtype=np.float64)
+        valid = ~np.isnan(x)
+        slots, x = slots[valid], x[valid]
+        
+        self._count[slots] += 1
+        delta = x - self._mean[slots]
+        self._mean[slots] += delta / self._count[slots]
+        self._m2[slots] += delta * (x - self._mean[slots])
+        self._max[slots] = np.maximum(self._max[slots], x)
+        self._min[slots] = np.minimum(self._min[slots], x)
+    
+    def aggregate(self) -> Dict:
+        """
+        Aggregated features (numeric mean/std/max/min, boolean True ratios, frame count)
+        
+        Returns:
+            Aggregated feature dictionary (empty if no frames were added)
+        """
+        if not self.num_frames:
+            return {}
+        
+        # Numeric columns may have missing frames, boolean ones must be present in every frame
+        numerical = [(key, slot) for key, slot in self._slots.items() if self._kinds[slot] == 'number']
+        boolean = [(key, slot) for key, slot in self._slots.items()
+                   if self._kinds[slot] == 'bool' and self._present[slot] == self.num_frames]
+        
+        aggregated = {}
+        
+        # Columns without values are NaN, and single-value std is NaN (sample std, like pandas)
+        for key, slot in numerical:
+            count = self._count[slot]
+            has_values = count > 0
+            aggregated[f'{key}_mean'] = float(self._mean[slot]) if has_values else float('nan')
+            aggregated[f'{key}_std'] = (float(np.sqrt(self._m2[slot] / (count - 1)))
+                                        if count > 1 else float('nan'))
+            aggregated[f'{key}_max'] = float(self._max[slot]) if has_values else float('nan')
+            aggregated[f'{key}_min'] = float(self._min[slot]) if has_values else float('nan')
+        
+        # Percentage of frames where True
+        for key, slot in boolean:
+            aggregated[f'{key}_ratio'] = self._true[slot] / self.num_frames
+        
+        aggregated['frame_count'] = self.num_frames
+        
+        return aggregated
+
+
+class FeatureWindow:
+    """
+    Sliding window of the most recent per-frame features, stored column-wise
+    Frames are rows of one preallocated float32 ring buffer (booleans as 0/1, missing
+    values as NaN), so a window is aggregated with a few array reductions instead of
+    re-reading every buffered feature dictionary
+    """
+    
+    def __init__(self, size: int, capacity: int = 64):
+        """
+        Initialize window
+        
+        Args:
+            size: Number of frames kept (oldest frames are evicted)
+            capacity: Initial number of feature columns (grows as new keys appear)
+        """
+        self.size = size
+        self._rows = np.full((size, capacity), np.nan, dtype=np.float32)
+        self._next = 0
+        self._count = 0
+        
+        # Column -> position, and the pandas-like kind of each column (as in RunningStats)
+        self._columns = {}
+        self._kinds = []
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def append(self, features: Dict):
+        """
+        Add one frame's features, evicting the oldest frame when the window is full
+        
+        Args:
+            features: Feature dictionary of the frame
+        """
+        columns = []
+        values = []
+        
+        for key, value in features.items():
+            column = self._columns.get(key)
+            if column is None:
+                column = self._add_column(key)
+            
+            kind = RunningStats._kind(value)
+            previous = self._kinds[column]
+            if previous is None:
+                self._kinds[column] = kind
+            elif kind is not None and kind != previous:
+                self._kinds[column] = 'other'
+            
+            if kind == 'number' or kind == 'bool':
+                columns.append(column)
+                values.append(value)
+        
+        row = self._rows[self._next]
+        row[:] = np.nan
+        row[columns] = values
+        
+        self._advance()
+    
+    def repeat_last(self):
+        """Add a copy of the most recent frame"""
+        if self._count:
+            self._rows[self._next] = self._rows[self._next - 1]
+            self._advance()
+    
+    def _advance(self):
+        """Move the ring buffer to the next slot"""
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+    
+    def _add_column(self, key: str) -> int:
+        """Allocate a column for a new feature"""
+        column = len(self._kinds)
+        self._columns[key] = column
+        self._kinds.append(None)
+        
+        if column == self._rows.shape[1]:
+            self._rows = np.concatenate([self._rows, np.full_like(self._rows, np.nan)], axis=1)
+        
+        return column
+    
+    def aggregate(self) -> Dict:
+        """
+        Aggregated features of the frames in the window (same output as RunningStats.aggregate())
+        
+        Returns:
+            Aggregated feature dictionary (empty if the window is empty)
+        """
+        if not self._count:
+            return {}
+        
+        num_columns = len(self._kinds)
+        rows = self._rows[:self._count, :num_columns].astype(np.float64)
+        missing = np.isnan(rows)
+        counts = self._count - missing.sum(axis=0)
+        
+        # Sample statistics over the frames that have a value (NaN where there are none)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(missing, 0.0, rows).sum(axis=0) / counts
+            deviations = np.where(missing, 0.0, rows - means)
+            stds = np.sqrt((deviations * deviations).sum(axis=0) / (counts - 1))
+        stds[counts < 2] = np.nan
+        maxs = np.where(missing, -np.inf, rows).max(axis=0)
+        mins = np.where(missing, np.inf, rows).min(axis=0)
+        maxs[counts == 0] = np.nan
+        mins[counts == 0] = np.nan
+        
+        aggregated = {}
+        
+        # Columns without any value in the window are NaN, as in RunningStats
+        for key, column in self._columns.items():
+            if self._kinds[column] == 'number':
+                aggregated[f'{key}_mean'] = float(means[column])
+                aggregated[f'{key}_std'] = float(stds[column])
+                aggregated[f'{key}_max'] = float(maxs[column])
+                aggregated[f'{key}_min'] = float(mins[column])
+        
+        # Percentage of frames where True (boolean columns must be present in every frame)
+        for key, column in self._columns.items():
+            if self._kinds[column] == 'bool' and counts[column] == self._count:
+                aggregated[f'{key}_ratio'] = float(means[column])
+        
+        aggregated['frame_count'] = self._count
+        
+        return aggregated
+
+
 class FeatureAggregator:
     """
     Aggregates features from all detection modules
@@ -42,131 +329,359 @@ class FeatureAggregator:
         # Initialize feature extractors
         print("Initializing feature extractors...")
         
-        self.facial_detector = FacialExpressionDetector()
+        features_config = self.config.get('features', {})
+        use_gpu = self.config.get('performance', {}).get('use_gpu', False)
+        
+        # Detector result caches compare each frame with the previous one, so they are only
+        # safe when this aggregator sees a single stream (not one student ROI after another)
+        use_cache = features_config.get('result_cache', {}).get('enabled', False)
+        
+        self.facial_detector = FacialExpressionDetector(
+            landmarker_model=features_config.get('facial', {}).get('landmarker_model'),
+            use_gpu=use_gpu,
+            use_cache=use_cache
+        )
         print("  ✅ Facial expression detector")
         
-        self.pose_estimator = HeadPoseEstimator()
+        self.pose_estimator = HeadPoseEstimator(use_cache=use_cache)
         print("  ✅ Head pose estimator")
         
-        self.hand_detector = HandMovementDetector()
+        self.hand_detector = HandMovementDetector(
+            landmarker_model=features_config.get('hand_movement', {}).get('landmarker_model'),
+            use_gpu=use_gpu,
+            use_cache=use_cache
+        )
         print("  ✅ Hand movement detector")
         
-        self.phone_detector = create_phone_detector(use_yolo=True)
+        precision = self.config.get('performance', {}).get('precision', 'fp32')
+        self.phone_detector = create_phone_detector(
+            use_yolo=True,
+            half=precision != 'fp32',
+            export_format=features_config.get('phone_detection', {}).get('export_format'),
+            int8=precision == 'int8',
+            use_cache=use_cache
+        )
         print("  ✅ Phone usage detector")
         
         print("All feature extractors initialized!")
+        
+        # Color-converted frame reused by extract_frame_features()
+        self._color_buffer = None
+        
+        # Presence gate for single-stream use: while no face is seen and the scene is static,
+        # extract_frame_features() skips hand/pose and only re-checks for a face periodically
+        gate_config = features_config.get('presence_gate', {})
+        self.presence_gate = gate_config.get('enabled', False)
+        self.gate_check_interval = gate_config.get('check_interval', 5)
+        self.gate_refresh_interval = gate_config.get('refresh_interval', 30)
+        self.gate_motion_threshold = gate_config.get('motion_threshold', 8.0)
+        self._reset_presence_gate()
+        
+        # Last feature name list from get_feature_names() and its name -> position map
+        self._feature_names = None
+        self._feature_index = {}
     
-    def extract_frame_features(self, frame: np.ndarray) -> Dict:
+    def extract_frame_features(self, frame: np.ndarray, is_rgb: bool = False) -> Dict:
         """
         Extract all features from a single frame
         
         Args:
             frame: Input frame (BGR format)
+            is_rgb: Frame is already in RGB format (MediaPipe detectors use it as is)
             
         Returns:
             Dictionary with all features
         """
-        features = {}
+        # Convert once into a reused buffer, shared by all detectors
+        self._color_buffer = self._convert_color(frame, is_rgb, self._color_buffer)
+        bgr_frame, rgb_frame = (self._color_buffer, frame) if is_rgb else (frame, self._color_buffer)
         
-        # Facial features
-        facial_features = self.facial_detector.extract_features(frame)
-        if facial_features:
-            features.update({f'facial_{k}': v for k, v in facial_features.items()})
-        else:
-            # Fill with default values if no face detected
-            features.update({
-                'facial_face_detected': False,
-                'facial_ear_avg': 0.0,
-                'facial_mar': 0.0,
-                'facial_is_drowsy': False,
-                'facial_is_yawning': False
-            })
-        
-        # Head pose features
-        pose_features = self.pose_estimator.estimate_pose(frame)
-        if pose_features:
-            features.update({f'pose_{k}': v for k, v in pose_features.items() 
-                           if k not in ['rotation_vector', 'translation_vector']})
+        return self._extract_pair_features(bgr_frame, rgb_frame)
+    
+    def _extract_pair_features(self, bgr_frame: np.ndarray, rgb_frame: np.ndarray) -> Dict:
+        """All features of a frame given in both color orders"""
+        if self.presence_gate:
+            return self._extract_gated_features(bgr_frame, rgb_frame)
+        
+        # Serial, so the phone detector can search around this frame's face
+        features = self._facial_features(bgr_frame, rgb_frame)
+        pose_features, face_bbox = self._estimate_pose(rgb_frame)
+        features.update(pose_features)
+        features.update(self._hand_features(bgr_frame, rgb_frame))
+        features.update(self._phone_features(bgr_frame, rgb_frame, face_bbox))
+        
+        return features
+    
+    def _extract_gated_features(self, bgr_frame: np.ndarray, rgb_frame: np.ndarray) -> Dict:
+        """
+        Extract frame features behind the presence gate
+        After a frame without a face, static frames reuse its facial/pose/hand features;
+        the face mesh re-checks every check_interval frames, and motion or every
+        refresh_interval frames triggers a full detection (phone detection always runs)
+        
+        Args:
+            bgr_frame: Frame in BGR format
+            rgb_frame: Same frame in RGB format
+            
+        Returns:
+            Dictionary with all features
+        """
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        signature = cv2.resize(gray, (16, 16), interpolation=cv2.INTER_AREA).astype(np.int16)
+        
+        facial = None
+        
+        if self._absent_features is not None:
+            self._frames_absent += 1
+            
+            static = (self._frames_absent % self.gate_refresh_interval != 0 and
+                      np.mean(np.abs(signature - self._absent_signature)) <= self.gate_motion_threshold)
+            
+            if static:
+                if self._frames_absent % self.gate_check_interval == 0:
+                    facial = self._facial_features(bgr_frame, rgb_frame)
+                
+                if facial is None or not facial['facial_face_detected']:
+                    features = dict(self._absent_features)
+                    features.update(facial or {})
+                    features.update(self._phone_features(bgr_frame, rgb_frame))
+                    return features
+        
+        # Full detection (reusing the face re-check if it found a face)
+        features = dict(facial or self._facial_features(bgr_frame, rgb_frame))
+        pose_features, face_bbox = self._estimate_pose(rgb_frame)
+        features.update(pose_features)
+        features.update(self._hand_features(bgr_frame, rgb_frame))
+        
+        if features['facial_face_detected']:
+            self._absent_features = None
         else:
-            features.update({
-                'pose_pitch': 0.0,
-                'pose_yaw': 0.0,
-                'pose_roll': 0.0,
-                'pose_is_engaged': False,
-                'pose_attention_score': 0.0
-            })
-        
-        # Hand movement features
-        hand_features = self.hand_detector.extract_features(frame)
-        features.update({f'hand_{k}': v for k, v in hand_features.items()})
-        
-        # Phone detection features
-        phone_features = self.phone_detector.detect_phone(frame)
-        features.update({f'phone_{k}': v for k, v in phone_features.items() 
-                        if k != 'phone_bbox'})
+            self._absent_features = dict(features)
+            self._absent_signature = signature
+            self._frames_absent = 0
+        
+        features.update(self._phone_features(bgr_frame, rgb_frame, face_bbox))
         
         return features
     
-    def extract_video_features(self, frames: List[np.ndarray], 
-                              aggregate: bool = True) -> Dict:
+    def _reset_presence_gate(self):
+        """Forget the last face-less frame, so the next frame runs full detection"""
+        self._absent_features = None
+        self._absent_signature = None
+        self._frames_absent = 0
+    
+    def _iter_frame_pairs(self, frames: Iterable[np.ndarray], is_rgb: bool) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield (bgr_frame, rgb_frame) for each frame
+        A stacked (N, H, W, 3) clip (e.g. FrameExtractor.extract_frames()) is converted
+        in a single cvtColor call over all its rows; other inputs are converted per frame
+        
+        Args:
+            frames: Frames to pair
+            is_rgb: Frames are already in RGB format
+            
+        Yields:
+            Tuple of (BGR frame, RGB frame)
+        """
+        if isinstance(frames, np.ndarray) and frames.ndim == 4 and len(frames):
+            n, h, w, c = frames.shape
+            converted = self._convert_color(np.ascontiguousarray(frames).reshape(n * h, w, c), is_rgb)
+            converted = converted.reshape(n, h, w, c)
+            
+            for frame, other in zip(frames, converted):
+                yield (other, frame) if is_rgb else (frame, other)
+            return
+        
+        for frame in frames:
+            # A fresh buffer per frame, since consumers may still hold earlier frames
+            converted = self._convert_color(frame, is_rgb)
+            yield (converted, frame) if is_rgb else (frame, converted)
+    
+    @staticmethod
+    def _convert_color(frame: np.ndarray, is_rgb: bool,
+                       buffer: Optional[np.ndarray] = None) -> np.ndarray:
+        """Swap a frame between BGR and RGB, writing into buffer when its shape matches"""
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = np.empty_like(frame)
+        return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR if is_rgb else cv2.COLOR_BGR2RGB, dst=buffer)
+    
+    def _detector_extractors(self) -> List[Callable[[np.ndarray, np.ndarray], Dict]]:
+        """Per-detector feature functions taking (bgr_frame, rgb_frame), in feature dictionary order"""
+        return [self._facial_features, self._pose_features, self._hand_features, self._phone_features]
+    
+    def _facial_features(self, bgr_frame: np.ndarray, rgb_frame: np.ndarray) -> Dict:
+        """Facial features of a frame (prefixed with 'facial_')"""
+        facial_features = self.facial_detector.extract_features(rgb_frame, is_rgb=True)
+        if facial_features:
+            return {f'facial_{k}': v for k, v in facial_features.items()}
+        
+        # Fill with default values if no face detected
+        return {
+            'facial_face_detected': False,
+            'facial_ear_avg': 0.0,
+            'facial_mar': 0.0,
+            'facial_is_drowsy': False,
+            'facial_is_yawning': False
+        }
+    
+    def _pose_features(self, bgr_frame: np.ndarray, rgb_frame: np.ndarray) -> Dict:
+        """Head pose features of a frame (prefixed with 'pose_')"""
+        return self._estimate_pose(rgb_frame)[0]
+    
+    def _estimate_pose(self, rgb_frame: np.ndarray) -> Tuple[Dict, Optional[Tuple[int, int, int, int]]]:
+        """Head pose features of a frame (prefixed with 'pose_') and its face box (None without a face)"""
+        pose_features = self.pose_estimator.estimate_pose(rgb_frame, is_rgb=True)
+        if pose_features:
+            return {f'pose_{k}': v for k, v in pose_features.items() 
+                    if k not in ['rotation_vector', 'translation_vector', 'face_bbox']}, pose_features['face_bbox']
+        
+        return {
+            'pose_pitch': 0.0,
+            'pose_yaw': 0.0,
+            'pose_roll': 0.0,
+            'pose_is_engaged': False,
+            'pose_attention_score': 0.0
+        }, None
+    
+    def _hand_features(self, bgr_frame: np.ndarray, rgb_frame: np.ndarray) -> Dict:
+        """Hand movement features of a frame (prefixed with 'hand_')"""
+        hand_features = self.hand_detector.extract_features(rgb_frame, is_rgb=True)
+        return {f'hand_{k}': v for k, v in hand_features.items()}
+    
+    def _phone_features(self, bgr_frame: np.ndarray, rgb_frame: np.ndarray,
+                        face_bbox: Optional[Tuple[int, int, int, int]] = None) -> Dict:
+        """Phone detection features of a frame (YOLO expects BGR input), searched around face_bbox if given"""
+        phone_features = self.phone_detector.detect_phone(bgr_frame, face_bbox)
+        return {f'phone_{k}': v for k, v in phone_features.items() 
+                if k != 'phone_bbox'}
+    
+    def extract_video_features(self, frames: Iterable[np.ndarray], 
+                              aggregate: bool = True, is_rgb: bool = False,
+                              pipelined: bool = True) -> Dict:
         """
         Extract features from multiple frames (video clip)
         
         Args:
-            frames: List of frames
+            frames: List or iterator of frames (e.g. FrameExtractor.iter_frames()), or a stacked
+                    (N, H, W, 3) array whose color conversion is then done in one batch
             aggregate: Whether to aggregate temporal statistics
+            is_rgb: Frames are already in RGB format
+            pipelined: Run each detector on its own thread so they process frames concurrently
+                       (ignored while the presence gate is enabled: the gate decides per frame
+                       which detectors run, so frames are then processed serially)
             
         Returns:
             Dictionary with aggregated features
         """
         # Extract features from each frame
-        frame_features = [self.extract_frame_features(frame) for frame in frames]
+        if pipelined and not self.presence_gate:
+            frame_features = self._iter_frames_pipelined(frames, is_rgb)
+        else:
+            frame_features = (self._extract_pair_features(bgr_frame, rgb_frame)
+                              for bgr_frame, rgb_frame in self._iter_frame_pairs(frames, is_rgb))
         
         if not aggregate:
-            return frame_features
-        
-        # Aggregate temporal statistics
-        aggregated = self._aggregate_temporal_features(frame_features)
+            return list(frame_features)
         
-        return aggregated
+        # Aggregate temporal statistics as frames arrive
+        return self._aggregate_temporal_features(frame_features)
     
-    def _aggregate_temporal_features(self, frame_features: List[Dict]) -> Dict:
+    def _iter_frames_pipelined(self, frames: Iterable[np.ndarray], is_rgb: bool) -> Iterator[Dict]:
         """
-        Aggregate features across time (mean, std, max, min)
+        Extract per-frame features with one consumer thread per detector
+        Frames are fed to every detector through bounded queues, so the detectors (whose
+        native code releases the GIL) overlap and a frame is held only until all have seen it
         
         Args:
-            frame_features: List of feature dictionaries from each frame
+            frames: Frames to process
+            is_rgb: Frames are already in RGB format
             
-        Returns:
-            Aggregated feature dictionary
+        Yields:
+            Feature dictionary of each frame, in frame order, as soon as all detectors are done with it
         """
-        if not frame_features:
-            return {}
+        extractors = self._detector_extractors()
+        frame_queues = [queue.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in extractors]
+        detector_features = [deque() for _ in extractors]
+        errors = []
         
-        # Convert to DataFrame for easy aggregation
-        df = pd.DataFrame(frame_features)
+        def merge_ready():
+            # Merge detector outputs by frame index (same key order as extract_frame_features)
+            while all(detector_features):
+                features = {}
+                for per_detector in detector_features:
+                    features.update(per_detector.popleft())
+                yield features
         
-        aggregated = {}
+        def consume(extract, frame_queue, results):
+            # Detectors keep per-video state (e.g. hand history), so each one sees frames in order
+            while True:
+                frame_pair = frame_queue.get()
+                if frame_pair is None:
+                    break
+                
+                # Keep draining after a failure so the producer never blocks
+                if errors:
+                    continue
+                
+                try:
+                    results.append(extract(*frame_pair))
+                except Exception as e:
+                    errors.append(e)
         
-        # Aggregate numerical features
-        numerical_cols = df.select_dtypes(include=[np.number]).columns
+        consumers = [
+            threading.Thread(target=consume, args=args, daemon=True)
+            for args in zip(extractors, frame_queues, detector_features)
+        ]
+        for consumer in consumers:
+            consumer.start()
         
-        for col in numerical_cols:
-            aggregated[f'{col}_mean'] = float(df[col].mean())
-            aggregated[f'{col}_std'] = float(df[col].std())
-            aggregated[f'{col}_max'] = float(df[col].max())
-            aggregated[f'{col}_min'] = float(df[col].min())
+        try:
+            for frame_pair in self._iter_frame_pairs(frames, is_rgb):
+                if errors:
+                    break
+                
+                for frame_queue in frame_queues:
+                    frame_queue.put(frame_pair)
+                
+                yield from merge_ready()
+        finally:
+            for frame_queue in frame_queues:
+                frame_queue.put(None)
+            for consumer in consumers:
+                consumer.join()
         
-        # Aggregate boolean features (percentage of frames where True)
-        boolean_cols = df.select_dtypes(include=[bool]).columns
+        if errors:
+            raise errors[0]
         
-        for col in boolean_cols:
-            aggregated[f'{col}_ratio'] = float(df[col].sum() / len(df))
+        yield from merge_ready()
+    
+    def aggregate_frame_features(self, frame_features: List[Dict]) -> Dict:
+        """
+        Aggregate already-extracted per-frame features (same output as extract_video_features)
         
-        # Add frame count
-        aggregated['frame_count'] = len(frame_features)
+        Args:
+            frame_features: List of feature dictionaries from extract_frame_features()
+            
+        Returns:
+            Aggregated feature dictionary
+        """
+        return self._aggregate_temporal_features(frame_features)
+    
+    def _aggregate_temporal_features(self, frame_features: Iterable[Dict]) -> Dict:
+        """
+        Aggregate features across time (mean, std, max, min)
         
-        return aggregated
+        Args:
+            frame_features: Feature dictionaries from each frame (consumed one at a time)
+            
+        Returns:
+            Aggregated feature dictionary
+        """
+        stats = RunningStats()
+        for features in frame_features:
+            stats.update(features)
+        
+        return stats.aggregate()
     
     def features_to_vector(self, features: Dict, feature_names: Optional[List[str]] = None) -> np.ndarray:
         """
@@ -177,18 +692,26 @@ class FeatureAggregator:
             feature_names: Ordered list of feature names (for consistency)
             
         Returns:
-            Feature vector
+            Feature vector (float32, the precision XGBoost works in; missing features are 0.0)
         """
         if feature_names is None:
             # Use all numerical features in sorted order
-            feature_names = sorted([k for k, v in features.items() 
-                                  if isinstance(v, (int, float, bool))])
+            feature_names = self.get_feature_names(features)
         
-        # Extract values in order
-        vector = np.array([
-            float(features.get(name, 0.0))
-            for name in feature_names
-        ])
+        if feature_names is not self._feature_names:
+            self._index_feature_names(feature_names)
+        
+        # One pass over the features, placing each known one at its position
+        positions = []
+        values = []
+        for name, value in features.items():
+            position = self._feature_index.get(name)
+            if position is not None:
+                positions.append(position)
+                values.append(value)
+        
+        vector = np.zeros(len(feature_names), dtype=np.float32)
+        vector[positions] = values
         
         return vector
     
@@ -200,19 +723,29 @@ class FeatureAggregator:
             sample_features: Sample feature dictionary
             
         Returns:
-            Ordered list of feature names
+            Ordered list of feature names (the same list object while the names do not change)
         """
-        return sorted([k for k, v in sample_features.items() 
-                      if isinstance(v, (int, float, bool))])
+        feature_names = sorted([k for k, v in sample_features.items() 
+                                if isinstance(v, (int, float, bool))])
+        
+        if feature_names != self._feature_names:
+            self._index_feature_names(feature_names)
+        
+        return self._feature_names
+    
+    def _index_feature_names(self, feature_names: List[str]):
+        """Cache a feature name list and its name -> vector position map"""
+        self._feature_names = feature_names
+        self._feature_index = {name: i for i, name in enumerate(feature_names)}
     
     def reset(self):
         """Reset all detectors (clear history)"""
         self.hand_detector.reset_history()
+        self._reset_presence_gate()
 
 
 if __name__ == "__main__":
     # Test feature aggregator
-    import cv2
     import sys
     
     if len(sys.argv) < 2:
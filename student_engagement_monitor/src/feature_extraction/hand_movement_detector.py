@@ -6,8 +6,49 @@ Detects hand activities: writing, hand-raising, resting, fidgeting
 import cv2
 import numpy as np
 import mediapipe as mp
-from typing import Dict, List, Optional
-from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from ._kernels import hand_activity
+    from ._landmarks import downscale_for_landmarks, landmarks_to_array, landmarks_to_proto
+    from ._live_stream import TASKS_AVAILABLE, LiveStreamLandmarker, vision
+    from ._result_cache import ResultCache
+except ImportError:
+    # For standalone execution
+    from _kernels import hand_activity
+    from _landmarks import downscale_for_landmarks, landmarks_to_array, landmarks_to_proto
+    from _live_stream import TASKS_AVAILABLE, LiveStreamLandmarker, vision
+    from _result_cache import ResultCache
+
+
+class PointHistory:
+    """Fixed-size ring buffer of 2D points"""
+    
+    def __init__(self, size: int):
+        """
+        Initialize history
+        
+        Args:
+            size: Maximum number of points kept
+        """
+        self.points = np.zeros((size, 2), dtype=np.float32)
+        self.size = size
+        self.next_index = 0
+        self.count = 0
+    
+    def append(self, point: np.ndarray):
+        """Add a point, overwriting the oldest one when full"""
+        self.points[self.next_index] = point
+        self.next_index = (self.next_index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+    
+    def clear(self):
+        """Remove all points"""
+        self.next_index = 0
+        self.count = 0
+    
+    def __len__(self) -> int:
+        return self.count
 
 
 class HandMovementDetector:
@@ -16,46 +57,77 @@ class HandMovementDetector:
     Uses MediaPipe Hands for hand landmark detection
     """
     
-    def __init__(self, history_size: int = 10):
+    def __init__(self, history_size: int = 10, use_cache: bool = True,
+                 process_width: Optional[int] = 640,
+                 landmarker_model: Optional[str] = None, use_gpu: bool = False):
         """
         Initialize MediaPipe Hands
         
         Args:
             history_size: Number of frames to keep for movement analysis
+            use_cache: Reuse hand landmark results for near-identical consecutive frames
+            process_width: Width frames are downscaled to before detection (None keeps full size)
+            landmarker_model: Path to a hand_landmarker.task bundle. When given, the
+                              Tasks HandLandmarker runs in LIVE_STREAM mode and features
+                              come from the latest finished frame (may lag by a frame)
+            use_gpu: Run the Tasks landmarker on MediaPipe's GPU delegate
         """
         self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        self.hands = None
+        self.landmarker = None
+        
+        if landmarker_model and not TASKS_AVAILABLE:
+            print("⚠️  Warning: MediaPipe Tasks API not available. Using Hands solution.")
+        
+        if landmarker_model and TASKS_AVAILABLE:
+            self.landmarker = LiveStreamLandmarker(
+                vision.HandLandmarker, vision.HandLandmarkerOptions, landmarker_model,
+                use_gpu=use_gpu,
+                num_hands=2,
+                min_hand_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        else:
+            self.hands = self._create_hands()
         
         # History for tracking movement
         self.history_size = history_size
-        self.left_hand_history = deque(maxlen=history_size)
-        self.right_hand_history = deque(maxlen=history_size)
+        self.left_hand_history = PointHistory(history_size)
+        self.right_hand_history = PointHistory(history_size)
         
         # Thresholds
         self.WRITING_VELOCITY_THRESHOLD = 0.02  # Consistent small movements
         self.RAISING_HEIGHT_THRESHOLD = 0.3  # Hand above certain height
         self.FIDGETING_VELOCITY_THRESHOLD = 0.05  # Erratic movements
+        
+        self.process_width = process_width
+        self.result_cache = ResultCache() if use_cache else None
+        
+        # Detection of the last extract_features() call, drawn by visualize_hands()
+        self._last_hands = None
+        self._last_frame_shape = None
     
-    def extract_features(self, frame: np.ndarray) -> Dict:
+    def extract_features(self, frame: np.ndarray, is_rgb: bool = False) -> Dict:
         """
         Extract hand movement features from frame
         
         Args:
             frame: Input frame (BGR format)
+            is_rgb: Frame is already in RGB format
             
         Returns:
             Dictionary with hand features
         """
         # Convert to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        rgb_frame = frame if is_rgb else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
-        # Process frame
-        results = self.hands.process(rgb_frame)
+        # MediaPipe works at low resolution internally, so feed it a smaller frame
+        small = downscale_for_landmarks(rgb_frame, self.process_width)
+        
+        # Process frame (static scenes reuse the last result, history is still updated)
+        hands = self._process(small)
+        self._last_hands = hands
+        self._last_frame_shape = frame.shape
         
         features = {
             'hands_detected': 0,
@@ -69,7 +141,7 @@ class HandMovementDetector:
             'hand_height': 0.0
         }
         
-        if not results.multi_hand_landmarks:
+        if not hands:
             # No hands detected - likely resting
             features['is_resting'] = True
             return features
@@ -77,18 +149,12 @@ class HandMovementDetector:
         h, w = frame.shape[:2]
         
         # Process each detected hand
-        for idx, (hand_landmarks, handedness) in enumerate(
-            zip(results.multi_hand_landmarks, results.multi_handedness)
-        ):
-            # Determine if left or right hand
-            hand_label = handedness.classification[0].label  # "Left" or "Right"
+        for hand_landmarks, hand_label in hands:
+            # Determine if left or right hand ("Left" or "Right")
             is_left = hand_label == "Left"
             
             # Extract landmarks
-            landmarks = np.array([
-                [lm.x, lm.y, lm.z]
-                for lm in hand_landmarks.landmark
-            ])
+            landmarks = landmarks_to_array(hand_landmarks)
             
             # Calculate hand center
             hand_center = np.mean(landmarks[:, :2], axis=0)
@@ -103,37 +169,20 @@ class HandMovementDetector:
             
             features['hands_detected'] += 1
             
-            # Calculate movement velocity
+            # Classify activity from the hand's movement history
             history = self.left_hand_history if is_left else self.right_hand_history
-            if len(history) >= 2:
-                velocities = [
-                    np.linalg.norm(history[i] - history[i-1])
-                    for i in range(1, len(history))
-                ]
-                avg_velocity = np.mean(velocities)
-                features['movement_velocity'] = max(features['movement_velocity'], float(avg_velocity))
-            
-            # Hand height (y-coordinate, lower value = higher in frame)
-            hand_height = 1.0 - hand_center[1]  # Invert so higher = higher value
-            features['hand_height'] = max(features['hand_height'], float(hand_height))
-            
-            # Classify activity
-            # Hand raised: hand is high in frame
-            if hand_height > self.RAISING_HEIGHT_THRESHOLD:
-                features['is_hand_raised'] = True
-            
-            # Writing: consistent small movements
-            if len(history) >= 5:
-                recent_velocities = velocities[-5:]
-                if (np.mean(recent_velocities) > self.WRITING_VELOCITY_THRESHOLD and
-                    np.std(recent_velocities) < 0.01):  # Consistent movement
-                    features['is_writing'] = True
+            velocity, hand_height, is_raised, is_writing, is_fidgeting = hand_activity(
+                history.points, history.next_index, history.count, float(hand_center[1]),
+                self.WRITING_VELOCITY_THRESHOLD,
+                self.RAISING_HEIGHT_THRESHOLD,
+                self.FIDGETING_VELOCITY_THRESHOLD
+            )
             
-            # Fidgeting: erratic, larger movements
-            if len(history) >= 5:
-                if (np.mean(recent_velocities) > self.FIDGETING_VELOCITY_THRESHOLD and
-                    np.std(recent_velocities) > 0.02):  # Inconsistent movement
-                    features['is_fidgeting'] = True
+            features['movement_velocity'] = max(features['movement_velocity'], velocity)
+            features['hand_height'] = max(features['hand_height'], hand_height)
+            features['is_hand_raised'] |= is_raised
+            features['is_writing'] |= is_writing
+            features['is_fidgeting'] |= is_fidgeting
         
         # Resting: hands detected but minimal movement
         if features['hands_detected'] > 0 and features['movement_velocity'] < 0.01:
@@ -141,6 +190,58 @@ class HandMovementDetector:
         
         return features
     
+    def detect_landmarks(self, frame: np.ndarray, is_rgb: bool = False) -> List[Tuple[np.ndarray, str]]:
+        """
+        Detect raw hand landmarks (e.g. as teacher labels for a distilled model)
+        Does not update the movement history
+        
+        Args:
+            frame: Input frame (BGR format)
+            is_rgb: Frame is already in RGB format
+            
+        Returns:
+            List of ((21, 3) array of normalized x, y, z coordinates, "Left"/"Right") per hand
+        """
+        rgb_frame = frame if is_rgb else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        hands = self._detect(downscale_for_landmarks(rgb_frame, self.process_width))
+        return [(landmarks_to_array(landmarks), label) for landmarks, label in hands]
+    
+    def _create_hands(self):
+        """Create the Hands solution graph"""
+        return self.mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=2,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    
+    def _detect(self, rgb_frame: np.ndarray) -> List:
+        """Run hand detection on an RGB frame and return (landmark list, handedness label) per hand"""
+        if self.landmarker is not None:
+            result = self.landmarker.submit(rgb_frame)
+            if result is None:
+                return []
+            return [(landmarks, handedness[0].category_name)
+                    for landmarks, handedness in zip(result.hand_landmarks, result.handedness)]
+        
+        results = self.hands.process(rgb_frame)
+        if not results.multi_hand_landmarks:
+            return []
+        return [(hand.landmark, handedness.classification[0].label)
+                for hand, handedness in zip(results.multi_hand_landmarks, results.multi_handedness)]
+    
+    def _process(self, rgb_frame: np.ndarray) -> List:
+        """Run hand detection on an RGB frame, or return the cached result of a near-identical frame"""
+        if self.result_cache is None:
+            return self._detect(rgb_frame)
+        
+        signature, hands = self.result_cache.lookup(rgb_frame, is_rgb=True)
+        if hands is None:
+            hands = self._detect(rgb_frame)
+            self.result_cache.store(signature, hands)
+        
+        return hands
+    
     def visualize_hands(self, frame: np.ndarray, features: Dict) -> np.ndarray:
         """
         Visualize hand detection and activity on frame
@@ -152,18 +253,22 @@ class HandMovementDetector:
         Returns:
             Frame with visualization
         """
-        # Process frame for visualization
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
+        # Reuse the detection of the preceding extract_features() call on this frame
+        hands = self._last_hands if self._last_frame_shape == frame.shape else None
+        self._last_hands = None
         
-        if results.multi_hand_landmarks:
+        if hands is None:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            hands = self._detect(downscale_for_landmarks(rgb_frame, self.process_width))
+        
+        if hands:
             mp_drawing = mp.solutions.drawing_utils
             mp_drawing_styles = mp.solutions.drawing_styles
             
-            for hand_landmarks in results.multi_hand_landmarks:
+            for hand_landmarks, _ in hands:
                 mp_drawing.draw_landmarks(
                     frame,
-                    hand_landmarks,
+                    landmarks_to_proto(hand_landmarks),
                     self.mp_hands.HAND_CONNECTIONS,
                     mp_drawing_styles.get_default_hand_landmarks_style(),
                     mp_drawing_styles.get_default_hand_connections_style()
@@ -198,11 +303,19 @@ class HandMovementDetector:
         """Reset movement history"""
         self.left_hand_history.clear()
         self.right_hand_history.clear()
+        
+        if self.result_cache is not None:
+            self.result_cache.reset()
+        
+        if self.landmarker is not None:
+            self.landmarker.reset()
     
     def __del__(self):
         """Cleanup"""
-        if hasattr(self, 'hands'):
+        if getattr(self, 'hands', None) is not None:
             self.hands.close()
+        if getattr(self, 'landmarker', None) is not None:
+            self.landmarker.close()
 
 
 if __name__ == "__main__":
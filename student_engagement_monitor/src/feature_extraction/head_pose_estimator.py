@@ -4,9 +4,22 @@ Estimates head orientation (pitch, yaw, roll) to determine if student is looking
 """
 
 import cv2
+import math
 import numpy as np
 import mediapipe as mp
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from ._kernels import euler_from_rotation_vector
+    from ._landmarks import downscale_for_landmarks
+    from ._live_view import run_live_view
+    from ._result_cache import ResultCache
+except ImportError:
+    # For standalone execution
+    from _kernels import euler_from_rotation_vector
+    from _landmarks import downscale_for_landmarks
+    from _live_view import run_live_view
+    from _result_cache import ResultCache
 
 
 class HeadPoseEstimator:
@@ -15,8 +28,15 @@ class HeadPoseEstimator:
     Determines if student is paying attention based on head orientation
     """
     
-    def __init__(self):
-        """Initialize MediaPipe Face Mesh"""
+    def __init__(self, use_cache: bool = True, process_width: Optional[int] = 640):
+        """
+        Initialize MediaPipe Face Mesh
+        
+        Args:
+            use_cache: Reuse face mesh results for near-identical consecutive frames
+                       (solvePnP still runs on every frame)
+            process_width: Width frames are downscaled to before face mesh (None keeps full size)
+        """
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             static_image_mode=False,
@@ -37,27 +57,98 @@ class HeadPoseEstimator:
         ], dtype=np.float64)
         
         # Landmark indices for pose estimation
-        self.POSE_LANDMARKS = [1, 152, 33, 263, 61, 291]  # Nose, Chin, Left eye, Right eye, Left mouth, Right mouth
+        self.POSE_LANDMARKS = np.array([1, 152, 33, 263, 61, 291], dtype=np.intp)  # Nose, Chin, Left eye, Right eye, Left mouth, Right mouth
+        
+        # Face oval extremes spanning the face box
+        self.FACE_BOX_LANDMARKS = (10, 152, 234, 454)  # Forehead, Chin, Left cheek, Right cheek
         
         # Engagement thresholds (degrees)
         self.YAW_THRESHOLD = 20  # Left-right head turn
         self.PITCH_THRESHOLD = 15  # Up-down head tilt
+        
+        self.process_width = process_width
+        
+        # Face mesh is re-run at least every 10 frames even in a still scene
+        self.result_cache = ResultCache(max_reuse=9) if use_cache else None
+        
+        # Camera intrinsics per frame size; no lens distortion assumed for any size
+        self._camera_matrices: Dict[Tuple[int, int], np.ndarray] = {}
+        self._dist_coeffs = np.zeros((4, 1))
+        
+        # Reused destination for BGR to RGB conversion
+        self._rgb_buffer = None
     
-    def estimate_pose(self, frame: np.ndarray) -> Optional[Dict]:
+    def estimate_pose(self, frame: np.ndarray, is_rgb: bool = False) -> Optional[Dict]:
         """
         Estimate head pose from frame
         
         Args:
             frame: Input frame (BGR format)
+            is_rgb: Frame is already in RGB format
             
         Returns:
             Dictionary with pose angles and engagement status, or None if no face detected
         """
-        # Convert to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        pose = self._solve_pose(frame, is_rgb)
+        if pose is None:
+            return None
+        
+        rotation_vector, translation_vector, face_bbox = pose
         
-        # Process frame
-        results = self.face_mesh.process(rgb_frame)
+        # Calculate Euler angles
+        pitch, yaw, roll = self._rotation_vector_to_euler_angles(rotation_vector)
+        
+        return self._pose_features(pitch, yaw, roll, rotation_vector, translation_vector, face_bbox)
+    
+    def estimate_pose_batch(self, frames: List[np.ndarray], is_rgb: bool = False) -> List[Optional[Dict]]:
+        """
+        Estimate head pose for a sequence of frames (e.g. a buffered video clip)
+        Face mesh and solvePnP run per frame; Euler angles are computed for all frames at once
+        
+        Args:
+            frames: Frames in order
+            is_rgb: Frames are already in RGB format
+            
+        Returns:
+            List of pose dictionaries (None where no face detected)
+        """
+        poses = [self._solve_pose(frame, is_rgb) for frame in frames]
+        
+        solved = [pose for pose in poses if pose is not None]
+        if not solved:
+            return [None] * len(poses)
+        
+        rotation_vectors = np.stack([rotation_vector.ravel() for rotation_vector, _, _ in solved])
+        angles = iter(self._rotation_vectors_to_euler_angles(rotation_vectors).tolist())
+        
+        return [
+            self._pose_features(*next(angles), *pose) if pose is not None else None
+            for pose in poses
+        ]
+    
+    def _solve_pose(self, frame: np.ndarray, is_rgb: bool) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Detect the face and solve its pose
+        
+        Args:
+            frame: Input frame (BGR format)
+            is_rgb: Frame is already in RGB format
+            
+        Returns:
+            Tuple of (rotation vector, translation vector, face box (x1, y1, x2, y2) in pixels),
+            or None if no face detected
+        """
+        # Face mesh runs on a smaller frame; its landmarks are normalized, so the
+        # image points below are still scaled to the full frame size
+        small = downscale_for_landmarks(frame, self.process_width)
+        
+        # Convert to RGB (after downscaling, into a reused buffer)
+        if not is_rgb:
+            if self._rgb_buffer is None or self._rgb_buffer.shape != small.shape:
+                self._rgb_buffer = np.empty_like(small)
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self._rgb_buffer)
+        
+        results = self._process(small)
         
         if not results.multi_face_landmarks:
             return None
@@ -66,48 +157,77 @@ class HeadPoseEstimator:
         h, w = frame.shape[:2]
         
         # Get first face landmarks
-        face_landmarks = results.multi_face_landmarks[0]
+        landmarks = results.multi_face_landmarks[0].landmark
         
-        # Extract 2D image points
-        image_points = np.array([
-            [face_landmarks.landmark[idx].x * w, face_landmarks.landmark[idx].y * h]
-            for idx in self.POSE_LANDMARKS
-        ], dtype=np.float64)
+        # Extract 2D image points (read normalized x, y in one pass, scale in one op)
+        image_points = np.fromiter(
+            (value for idx in self.POSE_LANDMARKS for value in (landmarks[idx].x, landmarks[idx].y)),
+            dtype=np.float64,
+            count=2 * len(self.POSE_LANDMARKS)
+        ).reshape(-1, 2)
+        image_points *= (w, h)
         
-        # Camera internals (assuming generic webcam)
-        focal_length = w
-        center = (w / 2, h / 2)
-        camera_matrix = np.array([
-            [focal_length, 0, center[0]],
-            [0, focal_length, center[1]],
-            [0, 0, 1]
-        ], dtype=np.float64)
-        
-        # Assuming no lens distortion
-        dist_coeffs = np.zeros((4, 1))
+        camera_matrix = self._camera_matrices.get((h, w))
+        if camera_matrix is None:
+            camera_matrix = self._camera_matrices[(h, w)] = self._build_camera_matrix(h, w)
         
-        # Solve PnP
+        # Solve PnP (closed-form EPnP, no iterative refinement)
         success, rotation_vector, translation_vector = cv2.solvePnP(
             self.model_points,
             image_points,
             camera_matrix,
-            dist_coeffs,
-            flags=cv2.SOLVEPNP_ITERATIVE
+            self._dist_coeffs,
+            flags=cv2.SOLVEPNP_EPNP
         )
         
         if not success:
             return None
         
-        # Convert rotation vector to rotation matrix
-        rotation_matrix, _ = cv2.Rodrigues(rotation_vector)
+        xs = [landmarks[idx].x * w for idx in self.FACE_BOX_LANDMARKS]
+        ys = [landmarks[idx].y * h for idx in self.FACE_BOX_LANDMARKS]
+        face_bbox = (int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys)))
         
-        # Calculate Euler angles
-        pitch, yaw, roll = self._rotation_matrix_to_euler_angles(rotation_matrix)
+        return rotation_vector, translation_vector, face_bbox
+    
+    @staticmethod
+    def _build_camera_matrix(h: int, w: int) -> np.ndarray:
+        """
+        Camera internals for a generic webcam
+        
+        Args:
+            h: Frame height
+            w: Frame width
+            
+        Returns:
+            3x3 camera matrix
+        """
+        focal_length = w
+        center = (w / 2, h / 2)
+        return np.array([
+            [focal_length, 0, center[0]],
+            [0, focal_length, center[1]],
+            [0, 0, 1]
+        ], dtype=np.float64)
+    
+    def _pose_features(self, pitch: float, yaw: float, roll: float,
+                       rotation_vector: np.ndarray, translation_vector: np.ndarray,
+                       face_bbox: Tuple[int, int, int, int]) -> Dict:
+        """
+        Build pose features from Euler angles
         
+        Args:
+            pitch, yaw, roll: Euler angles in radians
+            rotation_vector: Rotation vector from solvePnP
+            translation_vector: Translation vector from solvePnP
+            face_bbox: Face box (x1, y1, x2, y2) in pixels
+            
+        Returns:
+            Dictionary with pose angles and engagement status
+        """
         # Convert to degrees
-        pitch_deg = np.degrees(pitch)
-        yaw_deg = np.degrees(yaw)
-        roll_deg = np.degrees(roll)
+        pitch_deg = math.degrees(pitch)
+        yaw_deg = math.degrees(yaw)
+        roll_deg = math.degrees(roll)
         
         # Determine if student is engaged (looking at board/screen)
         is_engaged = (
@@ -131,35 +251,63 @@ class HeadPoseEstimator:
             'looking_up': pitch_deg < -self.PITCH_THRESHOLD,
             'looking_down': pitch_deg > self.PITCH_THRESHOLD,
             'rotation_vector': rotation_vector.flatten().tolist(),
-            'translation_vector': translation_vector.flatten().tolist()
+            'translation_vector': translation_vector.flatten().tolist(),
+            'face_bbox': face_bbox
         }
         
         return features
     
-    def _rotation_matrix_to_euler_angles(self, R: np.ndarray) -> Tuple[float, float, float]:
+    def _process(self, rgb_frame: np.ndarray):
+        """Run face mesh on an RGB frame, or return the cached result of a near-identical frame"""
+        if self.result_cache is None:
+            return self.face_mesh.process(rgb_frame)
+        
+        signature, results = self.result_cache.lookup(rgb_frame, is_rgb=True)
+        if results is None:
+            results = self.face_mesh.process(rgb_frame)
+            self.result_cache.store(signature, results)
+        
+        return results
+    
+    def _rotation_vector_to_euler_angles(self, rotation_vector: np.ndarray) -> Tuple[float, float, float]:
         """
-        Convert rotation matrix to Euler angles
+        Convert a rotation vector to Euler angles through its unit quaternion
+        (JIT-compiled with Numba when available)
         
         Args:
-            R: 3x3 rotation matrix
+            rotation_vector: Axis-angle rotation vector from solvePnP
             
         Returns:
             Tuple of (pitch, yaw, roll) in radians
         """
-        sy = np.sqrt(R[0, 0] * R[0, 0] + R[1, 0] * R[1, 0])
+        rx, ry, rz = rotation_vector.ravel().tolist()
+        return euler_from_rotation_vector(rx, ry, rz)
+    
+    @staticmethod
+    def _rotation_vectors_to_euler_angles(rotation_vectors: np.ndarray) -> np.ndarray:
+        """
+        Vectorized _rotation_vector_to_euler_angles() for many rotations at once
         
-        singular = sy < 1e-6
+        Args:
+            rotation_vectors: (..., 3) axis-angle rotation vectors
+            
+        Returns:
+            (..., 3) array of (pitch, yaw, roll) in radians
+        """
+        rotation_vectors = np.asarray(rotation_vectors, dtype=np.float64)
+        theta = np.linalg.norm(rotation_vectors, axis=-1)
+        
+        # sin(theta/2) / theta, which tends to 1/2 for a null rotation
+        scale = np.divide(np.sin(theta / 2), theta, out=np.full_like(theta, 0.5), where=theta > 1e-12)
+        
+        w = np.cos(theta / 2)
+        x, y, z = np.moveaxis(rotation_vectors * scale[..., None], -1, 0)
         
-        if not singular:
-            x = np.arctan2(R[2, 1], R[2, 2])
-            y = np.arctan2(-R[2, 0], sy)
-            z = np.arctan2(R[1, 0], R[0, 0])
-        else:
-            x = np.arctan2(-R[1, 2], R[1, 1])
-            y = np.arctan2(-R[2, 0], sy)
-            z = 0
+        pitch = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+        yaw = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+        roll = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
         
-        return x, y, z
+        return np.stack([pitch, yaw, roll], axis=-1)
     
     def visualize_pose(self, frame: np.ndarray, features: Dict) -> np.ndarray:
         """
@@ -241,27 +389,17 @@ if __name__ == "__main__":
     
     estimator = HeadPoseEstimator()
     
-    print("Press 'q' to quit")
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
+    def annotate(frame):
         # Estimate pose
         features = estimator.estimate_pose(frame)
         
         # Visualize
         if features:
-            frame = estimator.visualize_pose(frame, features)
-        else:
-            cv2.putText(frame, "No face detected", (10, 30),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            return estimator.visualize_pose(frame, features)
         
-        cv2.imshow('Head Pose Estimation', frame)
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        cv2.putText(frame, "No face detected", (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        return frame
     
-    cap.release()
-    cv2.destroyAllWindows()
+    # Capture, pose estimation and display overlap on separate threads
+    run_live_view(cap, annotate, 'Head Pose Estimation', drop_frames=input_source.isdigit())
@@ -8,6 +8,52 @@ import numpy as np
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+try:
+    from ._live_view import run_live_view
+    from ._result_cache import ResultCache
+except ImportError:
+    # For standalone execution
+    from _live_view import run_live_view
+    from _result_cache import ResultCache
+
+# COCO class ID of 'cell phone'
+CELL_PHONE_CLASS_ID = 67
+
+# Exported model location relative to the .pt weights, per ultralytics export format
+EXPORT_SUFFIXES = {
+    'engine': '.engine',            # TensorRT (CUDA)
+    'openvino': '_openvino_model',  # OpenVINO (Intel CPU/iGPU)
+}
+
+# Phone search region around a face box, in face sizes: a phone in use is held in front
+# of or below the face, so the region reaches further down than up
+FACE_ROI_MARGINS = (1.0, 0.5, 1.0, 2.0)  # left, top, right, bottom
+
+
+def _empty_phone_features() -> Dict:
+    """Phone detection features of a frame without a phone"""
+    return {
+        'phone_detected': False,
+        'phone_confidence': 0.0,
+        'phone_count': 0,
+        'phone_bbox': None,
+        'phone_area_ratio': 0.0
+    }
+
+
+def _face_roi(face_bbox: Tuple[int, int, int, int], frame_shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    """Phone search region (x1, y1, x2, y2) around a face box, clipped to the frame"""
+    x1, y1, x2, y2 = face_bbox
+    face_w, face_h = x2 - x1, y2 - y1
+    left, top, right, bottom = FACE_ROI_MARGINS
+    
+    return (
+        max(0, int(x1 - left * face_w)),
+        max(0, int(y1 - top * face_h)),
+        min(frame_shape[1], int(x2 + right * face_w)),
+        min(frame_shape[0], int(y2 + bottom * face_h))
+    )
+
 
 class PhoneUsageDetector:
     """
@@ -15,15 +61,28 @@ class PhoneUsageDetector:
     Uses YOLOv8 for object detection
     """
     
-    def __init__(self, model_path: str = 'models/yolov8n.pt', confidence_threshold: float = 0.5):
+    def __init__(self, model_path: str = 'models/yolov8n.pt', confidence_threshold: float = 0.5,
+                 half: bool = False, export_format: Optional[str] = None, int8: bool = False,
+                 full_frame_interval: int = 10, use_cache: bool = True):
         """
         Initialize phone detector
         
         Args:
             model_path: Path to YOLO model
             confidence_threshold: Minimum confidence for detection
+            half: Run inference in FP16 (CUDA only, ignored on CPU)
+            export_format: Run an exported model ('engine' for TensorRT, 'openvino'),
+                           exported next to the weights on first use (None runs the .pt model)
+            int8: Quantize the exported model to INT8 (otherwise it is exported at FP16 when half is set)
+            full_frame_interval: With a face box, search the full frame every N frames anyway
+            use_cache: Reuse the last detection while consecutive frames stay near-identical
+                       (YOLO still runs at least every 30 frames)
         """
         self.confidence_threshold = confidence_threshold
+        self.half = half
+        self.full_frame_interval = full_frame_interval
+        self._roi_frames = 0
+        self.result_cache = ResultCache(max_reuse=29) if use_cache else None
         self.model = None
         self.model_loaded = False
         
@@ -34,10 +93,14 @@ class PhoneUsageDetector:
             model_file = Path(model_path)
             if not model_file.exists():
                 print(f"Model not found at {model_path}, downloading YOLOv8n...")
+                model_file = Path('yolov8n.pt')
                 self.model = YOLO('yolov8n.pt')  # Will auto-download
             else:
                 self.model = YOLO(model_path)
             
+            if export_format:
+                self.model = self._load_exported(YOLO, model_file, export_format, int8)
+            
             self.model_loaded = True
             print("✅ YOLO model loaded successfully")
             
@@ -47,59 +110,151 @@ class PhoneUsageDetector:
         except Exception as e:
             print(f"⚠️  Warning: Could not load YOLO model: {e}")
     
-    def detect_phone(self, frame: np.ndarray) -> Dict:
+    def _load_exported(self, yolo_cls, model_file: Path, export_format: str, int8: bool):
+        """
+        Load the exported version of the model, exporting it first if it does not exist yet
+        
+        Args:
+            yolo_cls: ultralytics YOLO class
+            model_file: Path to the .pt weights
+            export_format: ultralytics export format ('engine' or 'openvino')
+            int8: Export with INT8 post-training quantization
+            
+        Returns:
+            Exported model, or the .pt model if the export fails
+        """
+        if export_format not in EXPORT_SUFFIXES:
+            print(f"⚠️  Warning: Unsupported YOLO export format '{export_format}'. Using {model_file.name}.")
+            return self.model
+        
+        exported = model_file.parent / f"{model_file.stem}{EXPORT_SUFFIXES[export_format]}"
+        
+        try:
+            if not exported.exists():
+                print(f"Exporting {model_file.name} to {export_format} (one-time)...")
+                exported = self.model.export(format=export_format, half=self.half and not int8,
+                                             int8=int8, imgsz=640)
+            
+            model = yolo_cls(str(exported), task='detect')
+            print(f"✅ Using exported YOLO model {exported}")
+            return model
+        
+        except Exception as e:
+            print(f"⚠️  Warning: Could not export YOLO model to {export_format} ({e}). Using {model_file.name}.")
+            return self.model
+    
+    def detect_phone(self, frame: np.ndarray, face_bbox: Optional[Tuple[int, int, int, int]] = None) -> Dict:
         """
         Detect phone in frame
         
         Args:
             frame: Input frame (BGR format)
+            face_bbox: Optional face box (x1, y1, x2, y2) in pixels; YOLO then only searches
+                       the region around it (and the full frame every full_frame_interval frames)
             
         Returns:
-            Dictionary with phone detection features
+            Dictionary with phone detection features (boxes in full frame coordinates)
         """
-        features = {
-            'phone_detected': False,
-            'phone_confidence': 0.0,
-            'phone_count': 0,
-            'phone_bbox': None,
-            'phone_area_ratio': 0.0
-        }
+        if face_bbox is None or self._roi_frames + 1 >= self.full_frame_interval:
+            self._roi_frames = 0
+            return self._detect_full_frame(frame)
         
-        if not self.model_loaded:
-            return features
+        self._roi_frames += 1
         
-        try:
-            # Run inference
-            results = self.model(frame, verbose=False)
-            
-            # Process detections
-            for result in results:
-                boxes = result.boxes
-                
-                for box in boxes:
-                    # Get class name
-                    class_id = int(box.cls[0])
-                    class_name = result.names[class_id]
-                    confidence = float(box.conf[0])
-                    
-                    # Check if it's a cell phone (class 67 in COCO dataset)
-                    if class_name == 'cell phone' and confidence >= self.confidence_threshold:
-                        features['phone_detected'] = True
-                        features['phone_count'] += 1
-                        features['phone_confidence'] = max(features['phone_confidence'], confidence)
-                        
-                        # Get bounding box
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        bbox = (int(x1), int(y1), int(x2), int(y2))
-                        features['phone_bbox'] = bbox
-                        
-                        # Calculate area ratio (phone area / frame area)
-                        phone_area = (x2 - x1) * (y2 - y1)
-                        frame_area = frame.shape[0] * frame.shape[1]
-                        features['phone_area_ratio'] = float(phone_area / frame_area)
+        x1, y1, x2, y2 = _face_roi(face_bbox, frame.shape)
+        if x2 <= x1 or y2 <= y1:
+            return _empty_phone_features()
+        
+        return self._detect([frame[y1:y2, x1:x2]], [frame.shape], [(x1, y1)])[0]
+    
+    def _detect_full_frame(self, frame: np.ndarray) -> Dict:
+        """Detect phones in a whole frame, or reuse the last detection of a near-identical frame"""
+        if self.result_cache is None:
+            return self.detect_phone_batch([frame])[0]
+        
+        signature, features = self.result_cache.lookup(frame)
+        if features is None:
+            features = self.detect_phone_batch([frame])[0]
+            self.result_cache.store(signature, features)
+        
+        return dict(features)
+    
+    def detect_phone_batch(self, frames: List[np.ndarray]) -> List[Dict]:
+        """
+        Detect phones in several frames with one batched YOLO call
+        
+        Args:
+            frames: Input frames (BGR format)
+            
+        Returns:
+            List of phone detection feature dictionaries, one per frame
+        """
+        return self._detect(frames, [frame.shape for frame in frames], [(0, 0)] * len(frames))
+    
+    def _detect(self, images: List[np.ndarray], frame_shapes: List[Tuple[int, ...]],
+                offsets: List[Tuple[int, int]]) -> List[Dict]:
+        """
+        Run YOLO on frames or frame regions
+        
+        Args:
+            images: Frames or crops of frames (BGR format)
+            frame_shapes: Shape of the full frame of each image
+            offsets: (x, y) position of each image in its frame
+            
+        Returns:
+            List of phone detection feature dictionaries, one per image
+        """
+        if not self.model_loaded or len(images) == 0:
+            return [_empty_phone_features() for _ in images]
         
+        try:
+            # Run inference (ultralytics batches a list of frames into one forward pass)
+            results = self.model(list(images), half=self.half, verbose=False)
         except Exception as e:
             print(f"Error in phone detection: {e}")
+            return [_empty_phone_features() for _ in images]
+        
+        return [self._result_features(result, frame_shape, offset)
+                for result, frame_shape, offset in zip(results, frame_shapes, offsets)]
+    
+    def _result_features(self, result, frame_shape: Tuple[int, ...],
+                         offset: Tuple[int, int] = (0, 0)) -> Dict:
+        """
+        Phone detection features from the YOLO result of one frame
+        
+        Args:
+            result: ultralytics Results of the frame (or of a region of it)
+            frame_shape: Shape of the full frame
+            offset: (x, y) position of the searched region in the frame
+            
+        Returns:
+            Dictionary with phone detection features
+        """
+        features = _empty_phone_features()
+        
+        # All boxes in one device-to-host copy: rows of (x1, y1, x2, y2, confidence, class)
+        detections = result.boxes.data.cpu().numpy()
+        
+        # Keep cell phones by COCO class ID
+        phones = detections[(detections[:, 5].astype(np.int32) == CELL_PHONE_CLASS_ID) &
+                            (detections[:, 4] >= self.confidence_threshold)]
+        
+        if len(phones):
+            features['phone_detected'] = True
+            features['phone_count'] = len(phones)
+            
+            # Most confident detection
+            best = phones[phones[:, 4].argmax()]
+            features['phone_confidence'] = float(best[4])
+            
+            x1, y1, x2, y2 = best[:4]
+            bbox = (int(x1) + offset[0], int(y1) + offset[1], int(x2) + offset[0], int(y2) + offset[1])
+            features['phone_bbox'] = bbox
+            
+            # Calculate area ratio (phone area / frame area)
+            phone_area = (x2 - x1) * (y2 - y1)
+            frame_area = frame_shape[0] * frame_shape[1]
+            features['phone_area_ratio'] = float(phone_area / frame_area)
         
         return features
     
@@ -145,23 +300,18 @@ class SimplePhoneDetector:
         """Initialize simple detector"""
         print("Using simple phone detector (heuristic-based)")
     
-    def detect_phone(self, frame: np.ndarray) -> Dict:
+    def detect_phone(self, frame: np.ndarray, face_bbox: Optional[Tuple[int, int, int, int]] = None) -> Dict:
         """
         Detect phone using simple heuristics
         
         Args:
             frame: Input frame
+            face_bbox: Optional face box (unused)
             
         Returns:
             Dictionary with detection features
         """
-        features = {
-            'phone_detected': False,
-            'phone_confidence': 0.0,
-            'phone_count': 0,
-            'phone_bbox': None,
-            'phone_area_ratio': 0.0
-        }
+        features = _empty_phone_features()
         
         # This is a placeholder - in practice, you'd implement:
         # 1. Hand-to-face proximity detection
@@ -171,6 +321,10 @@ class SimplePhoneDetector:
         # For now, return no detection
         return features
     
+    def detect_phone_batch(self, frames: List[np.ndarray]) -> List[Dict]:
+        """Detect phones in several frames"""
+        return [self.detect_phone(frame) for frame in frames]
+    
     def visualize_detection(self, frame: np.ndarray, features: Dict) -> np.ndarray:
         """Visualize detection"""
         cv2.putText(frame, "Simple detector (limited accuracy)", (10, 30),
@@ -217,23 +371,12 @@ if __name__ == "__main__":
     
     detector = create_phone_detector(use_yolo=True)
     
-    print("Press 'q' to quit")
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
+    def annotate(frame):
         # Detect phone
         features = detector.detect_phone(frame)
         
         # Visualize
-        frame = detector.visualize_detection(frame, features)
-        
-        cv2.imshow('Phone Usage Detection', frame)
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        return detector.visualize_detection(frame, features)
     
-    cap.release()
-    cv2.destroyAllWindows()
+    # Capture, detection and display overlap on separate threads
+    run_live_view(cap, annotate, 'Phone Usage Detection', drop_frames=input_source.isdigit())
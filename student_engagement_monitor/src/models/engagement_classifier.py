@@ -14,6 +14,65 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import json
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import cupy as cp
+    CUPY_AVAILABLE = True
+except ImportError:
+    cp = None
+    CUPY_AVAILABLE = False
+
+
+def _engagement_score(engagement: float, boredom: float, confusion: float, frustration: float) -> float:
+    """
+    Combine affective state levels (0-3 scale) into one engagement score (0-1)
+    """
+    # Engagement score formula:
+    # High engagement + Low boredom + Low confusion + Low frustration = Good
+    # Weighted average (engagement weighted more heavily)
+    return (
+        0.4 * (engagement / 3.0) +
+        0.3 * (1 - boredom / 3.0) +
+        0.15 * (1 - confusion / 3.0) +
+        0.15 * (1 - frustration / 3.0)
+    )
+
+
+if NUMBA_AVAILABLE:
+    _engagement_score = njit(cache=True, fastmath=True)(_engagement_score)
+
+
+# Affective states predicted by the classifier, in label column order
+AFFECTIVE_STATES = ('boredom', 'engagement', 'confusion', 'frustration')
+
+# _engagement_score() as offset + levels @ coefficients over levels in AFFECTIVE_STATES order
+ENGAGEMENT_SCORE_OFFSET = 0.3 + 0.15 + 0.15
+ENGAGEMENT_SCORE_COEFFICIENTS = np.array([-0.3, 0.4, -0.15, -0.15]) / 3.0
+
+# Booster file formats, in load preference order (XGBoost picks the format by suffix;
+# binary UBJSON is saved, text JSON is still read from older model directories)
+MODEL_SUFFIXES = ('.ubj', '.json')
+
+
+def _cuda_available() -> bool:
+    """Whether XGBoost was built with CUDA and a GPU is visible"""
+    if not xgb.build_info().get('USE_CUDA', False):
+        return False
+    
+    try:
+        if CUPY_AVAILABLE:
+            return cp.cuda.runtime.getDeviceCount() > 0
+        
+        import torch
+        return torch.cuda.is_available()
+    except Exception:
+        return False
+
 
 class EngagementClassifier:
     """
@@ -30,15 +89,19 @@ class EngagementClassifier:
         """
         self.config = config or self._default_config()
         
-        # Initialize models (one for each affective state)
-        self.models = {
-            'boredom': None,
-            'engagement': None,
-            'confusion': None,
-            'frustration': None
-        }
+        # One multi-output booster predicting all states (columns in self.states order)
+        self.booster = None
+        self.states = []
+        
+        # Per-state boosters, only set when loading models saved by older versions
+        self.models = {state: None for state in AFFECTIVE_STATES}
         
         self.scaler = StandardScaler()
+        
+        # Fitted scaler statistics as float32 constants for inference
+        self._mean = None
+        self._inv_std = None
+        
         self.feature_names = None
         self.is_trained = False
     
@@ -51,7 +114,9 @@ class EngagementClassifier:
             'n_estimators': 300,
             'subsample': 0.8,
             'colsample_bytree': 0.8,
-            'tree_method': 'hist',  # Use 'gpu_hist' if GPU available
+            'tree_method': 'hist',
+            'device': 'cuda',  # Falls back to 'cpu' when no GPU is available
+            'multi_strategy': 'multi_output_tree',  # Trees with one leaf value per state
             'eval_metric': 'rmse',
             'early_stopping_rounds': 20,
             'random_state': 42
@@ -69,68 +134,101 @@ class EngagementClassifier:
             validation_split: Fraction of data for validation
             
         Returns:
-            Training history dictionary
+            Training history dictionary ({'all_states': XGBoost evals_result}, shared by all states)
         """
-        print("Training XGBoost models...")
+        print("Training XGBoost model...")
         
         # Store feature names
         if isinstance(X, pd.DataFrame):
             self.feature_names = X.columns.tolist()
             X = X.values
         
+        # One label column per state
+        self.states = [state for state in AFFECTIVE_STATES if state in y]
+        for state in AFFECTIVE_STATES:
+            if state not in y:
+                print(f"  ⚠️  Warning: No labels for {state}, skipping")
+        
+        if not self.states:
+            raise ValueError("No labels for any affective state")
+        
+        Y = np.stack([np.asarray(y[state], dtype=np.float32) for state in self.states], axis=1)
+        
         # Normalize features
         X_scaled = self.scaler.fit_transform(X)
+        self._set_scaling()
         
-        history = {}
+        # Split data
+        train_idx, val_idx = train_test_split(
+            np.arange(len(X_scaled)),
+            test_size=validation_split,
+            random_state=42
+        )
         
-        # Train a separate model for each affective state
-        for state in ['boredom', 'engagement', 'confusion', 'frustration']:
-            print(f"\nTraining {state} model...")
-            
-            if state not in y:
-                print(f"  ⚠️  Warning: No labels for {state}, skipping")
-                continue
-            
-            y_state = y[state]
-            
-            # Split data
-            X_train, X_val, y_train, y_val = train_test_split(
-                X_scaled, y_state, 
-                test_size=validation_split,
-                random_state=42
-            )
-            
-            # Create DMatrix for XGBoost
-            dtrain = xgb.DMatrix(X_train, label=y_train)
-            dval = xgb.DMatrix(X_val, label=y_val)
-            
-            # Train model
-            evals = [(dtrain, 'train'), (dval, 'val')]
-            evals_result = {}
-            
-            self.models[state] = xgb.train(
-                self.config,
-                dtrain,
-                num_boost_round=self.config['n_estimators'],
-                evals=evals,
-                evals_result=evals_result,
-                early_stopping_rounds=self.config.get('early_stopping_rounds', 20),
-                verbose_eval=50
-            )
-            
-            # Store training history
-            history[state] = evals_result
-            
-            # Evaluate on validation set
-            y_pred = self.models[state].predict(dval)
-            rmse = np.sqrt(mean_squared_error(y_val, y_pred))
-            
-            print(f"  ✅ {state.capitalize()} model trained - Validation RMSE: {rmse:.4f}")
+        params = self._booster_params()
+        
+        # On GPU, hand XGBoost device arrays so the data is copied over once
+        to_device = cp.asarray if CUPY_AVAILABLE and str(params.get('device')).startswith('cuda') else np.asarray
+        
+        # Quantize features into histogram bins once (validation reuses the training bins)
+        dtrain = xgb.QuantileDMatrix(to_device(X_scaled[train_idx]), label=to_device(Y[train_idx]))
+        dval = xgb.QuantileDMatrix(to_device(X_scaled[val_idx]), label=to_device(Y[val_idx]), ref=dtrain)
+        
+        # Train one booster for all states
+        evals = [(dtrain, 'train'), (dval, 'val')]
+        evals_result = {}
+        
+        self.booster = xgb.train(
+            params,
+            dtrain,
+            num_boost_round=self.config['n_estimators'],
+            evals=evals,
+            evals_result=evals_result,
+            early_stopping_rounds=self.config.get('early_stopping_rounds', 20),
+            verbose_eval=50
+        )
+        
+        # Predict on CPU: inference inputs are small host arrays (a loaded model also starts on CPU)
+        self.booster.set_param({'device': 'cpu'})
+        
+        # Evaluate each state on the validation set
+        Y_pred = self.booster.predict(dval).reshape(len(val_idx), -1)
+        for i, state in enumerate(self.states):
+            rmse = np.sqrt(mean_squared_error(Y[val_idx, i], Y_pred[:, i]))
+            print(f"  ✅ {state.capitalize()} - Validation RMSE: {rmse:.4f}")
         
         self.is_trained = True
-        print("\n✅ All models trained successfully!")
+        print("\n✅ Model trained successfully!")
+        
+        # Training history of the single booster (the evaluation metric is averaged over states)
+        return {'all_states': evals_result}
+    
+    def _set_scaling(self):
+        """Cache the fitted scaler's mean and inverse scale for predict()"""
+        self._mean = self.scaler.mean_.astype(np.float32)
+        self._inv_std = (1.0 / self.scaler.scale_).astype(np.float32)
+    
+    def _booster_params(self) -> Dict:
+        """
+        XGBoost parameters for the multi-output booster
+        
+        Returns:
+            Parameter dictionary
+        """
+        params = dict(self.config)
+        params['num_target'] = len(self.states)
+        
+        if str(params.get('device', 'cpu')).startswith('cuda') and not _cuda_available():
+            print("  ⚠️  Warning: CUDA not available for XGBoost, training on CPU")
+            params['device'] = 'cpu'
         
-        return history
+        # XGBoost only builds multi-output trees with the CPU 'hist' method
+        if params.get('multi_strategy') == 'multi_output_tree' and (
+                params.get('tree_method') == 'gpu_hist' or str(params.get('device', 'cpu')).startswith('cuda')):
+            print("  ⚠️  Warning: multi_output_tree needs CPU training, using one tree per state on GPU")
+            params['multi_strategy'] = 'one_output_per_tree'
+        
+        return params
     
     def predict(self, X: np.ndarray) -> Dict[str, np.ndarray]:
         """
@@ -149,17 +247,21 @@ class EngagementClassifier:
         if isinstance(X, pd.DataFrame):
             X = X.values
         
-        # Normalize features
-        X_scaled = self.scaler.transform(X)
+        # Normalize features (float32, the precision XGBoost predicts in); same result as
+        # scaler.transform() without its per-call input validation
+        X_scaled = (np.asarray(X, dtype=np.float32) - self._mean) * self._inv_std
         
-        # Create DMatrix
-        dmatrix = xgb.DMatrix(X_scaled)
+        # inplace_predict reads the array directly, without building a DMatrix per call
+        if self.booster is not None:
+            # One column per state, clipped to valid range [0, 3]
+            pred = np.clip(self.booster.inplace_predict(X_scaled).reshape(len(X_scaled), -1), 0, 3)
+            return {state: pred[:, i] for i, state in enumerate(self.states)}
         
         # Predict for each state
         predictions = {}
         for state, model in self.models.items():
             if model is not None:
-                pred = model.predict(dmatrix)
+                pred = model.inplace_predict(X_scaled)
                 # Clip predictions to valid range [0, 3]
                 predictions[state] = np.clip(pred, 0, 3)
         
@@ -193,26 +295,40 @@ class EngagementClassifier:
         Returns:
             Overall engagement score (0-1, higher is better)
         """
-        # Engagement score formula:
-        # High engagement + Low boredom + Low confusion + Low frustration = Good
-        engagement = predictions.get('engagement', 0) / 3.0
-        boredom = 1 - (predictions.get('boredom', 0) / 3.0)
-        confusion = 1 - (predictions.get('confusion', 0) / 3.0)
-        frustration = 1 - (predictions.get('frustration', 0) / 3.0)
-        
-        # Weighted average (engagement weighted more heavily)
-        score = (
-            0.4 * engagement +
-            0.3 * boredom +
-            0.15 * confusion +
-            0.15 * frustration
+        score = _engagement_score(
+            float(predictions.get('engagement', 0)),
+            float(predictions.get('boredom', 0)),
+            float(predictions.get('confusion', 0)),
+            float(predictions.get('frustration', 0))
         )
         
         return float(score)
     
+    def get_engagement_scores(self, predictions: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Calculate engagement scores for a batch of predictions in one pass
+        
+        Args:
+            predictions: Dictionary with affective state prediction arrays (from predict())
+            
+        Returns:
+            Array of engagement scores (0-1, higher is better), one per sample
+        """
+        num_samples = len(next(iter(predictions.values()))) if predictions else 0
+        
+        # Missing states count as level 0, as in get_engagement_score()
+        levels = np.zeros((num_samples, len(AFFECTIVE_STATES)))
+        for i, state in enumerate(AFFECTIVE_STATES):
+            if state in predictions:
+                levels[:, i] = predictions[state]
+        
+        return ENGAGEMENT_SCORE_OFFSET + levels @ ENGAGEMENT_SCORE_COEFFICIENTS
+    
     def get_feature_importance(self, state: str = 'engagement') -> Dict[str, float]:
         """
         Get feature importance for a specific model
+        The multi-output booster shares its trees between states, so its importance
+        is the same for every state
         
         Args:
             state: Affective state ('boredom', 'engagement', etc.)
@@ -220,10 +336,14 @@ class EngagementClassifier:
         Returns:
             Dictionary mapping feature names to importance scores
         """
-        if state not in self.models or self.models[state] is None:
+        if self.booster is not None and state in self.states:
+            model = self.booster
+        elif self.models.get(state) is not None:
+            model = self.models[state]
+        else:
             raise ValueError(f"No model trained for {state}")
         
-        importance = self.models[state].get_score(importance_type='gain')
+        importance = model.get_score(importance_type='gain')
         
         # Map feature indices to names if available
         if self.feature_names:
@@ -247,10 +367,13 @@ class EngagementClassifier:
         save_path = Path(save_dir)
         save_path.mkdir(parents=True, exist_ok=True)
         
-        # Save each model
+        # Save the multi-output model (or each per-state model)
+        if self.booster is not None:
+            self.booster.save_model(str(save_path / f'engagement_model{MODEL_SUFFIXES[0]}'))
+        
         for state, model in self.models.items():
             if model is not None:
-                model_file = save_path / f'{state}_model.json'
+                model_file = save_path / f'{state}_model{MODEL_SUFFIXES[0]}'
                 model.save_model(str(model_file))
         
         # Save scaler
@@ -261,7 +384,8 @@ class EngagementClassifier:
         metadata = {
             'feature_names': self.feature_names,
             'config': self.config,
-            'is_trained': self.is_trained
+            'is_trained': self.is_trained,
+            'states': self.states
         }
         metadata_file = save_path / 'metadata.json'
         with open(metadata_file, 'w') as f:
@@ -293,15 +417,35 @@ class EngagementClassifier:
         # Load scaler
         scaler_file = load_path / 'scaler.pkl'
         self.scaler = joblib.load(str(scaler_file))
+        self._set_scaling()
         
-        # Load each model
-        for state in ['boredom', 'engagement', 'confusion', 'frustration']:
-            model_file = load_path / f'{state}_model.json'
-            if model_file.exists():
-                self.models[state] = xgb.Booster()
-                self.models[state].load_model(str(model_file))
+        # Load the multi-output model, or per-state models saved by older versions
+        self.states = metadata.get('states', [])
+        self.booster = self._load_booster(load_path, 'engagement_model')
+        self.models = {state: self._load_booster(load_path, f'{state}_model') for state in AFFECTIVE_STATES}
         
         print(f"✅ Models loaded from {load_path}")
+    
+    @staticmethod
+    def _load_booster(load_path: Path, name: str) -> Optional[xgb.Booster]:
+        """
+        Load a saved booster in whichever supported format exists
+        
+        Args:
+            load_path: Directory containing saved models
+            name: Model file name without suffix
+            
+        Returns:
+            Loaded booster, or None if no model file exists
+        """
+        for suffix in MODEL_SUFFIXES:
+            model_file = load_path / f'{name}{suffix}'
+            if model_file.exists():
+                booster = xgb.Booster()
+                booster.load_model(str(model_file))
+                return booster
+        
+        return None
 
 
 if __name__ == "__main__":
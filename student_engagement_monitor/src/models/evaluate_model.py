@@ -3,20 +3,86 @@ Model Evaluation
 Evaluate trained engagement classifier on test set
 """
 
+import json
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Optional
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.metrics import confusion_matrix, classification_report
+from typing import Dict, Optional, Tuple
+from sklearn.metrics import classification_report
 import sys
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from models.engagement_classifier import EngagementClassifier
-from utils import load_config
+from models.engagement_classifier import EngagementClassifier, AFFECTIVE_STATES
+from utils import load_config, find_processed_split, load_features, load_labels
+
+# Samples drawn per scatter plot (matplotlib cost grows with every point)
+MAX_SCATTER_POINTS = 5000
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _state_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Tuple[float, float, float, float]:
+    """
+    RMSE, MAE, R² and rounded accuracy of one affective state in two passes over the data
+    """
+    n = y_true.shape[0]
+    
+    mean = 0.0
+    for i in range(n):
+        mean += y_true[i]
+    mean /= n
+    
+    ss_res = 0.0
+    ss_tot = 0.0
+    abs_err = 0.0
+    correct = 0
+    for i in range(n):
+        diff = y_true[i] - y_pred[i]
+        ss_res += diff * diff
+        abs_err += abs(diff)
+        centered = y_true[i] - mean
+        ss_tot += centered * centered
+        if round(y_true[i]) == round(y_pred[i]):
+            correct += 1
+    
+    # Constant labels give R² 1.0 for a perfect fit and 0.0 otherwise (as in sklearn)
+    if ss_tot > 0:
+        r2 = 1.0 - ss_res / ss_tot
+    elif ss_res == 0:
+        r2 = 1.0
+    else:
+        r2 = 0.0
+    
+    return np.sqrt(ss_res / n), abs_err / n, r2, correct / n
+
+
+if NUMBA_AVAILABLE:
+    _state_metrics = njit(cache=True)(_state_metrics)
+
+
+def _round_labels(values: np.ndarray) -> np.ndarray:
+    """
+    Round to the nearest integer label (half to even, like np.round) straight into
+    an int8 array, without a rounded float temporary
+    """
+    values = np.asarray(values)
+    return np.rint(values, out=np.empty(values.shape, dtype=np.int8), casting='unsafe')
+
+
+def _confusion_matrix(y_true: np.ndarray, y_pred: np.ndarray, num_classes: int = 4) -> np.ndarray:
+    """
+    Confusion matrix of integer labels 0..num_classes-1, counted with one bincount
+    over packed (true, predicted) codes; pairs outside the label range are ignored
+    (as with sklearn's confusion_matrix(labels=...))
+    """
+    valid = (y_true >= 0) & (y_true < num_classes) & (y_pred >= 0) & (y_pred < num_classes)
+    codes = y_true[valid] * num_classes + y_pred[valid]
+    return np.bincount(codes, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
 
 
 class ModelEvaluator:
@@ -36,13 +102,15 @@ class ModelEvaluator:
         
         print(f"✅ Model loaded from {model_dir}")
     
-    def evaluate(self, X: pd.DataFrame, y: Dict[str, np.ndarray]) -> Dict:
+    def evaluate(self, X: pd.DataFrame, y: Dict[str, np.ndarray],
+                 predictions: Optional[Dict[str, np.ndarray]] = None) -> Dict:
         """
         Evaluate model on test data
         
         Args:
             X: Feature DataFrame
             y: True labels dictionary
+            predictions: Precomputed predictions for X (predicted here if None)
             
         Returns:
             Dictionary with evaluation metrics
@@ -50,41 +118,54 @@ class ModelEvaluator:
         print("\nEvaluating model...")
         
         # Get predictions
-        predictions = self.classifier.predict(X)
+        if predictions is None:
+            predictions = self.classifier.predict(X)
         
         metrics = {}
         
-        # Evaluate each affective state
-        for state in ['boredom', 'engagement', 'confusion', 'frustration']:
-            if state not in y or state not in predictions:
-                continue
-            
-            y_true = y[state]
-            y_pred = predictions[state]
-            
-            # Regression metrics
-            rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-            mae = mean_absolute_error(y_true, y_pred)
-            r2 = r2_score(y_true, y_pred)
-            
-            # Classification metrics (round to nearest integer)
-            y_true_class = np.round(y_true).astype(int)
-            y_pred_class = np.round(y_pred).astype(int)
-            
-            accuracy = np.mean(y_true_class == y_pred_class)
+        # Evaluate all affective states at once, one row per state
+        states = [state for state in AFFECTIVE_STATES if state in y and state in predictions]
+        
+        if states:
+            y_true = np.stack([np.asarray(y[state], dtype=np.float64) for state in states])
+            y_pred = np.stack([np.asarray(predictions[state], dtype=np.float64) for state in states])
             
-            metrics[state] = {
-                'rmse': float(rmse),
-                'mae': float(mae),
-                'r2': float(r2),
-                'accuracy': float(accuracy)
-            }
+            if NUMBA_AVAILABLE:
+                # Fused compiled loop per state, no temporaries
+                rmse, mae, r2, accuracy = np.array(
+                    [_state_metrics(y_true[i], y_pred[i]) for i in range(len(states))]
+                ).T
+            else:
+                # Regression metrics
+                diff = y_true - y_pred
+                ss_res = (diff * diff).sum(axis=1)
+                ss_tot = ((y_true - y_true.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+                
+                rmse = np.sqrt(ss_res / y_true.shape[1])
+                mae = np.abs(diff).mean(axis=1)
+                
+                # Constant labels give R² 1.0 for a perfect fit and 0.0 otherwise (as in sklearn)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.where(ss_res == 0, 1.0, 0.0))
+                
+                # Classification metrics (round to nearest integer)
+                accuracy = (_round_labels(y_true) == _round_labels(y_pred)).mean(axis=1)
             
-            print(f"\n{state.upper()}:")
-            print(f"  RMSE: {rmse:.4f}")
-            print(f"  MAE: {mae:.4f}")
-            print(f"  R²: {r2:.4f}")
-            print(f"  Accuracy: {accuracy:.4f}")
+            # tolist() converts each metric row to Python floats in one call
+            for state, state_rmse, state_mae, state_r2, state_accuracy in zip(
+                    states, rmse.tolist(), mae.tolist(), r2.tolist(), accuracy.tolist()):
+                metrics[state] = {
+                    'rmse': state_rmse,
+                    'mae': state_mae,
+                    'r2': state_r2,
+                    'accuracy': state_accuracy
+                }
+                
+                print(f"\n{state.upper()}:")
+                print(f"  RMSE: {state_rmse:.4f}")
+                print(f"  MAE: {state_mae:.4f}")
+                print(f"  R²: {state_r2:.4f}")
+                print(f"  Accuracy: {state_accuracy:.4f}")
         
         # Overall accuracy
         all_accuracies = [m['accuracy'] for m in metrics.values()]
@@ -98,29 +179,36 @@ class ModelEvaluator:
         return metrics
     
     def plot_confusion_matrices(self, X: pd.DataFrame, y: Dict[str, np.ndarray],
-                               save_path: Optional[str] = None):
+                                predictions: Optional[Dict[str, np.ndarray]] = None,
+                                save_path: Optional[str] = None):
         """
         Plot confusion matrices for each affective state
         
         Args:
             X: Feature DataFrame
             y: True labels dictionary
+            predictions: Precomputed predictions for X (predicted here if None)
             save_path: Path to save plot
         """
-        predictions = self.classifier.predict(X)
+        # Plotting libraries are slow to import, so only load them when plotting
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
+        if predictions is None:
+            predictions = self.classifier.predict(X)
         
         fig, axes = plt.subplots(2, 2, figsize=(12, 10))
         axes = axes.flatten()
         
-        for idx, state in enumerate(['boredom', 'engagement', 'confusion', 'frustration']):
+        for idx, state in enumerate(AFFECTIVE_STATES):
             if state not in y or state not in predictions:
                 continue
             
-            y_true = np.round(y[state]).astype(int)
-            y_pred = np.round(predictions[state]).astype(int)
+            y_true = _round_labels(y[state])
+            y_pred = _round_labels(predictions[state])
             
             # Compute confusion matrix
-            cm = confusion_matrix(y_true, y_pred, labels=[0, 1, 2, 3])
+            cm = _confusion_matrix(y_true, y_pred)
             
             # Plot
             sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[idx],
@@ -134,10 +222,12 @@ class ModelEvaluator:
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"  💾 Confusion matrices saved to {save_path}")
-        
-        plt.show()
+            plt.close(fig)
+        else:
+            plt.show()
     
     def plot_predictions_vs_actual(self, X: pd.DataFrame, y: Dict[str, np.ndarray],
+                                   predictions: Optional[Dict[str, np.ndarray]] = None,
                                    save_path: Optional[str] = None):
         """
         Plot predicted vs actual values
@@ -145,19 +235,29 @@ class ModelEvaluator:
         Args:
             X: Feature DataFrame
             y: True labels dictionary
+            predictions: Precomputed predictions for X (predicted here if None)
             save_path: Path to save plot
         """
-        predictions = self.classifier.predict(X)
+        # Plotting libraries are slow to import, so only load them when plotting
+        import matplotlib.pyplot as plt
+        
+        if predictions is None:
+            predictions = self.classifier.predict(X)
         
         fig, axes = plt.subplots(2, 2, figsize=(12, 10))
         axes = axes.flatten()
         
-        for idx, state in enumerate(['boredom', 'engagement', 'confusion', 'frustration']):
+        for idx, state in enumerate(AFFECTIVE_STATES):
             if state not in y or state not in predictions:
                 continue
             
-            y_true = y[state]
-            y_pred = predictions[state]
+            y_true = np.asarray(y[state])
+            y_pred = np.asarray(predictions[state])
+            
+            # Plot a fixed random subset of large test sets (same samples for every state)
+            if len(y_true) > MAX_SCATTER_POINTS:
+                sample = np.random.default_rng(0).choice(len(y_true), size=MAX_SCATTER_POINTS, replace=False)
+                y_true, y_pred = y_true[sample], y_pred[sample]
             
             # Scatter plot
             axes[idx].scatter(y_true, y_pred, alpha=0.5, s=20)
@@ -175,8 +275,9 @@ class ModelEvaluator:
         if save_path:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"  💾 Prediction plot saved to {save_path}")
-        
-        plt.show()
+            plt.close(fig)
+        else:
+            plt.show()
     
     def generate_report(self, X: pd.DataFrame, y: Dict[str, np.ndarray],
                        output_dir: str = 'outputs/reports'):
@@ -193,11 +294,13 @@ class ModelEvaluator:
         
         print("\nGenerating evaluation report...")
         
+        # Predict once and share the result with the metrics and plots
+        predictions = self.classifier.predict(X)
+        
         # Evaluate
-        metrics = self.evaluate(X, y)
+        metrics = self.evaluate(X, y, predictions=predictions)
         
         # Save metrics to JSON
-        import json
         metrics_file = output_path / 'evaluation_metrics.json'
         with open(metrics_file, 'w') as f:
             json.dump(metrics, f, indent=2)
@@ -205,11 +308,11 @@ class ModelEvaluator:
         
         # Plot confusion matrices
         cm_file = output_path / 'confusion_matrices.png'
-        self.plot_confusion_matrices(X, y, save_path=str(cm_file))
+        self.plot_confusion_matrices(X, y, predictions=predictions, save_path=str(cm_file))
         
         # Plot predictions vs actual
         pred_file = output_path / 'predictions_vs_actual.png'
-        self.plot_predictions_vs_actual(X, y, save_path=str(pred_file))
+        self.plot_predictions_vs_actual(X, y, predictions=predictions, save_path=str(pred_file))
         
         print("\n✅ Evaluation report generated!")
 
@@ -221,29 +324,35 @@ def main():
     parser = argparse.ArgumentParser(description='Evaluate engagement classifier')
     parser.add_argument('--model-dir', type=str, default='models/trained',
                        help='Directory containing trained models')
-    parser.add_argument('--test-features', type=str, 
-                       default='data/processed/test_features.csv',
-                       help='Path to test features CSV')
-    parser.add_argument('--test-labels', type=str,
-                       default='data/processed/test_labels.csv',
-                       help='Path to test labels CSV')
+    parser.add_argument('--test-features', type=str, default=None,
+                       help='Path to test features Parquet/CSV (default: data/processed/test_features.*)')
+    parser.add_argument('--test-labels', type=str, default=None,
+                       help='Path to test labels NPZ/CSV (default: data/processed/test_labels.*)')
     parser.add_argument('--output-dir', type=str, default='outputs/reports',
                        help='Directory to save evaluation report')
     
     args = parser.parse_args()
     
+    # The report only saves figures, so skip GUI backend setup
+    import matplotlib
+    matplotlib.use('Agg')
+    
+    # Default to the test split saved by feature extraction
+    default_features, default_labels = find_processed_split('data/processed', 'Test')
+    test_features = args.test_features or default_features
+    test_labels = args.test_labels or default_labels
+    
     # Check if test data exists
-    if not Path(args.test_features).exists():
-        print(f"❌ Test features not found: {args.test_features}")
+    if test_features is None or not Path(test_features).exists() or test_labels is None:
+        print(f"❌ Test features not found: {test_features or 'data/processed/test_features.parquet'}")
         print("Please extract features from test set first:")
         print("  python src/models/train_model.py --split Test --max-videos 100")
         return
     
     # Load test data
     print("Loading test data...")
-    X = pd.read_csv(args.test_features)
-    y_df = pd.read_csv(args.test_labels)
-    y = {col: y_df[col].values for col in y_df.columns}
+    X = load_features(test_features)
+    y = load_labels(test_labels)
     
     print(f"  ✅ Loaded {len(X)} test samples")
     
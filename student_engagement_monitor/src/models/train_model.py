@@ -6,8 +6,12 @@ End-to-end training pipeline for the engagement classifier
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+import gc
+import os
 import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import yaml
 
@@ -18,7 +22,96 @@ from data_processing.dataset_loader import DAiSEEDataLoader
 from data_processing.frame_extractor import FrameExtractor
 from feature_extraction.feature_aggregator import FeatureAggregator
 from models.engagement_classifier import EngagementClassifier
-from utils import load_config
+from utils import load_config, save_processed_split, find_processed_split, load_features, load_labels
+
+
+# Failed videos listed in the extraction summary
+MAX_REPORTED_ERRORS = 20
+
+# Videos between garbage collections (detector threads and queues leave reference cycles)
+GC_INTERVAL = 50
+
+# Per-process extractors used by parallel feature extraction workers
+_worker_frame_extractor = None
+_worker_feature_aggregator = None
+_worker_video_count = 0
+
+
+def _create_frame_extractor(config: Dict) -> FrameExtractor:
+    """Create frame extractor from configuration"""
+    return FrameExtractor(
+        target_fps=config['video']['fps_extraction'],
+        resize=(config['video']['frame_width'], 
+               config['video']['frame_height']),
+        output_rgb=True  # MediaPipe detectors consume RGB directly
+    )
+
+
+def _init_feature_worker(config_path: str):
+    """Initialize extractors once per worker process"""
+    global _worker_frame_extractor, _worker_feature_aggregator
+    
+    config = load_config(config_path)
+    _worker_frame_extractor = _create_frame_extractor(config)
+    _worker_feature_aggregator = FeatureAggregator(config)
+
+
+def extract_one_video(video_path: str, frame_extractor: FrameExtractor,
+                      feature_aggregator: FeatureAggregator,
+                      pipelined: bool = True) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Extract aggregated features from a single video
+    
+    Args:
+        video_path: Path to video file
+        frame_extractor: Frame extractor to use
+        feature_aggregator: Feature aggregator to use
+        pipelined: Run the detectors on their own threads (see extract_video_features())
+        
+    Returns:
+        Tuple of (aggregated feature dictionary, error message); features are None if
+        the video could not be processed, the error is None unless extraction raised
+    """
+    # Stream frames into feature extraction instead of decoding the whole video up front
+    frames = frame_extractor.iter_frames(video_path)
+    
+    try:
+        # Extract features
+        features = feature_aggregator.extract_video_features(
+            frames, aggregate=True, is_rgb=frame_extractor.output_rgb, pipelined=pipelined
+        )
+        
+        # Reset detector history for next video
+        feature_aggregator.reset()
+        
+        # No frames could be extracted
+        if not features:
+            return None, None
+        
+        return features, None
+        
+    except Exception as e:
+        # Reported once after the loop (printing here would break up the progress bar)
+        feature_aggregator.reset()
+        return None, repr(e)
+    
+    finally:
+        # Release the decoder and its current frame now, even if extraction stopped early
+        frames.close()
+
+
+def _extract_worker_video(video_path: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """Worker process entrypoint for extract_one_video()"""
+    global _worker_video_count
+    
+    _worker_video_count += 1
+    if _worker_video_count % GC_INTERVAL == 0:
+        gc.collect()
+    
+    # The process pool already keeps every core busy, so detectors run on the worker's own
+    # thread instead of one thread each
+    return extract_one_video(video_path, _worker_frame_extractor, _worker_feature_aggregator,
+                             pipelined=False)
 
 
 class TrainingPipeline:
@@ -38,15 +131,12 @@ class TrainingPipeline:
         print("=" * 60)
         
         # Load configuration
+        self.config_path = config_path
         self.config = load_config(config_path)
         
         # Initialize components
         self.dataset_loader = None
-        self.frame_extractor = FrameExtractor(
-            target_fps=self.config['video']['fps_extraction'],
-            resize=(self.config['video']['frame_width'], 
-                   self.config['video']['frame_height'])
-        )
+        self.frame_extractor = _create_frame_extractor(self.config)
         self.feature_aggregator = FeatureAggregator(self.config)
         self.classifier = EngagementClassifier(self.config.get('model'))
     
@@ -65,13 +155,15 @@ class TrainingPipeline:
         print(f"  ✅ Loaded {len(self.dataset_loader)} videos")
     
     def extract_features_from_dataset(self, max_videos: Optional[int] = None,
-                                     save_features: bool = True) -> Tuple[np.ndarray, Dict]:
+                                     save_features: bool = True,
+                                     num_workers: int = 1) -> Tuple[np.ndarray, Dict]:
         """
         Extract features from all videos in dataset
         
         Args:
             max_videos: Maximum number of videos to process (None = all)
             save_features: Whether to save extracted features
+            num_workers: Number of worker processes (1 = extract in this process)
             
         Returns:
             Tuple of (feature_matrix, labels_dict)
@@ -83,85 +175,119 @@ class TrainingPipeline:
         
         num_videos = min(len(self.dataset_loader), max_videos) if max_videos else len(self.dataset_loader)
         
-        all_features = []
-        all_labels = {
-            'boredom': [],
-            'engagement': [],
-            'confusion': [],
-            'frustration': []
-        }
-        
         processed_count = 0
         skipped_count = 0
-        
-        for i in tqdm(range(num_videos), desc="Processing videos"):
-            try:
-                # Get video and labels
-                video_path, labels = self.dataset_loader[i]
-                
-                if labels is None:
-                    skipped_count += 1
-                    continue
-                
-                # Extract frames
-                frames = self.frame_extractor.extract_frames(str(video_path))
-                
-                if len(frames) == 0:
-                    skipped_count += 1
-                    continue
-                
-                # Extract features
-                features = self.feature_aggregator.extract_video_features(frames, aggregate=True)
-                
-                # Store features and labels
-                all_features.append(features)
-                all_labels['boredom'].append(labels['boredom'])
-                all_labels['engagement'].append(labels['engagement'])
-                all_labels['confusion'].append(labels['confusion'])
-                all_labels['frustration'].append(labels['frustration'])
-                
-                processed_count += 1
-                
-                # Reset detector history for next video
-                self.feature_aggregator.reset()
-                
-            except Exception as e:
-                print(f"\n  ⚠️  Error processing video {i} ({video_path}): {e}")
-                import traceback
-                traceback.print_exc()
+        errors = []
+        
+        # Collect labelled videos
+        video_paths, video_labels = self.dataset_loader.get_labeled_items(num_videos)
+        skipped_count += num_videos - len(video_paths)
+        
+        # Rows are written straight into preallocated arrays; feature columns are added
+        # as new keys appear (videos may lack some keys, those entries stay NaN)
+        feature_columns = {}
+        feature_matrix = np.full((len(video_paths), 64), np.nan, dtype=np.float32)
+        processed_rows = np.empty(len(video_paths), dtype=np.intp)
+        
+        # Each video's features are stored as soon as they arrive, so at most a few
+        # feature dicts are alive at a time instead of one per video
+        video_features = self._iter_video_features(video_paths, num_workers)
+        
+        for i, (video_path, (features, error)) in enumerate(zip(video_paths, video_features)):
+            if features is None:
+                if error is not None:
+                    errors.append((video_path, error))
                 skipped_count += 1
                 continue
+            
+            # Store features and labels
+            for key in features:
+                if key not in feature_columns:
+                    feature_columns[key] = len(feature_columns)
+            
+            if len(feature_columns) > feature_matrix.shape[1]:
+                grown = np.full((len(video_paths), 2 * len(feature_columns)), np.nan, dtype=np.float32)
+                grown[:, :feature_matrix.shape[1]] = feature_matrix
+                feature_matrix = grown
+            
+            row = feature_matrix[processed_count]
+            for key, value in features.items():
+                row[feature_columns[key]] = value
+            
+            processed_rows[processed_count] = i
+            
+            processed_count += 1
         
         print(f"\n✅ Processed {processed_count} videos, skipped {skipped_count}")
         
-        # Convert to DataFrame and arrays
-        features_df = pd.DataFrame(all_features)
+        if errors:
+            print(f"  ⚠️  Warning: {len(errors)} videos failed:")
+            for video_path, error in errors[:MAX_REPORTED_ERRORS]:
+                print(f"    {video_path}: {error}")
+            if len(errors) > MAX_REPORTED_ERRORS:
+                print(f"    ... {len(errors) - MAX_REPORTED_ERRORS} more errors")
         
         # Fill NaN values with 0
-        features_df = features_df.fillna(0)
+        feature_matrix = feature_matrix[:processed_count, :len(feature_columns)]
+        np.nan_to_num(feature_matrix, copy=False, nan=0.0)
         
-        # Convert labels to arrays
+        # Wrap the filled rows as DataFrame and keep the labels of processed videos
+        features_df = pd.DataFrame(feature_matrix, columns=list(feature_columns), copy=False)
         labels_arrays = {
-            state: np.array(values)
-            for state, values in all_labels.items()
+            state: values[processed_rows[:processed_count]]
+            for state, values in video_labels.items()
         }
         
         # Save features if requested
         if save_features:
-            output_dir = Path(self.config['dataset']['processed_path'])
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            features_file = output_dir / f"{self.dataset_loader.split.lower()}_features.csv"
-            labels_file = output_dir / f"{self.dataset_loader.split.lower()}_labels.csv"
-            
-            features_df.to_csv(features_file, index=False)
-            pd.DataFrame(labels_arrays).to_csv(labels_file, index=False)
+            features_file, labels_file = save_processed_split(
+                features_df, labels_arrays,
+                self.config['dataset']['processed_path'], self.dataset_loader.split
+            )
             
             print(f"  💾 Features saved to {features_file}")
             print(f"  💾 Labels saved to {labels_file}")
         
         return features_df, labels_arrays
     
+    def _iter_video_features(self, video_paths: List[str],
+                             num_workers: int) -> Iterator[Tuple[Optional[Dict], Optional[str]]]:
+        """
+        Yield (features, error) of each video in order, as returned by extract_one_video()
+        
+        Args:
+            video_paths: Paths of videos to process
+            num_workers: Number of worker processes (1 = extract in this process)
+        """
+        if num_workers > 1:
+            # Each worker runs single-threaded native code to avoid oversubscribing cores
+            # (spawned workers read it at import time; this process gets its value back after)
+            previous_omp_threads = os.environ.get('OMP_NUM_THREADS')
+            os.environ['OMP_NUM_THREADS'] = '1'
+            
+            try:
+                # Spawn (not fork) so workers don't inherit MediaPipe/YOLO threads from this process
+                with ProcessPoolExecutor(max_workers=num_workers,
+                                         mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_feature_worker,
+                                         initargs=(self.config_path,)) as executor:
+                    yield from tqdm(
+                        executor.map(_extract_worker_video, video_paths, chunksize=4),
+                        total=len(video_paths),
+                        desc="Processing videos"
+                    )
+            finally:
+                if previous_omp_threads is None:
+                    os.environ.pop('OMP_NUM_THREADS', None)
+                else:
+                    os.environ['OMP_NUM_THREADS'] = previous_omp_threads
+        else:
+            for i, video_path in enumerate(tqdm(video_paths, desc="Processing videos"), 1):
+                if i % GC_INTERVAL == 0:
+                    gc.collect()
+                
+                yield extract_one_video(video_path, self.frame_extractor, self.feature_aggregator)
+    
     def train_model(self, X: pd.DataFrame, y: Dict[str, np.ndarray]):
         """
         Train the classifier
@@ -183,19 +309,25 @@ class TrainingPipeline:
         
         self.classifier.save(save_dir)
     
-    def run_full_pipeline(self, split: str = 'Train', max_videos: Optional[int] = None):
+    def run_full_pipeline(self, split: str = 'Train', max_videos: Optional[int] = None,
+                          num_workers: Optional[int] = None):
         """
         Run complete training pipeline
         
         Args:
             split: Dataset split to use
             max_videos: Maximum videos to process (None = all)
+            num_workers: Feature extraction worker processes
+                         (None = performance.num_workers from config, or one per CPU core)
         """
+        if num_workers is None:
+            num_workers = self.config.get('performance', {}).get('num_workers') or os.cpu_count() or 1
+        
         # Load dataset
         self.load_dataset(split)
         
         # Extract features
-        X, y = self.extract_features_from_dataset(max_videos=max_videos)
+        X, y = self.extract_features_from_dataset(max_videos=max_videos, num_workers=num_workers)
         
         # Train model
         self.train_model(X, y)
@@ -220,6 +352,8 @@ def main():
                        help='Dataset split to use')
     parser.add_argument('--max-videos', type=int, default=None,
                        help='Maximum number of videos to process (for testing)')
+    parser.add_argument('--num-workers', type=int, default=None,
+                       help='Feature extraction worker processes (default: performance.num_workers)')
     parser.add_argument('--load-features', action='store_true',
                        help='Load pre-extracted features instead of extracting')
     
@@ -232,17 +366,16 @@ def main():
         # Load pre-extracted features
         print("Loading pre-extracted features...")
         
-        processed_path = Path(pipeline.config['dataset']['processed_path'])
-        features_file = processed_path / f"{args.split.lower()}_features.csv"
-        labels_file = processed_path / f"{args.split.lower()}_labels.csv"
+        features_file, labels_file = find_processed_split(
+            pipeline.config['dataset']['processed_path'], args.split
+        )
         
-        if not features_file.exists() or not labels_file.exists():
+        if features_file is None or labels_file is None:
             print(f"❌ Features not found. Please extract features first.")
             return
         
-        X = pd.read_csv(features_file)
-        y_df = pd.read_csv(labels_file)
-        y = {col: y_df[col].values for col in y_df.columns}
+        X = load_features(features_file)
+        y = load_labels(labels_file)
         
         print(f"  ✅ Loaded {len(X)} samples")
         
@@ -252,7 +385,8 @@ def main():
         
     else:
         # Run full pipeline
-        pipeline.run_full_pipeline(split=args.split, max_videos=args.max_videos)
+        pipeline.run_full_pipeline(split=args.split, max_videos=args.max_videos,
+                                   num_workers=args.num_workers)
 
 
 if __name__ == "__main__":
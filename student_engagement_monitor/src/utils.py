@@ -1,10 +1,36 @@
 """
-Utility functions for loading configuration files
+Utility functions for loading configuration files and processed feature sets
 """
 
+import copy
+import importlib.util
+import json
 import yaml
+import numpy as np
+import pandas as pd
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from functools import lru_cache
+
+# pandas needs pyarrow for Parquet IO (features fall back to CSV without it)
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# The pyarrow CSV engine parses with multiple threads
+CSV_ENGINE = 'pyarrow' if PYARROW_AVAILABLE else 'c'
+
+# Processed feature/label file suffixes, in order of preference
+FEATURE_SUFFIXES = ('.npy', '.parquet', '.csv')
+LABEL_SUFFIXES = ('.npz', '.csv')
+
+# libyaml's C parser when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@lru_cache(maxsize=None)
+def _parse_config(config_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a YAML file once per path and modification time"""
+    with open(config_path, 'r') as f:
+        return yaml.load(f, Loader=YAML_LOADER)
 
 
 def load_config(config_path: str = 'configs/config.yaml') -> Dict[str, Any]:
@@ -22,10 +48,10 @@ def load_config(config_path: str = 'configs/config.yaml') -> Dict[str, Any]:
     if not config_file.exists():
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
     
-    with open(config_file, 'r') as f:
-        config = yaml.safe_load(f)
+    # Parsed once and copied per call, since callers may modify their config
+    config = _parse_config(str(config_file.resolve()), config_file.stat().st_mtime_ns)
     
-    return config
+    return copy.deepcopy(config)
 
 
 def get_dataset_paths(config: Dict[str, Any]) -> Dict[str, Path]:
@@ -100,3 +126,107 @@ def get_privacy_config(config: Dict[str, Any]) -> Dict[str, Any]:
         Privacy configuration dictionary
     """
     return config.get('privacy', {})
+
+
+def save_processed_split(features_df: pd.DataFrame, labels: Dict[str, np.ndarray],
+                         output_dir: str, split: str) -> Tuple[Path, Path]:
+    """
+    Save extracted features and labels (NPZ)
+    Numeric feature matrices are written as raw NPY plus a JSON list of column names,
+    other frames as Parquet (CSV without pyarrow)
+    
+    Args:
+        features_df: Feature DataFrame
+        labels: Labels dictionary
+        output_dir: Processed data directory
+        split: Dataset split name
+        
+    Returns:
+        Tuple of (features_file, labels_file)
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in features_df.dtypes):
+        features_file = output_path / f"{split.lower()}_features.npy"
+        np.save(features_file, features_df.to_numpy(dtype=np.float32))
+        with open(features_file.with_suffix('.json'), 'w') as f:
+            json.dump([str(column) for column in features_df.columns], f)
+    elif PYARROW_AVAILABLE:
+        features_file = output_path / f"{split.lower()}_features.parquet"
+        features_df.to_parquet(features_file, engine='pyarrow', compression='snappy', index=False)
+    else:
+        features_file = output_path / f"{split.lower()}_features.csv"
+        features_df.to_csv(features_file, index=False)
+    
+    labels_file = output_path / f"{split.lower()}_labels.npz"
+    np.savez(labels_file, **labels)
+    
+    return features_file, labels_file
+
+
+def find_processed_split(processed_dir: str, split: str) -> Tuple[Optional[Path], Optional[Path]]:
+    """
+    Find the saved feature and label files of a split (NPY/Parquet and NPZ, or older CSV)
+    
+    Args:
+        processed_dir: Processed data directory
+        split: Dataset split name
+        
+    Returns:
+        Tuple of (features_file, labels_file), with None for files that don't exist
+    """
+    processed_path = Path(processed_dir)
+    
+    def first_existing(stem: str, suffixes: Tuple[str, ...]) -> Optional[Path]:
+        for suffix in suffixes:
+            path = processed_path / f"{stem}{suffix}"
+            if path.exists():
+                return path
+        return None
+    
+    return (first_existing(f"{split.lower()}_features", FEATURE_SUFFIXES),
+            first_existing(f"{split.lower()}_labels", LABEL_SUFFIXES))
+
+
+def load_features(features_file: str) -> pd.DataFrame:
+    """
+    Load a feature DataFrame saved as NPY (memory-mapped), Parquet or CSV
+    
+    Args:
+        features_file: Path to features file
+        
+    Returns:
+        Feature DataFrame
+    """
+    features_path = Path(features_file)
+    
+    if features_path.suffix == '.npy':
+        with open(features_path.with_suffix('.json'), 'r') as f:
+            columns = json.load(f)
+        return pd.DataFrame(np.load(features_path, mmap_mode='r'), columns=columns, copy=False)
+    
+    if features_path.suffix == '.parquet':
+        return pd.read_parquet(features_file)
+    
+    return pd.read_csv(features_file, engine=CSV_ENGINE)
+
+
+def load_labels(labels_file: str) -> Dict[str, np.ndarray]:
+    """
+    Load a labels dictionary saved as NPZ or CSV
+    
+    Args:
+        labels_file: Path to labels file
+        
+    Returns:
+        Labels dictionary
+    """
+    if Path(labels_file).suffix == '.npz':
+        with np.load(labels_file) as data:
+            return {state: data[state] for state in data.files}
+    
+    # One float32 block with a contiguous row per state, handed out as views
+    labels_df = pd.read_csv(labels_file, engine=CSV_ENGINE)
+    values = np.ascontiguousarray(labels_df.to_numpy(dtype=np.float32).T)
+    return {col: values[i] for i, col in enumerate(labels_df.columns)}